@@ -1,3 +1,38 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from config.testing import QueryBudgetTestCase
+
+
+class AuthQueryBudgetTest(QueryBudgetTestCase):
+    """Budget di query di login e refresh JWT"""
+    
+    def test_login(self):
+        def request(size):
+            return self.client.post(reverse('token_obtain_pair'), {
+                'email': self.participants[-1].email,
+                'password': 'password123'
+            })
+        self.assertQueryBudget(2, request)
+    
+    def test_login_wrong_password(self):
+        def request(size):
+            return self.client.post(reverse('token_obtain_pair'), {
+                'email': self.participant.email,
+                'password': 'sbagliata'
+            })
+        self.assertQueryBudget(1, request, expected_status=401)
+    
+    def test_refresh(self):
+        def setup(size):
+            return self.client.post(reverse('token_obtain_pair'), {
+                'email': self.participant.email,
+                'password': 'password123'
+            }).data['refresh']
+        
+        # Rotazione con blacklist: il vecchio refresh token viene
+        # invalidato e il nuovo registrato (query costanti di simplejwt)
+        self.assertQueryBudget(
+            13,
+            lambda refresh: self.client.post(reverse('token_refresh'), {'refresh': refresh}),
+            setup=setup
+        )
@@ -1,5 +1,13 @@
 from django.urls import path
+from .views import (
+    ProfileTokenView,
+    ProfileCaptureListView,
+    ProfileCaptureDownloadView,
+)
 
 urlpatterns = [
-    # Gli endpoint specifici per l'amministrazione verranno aggiunti qui
-]
\ No newline at end of file
+    # Profilazione on-demand delle viste API
+    path('admin/profiles/', ProfileCaptureListView.as_view(), name='profile-list'),
+    path('admin/profiles/token/', ProfileTokenView.as_view(), name='profile-token'),
+    path('admin/profiles/<str:capture_id>/<str:kind>/', ProfileCaptureDownloadView.as_view(), name='profile-download'),
+]
@@ -1,3 +1,65 @@
-from django.shortcuts import render
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
 
-# Create your views here.
+from config import profiling
+from .permissions import IsAdmin
+
+
+class ProfileTokenView(APIView):
+    """
+    Genera un token per profilare una richiesta.
+    
+    POST /api/admin/profiles/token/
+    
+    Il token va inviato nell'header "X-Profile" della richiesta da
+    profilare; scade dopo PROFILING_TOKEN_MAX_AGE secondi.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    
+    def post(self, request):
+        return Response({
+            "success": True,
+            "data": {
+                "header": "X-Profile",
+                "token": profiling.make_token(request.user)
+            }
+        }, status=status.HTTP_201_CREATED)
+
+
+class ProfileCaptureListView(APIView):
+    """
+    Lista delle catture di profilazione.
+    
+    GET /api/admin/profiles/
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    
+    def get(self, request):
+        captures = profiling.list_captures()
+        return Response({
+            "success": True,
+            "count": len(captures),
+            "data": captures
+        })
+
+
+class ProfileCaptureDownloadView(APIView):
+    """
+    Download di una cattura.
+    
+    GET /api/admin/profiles/{id}/prof/  → dump cProfile (pstats, snakeviz)
+    GET /api/admin/profiles/{id}/txt/   → report cProfile + tracemalloc
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    
+    def get(self, request, capture_id, kind):
+        path = profiling.capture_path(capture_id, kind)
+        if path is None:
+            return Response({
+                "success": False,
+                "error": "Cattura non trovata."
+            }, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
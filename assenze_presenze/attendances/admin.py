@@ -1,10 +1,24 @@
 from django.contrib import admin
+from django.db import transaction
+
+from config.paginators import EstimatedCountPaginator
+from . import audit, fulltext
+from .admin_filters import AutocompleteFilter, DateRangeFilter
 from .models import Attendance
+from .writes import run_write
 
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
-    """Admin panel per la gestione delle presenze"""
+    """
+    Admin panel per la gestione delle presenze.
+    
+    Pensato per milioni di righe: giornata e utente nella query della
+    lista, conteggio stimato (config/paginators.py), filtri a form invece
+    di elenchi completi (admin_filters.py), ricerca per prefisso sugli
+    indici (config/search.py) e full-text sulle note (fulltext.py), azioni
+    su tutte le righe filtrate senza caricarle in memoria.
+    """
     
     # Colonne nella lista
     list_display = [
@@ -15,17 +29,32 @@ class AttendanceAdmin(admin.ModelAdmin):
         'created_at'
     ]
     
+    # Relazioni mostrate in lista: una sola query con JOIN
+    list_select_related = ['course_day', 'user']
+    
     # Filtri laterali
-    list_filter = ['status', 'course_day', 'course_day__date']
+    list_filter = [
+        'status',
+        ('course_day__date', DateRangeFilter),
+        ('course_day', AutocompleteFilter),
+        ('user', AutocompleteFilter),
+    ]
     
-    # Campi di ricerca
+    # Campi di ricerca: per prefisso e full-text sulle note, vedi get_search_results
     search_fields = [
         'participant_identifier',
         'user__email',
         'user__first_name',
-        'user__last_name',
-        'notes'
+        'user__last_name'
     ]
+    search_help_text = (
+        'Inizio di identificativo, email, nome o cognome (es. "ross mar"), '
+        'o parole delle note (es. "certificato").'
+    )
+    
+    # Niente COUNT(*) completo a ogni pagina
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Ordinamento default
     ordering = ['-course_day__date', 'participant_identifier']
@@ -54,20 +83,51 @@ class AttendanceAdmin(admin.ModelAdmin):
     # Autocomplete per relazioni
     autocomplete_fields = ['user', 'course_day']
     
-    # Azioni bulk
+    @property
+    def media(self):
+        return super().media + AutocompleteFilter.media(
+            Attendance._meta.get_field('course_day'), self.admin_site
+        )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Prefisso sulle colonne indicizzate, o full-text su note e nomi"""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term) | fulltext.matching(queryset, search_term), False
+    
+    # Azioni bulk (anche su "tutte le N righe" del filtro)
     actions = ['mark_as_present', 'mark_as_absent', 'mark_as_excused']
     
     @admin.action(description='Segna come PRESENTE')
     def mark_as_present(self, request, queryset):
-        updated = queryset.update(status=Attendance.Status.PRESENT)
-        self.message_user(request, f'{updated} presenze aggiornate a PRESENTE.')
+        updated, unchanged = run_write(self._mark_as, queryset, Attendance.Status.PRESENT, request.user)
+        self.message_user(request, self._mark_as_message(updated, unchanged, 'PRESENTE'))
     
     @admin.action(description='Segna come ASSENTE')
     def mark_as_absent(self, request, queryset):
-        updated = queryset.update(status=Attendance.Status.ABSENT)
-        self.message_user(request, f'{updated} presenze aggiornate a ASSENTE.')
+        updated, unchanged = run_write(self._mark_as, queryset, Attendance.Status.ABSENT, request.user)
+        self.message_user(request, self._mark_as_message(updated, unchanged, 'ASSENTE'))
     
     @admin.action(description='Segna come GIUSTIFICATO')
     def mark_as_excused(self, request, queryset):
-        updated = queryset.update(status=Attendance.Status.EXCUSED)
-        self.message_user(request, f'{updated} presenze aggiornate a GIUSTIFICATO.')
+        updated, unchanged = run_write(self._mark_as, queryset, Attendance.Status.EXCUSED, request.user)
+        self.message_user(request, self._mark_as_message(updated, unchanged, 'GIUSTIFICATO'))
+    
+    @staticmethod
+    def _mark_as(queryset, status, actor):
+        """
+        Aggiorna lo stato delle righe che cambiano e le registra nello
+        storico, tutto in SQL: la selezione non passa dalla memoria.
+        Restituisce (righe aggiornate, righe già nello stato).
+        """
+        with transaction.atomic(using=queryset.db, savepoint=False):
+            audit.record_status_change(queryset, status, actor, 'admin')
+            unchanged = queryset.filter(status=status).count()
+            return queryset.exclude(status=status).update(status=status), unchanged
+    
+    @staticmethod
+    def _mark_as_message(updated, unchanged, label):
+        message = f'{updated} presenze aggiornate a {label}'
+        if unchanged:
+            message += f', {unchanged} già in stato {label}'
+        return message + '.'
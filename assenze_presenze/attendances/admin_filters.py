@@ -0,0 +1,82 @@
+"""
+Filtri laterali dell'admin per tabelle grandi.
+
+I filtri standard su ForeignKey e date elencano tutte le opzioni (una
+query e un link per ogni giornata o utente). Questi mostrano invece un
+piccolo form: un intervallo di date o una select con autocompletamento
+(la stessa vista di ``autocomplete_fields``).
+"""
+
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class FormListFilter(admin.FieldListFilter):
+    """Filtro con un form GET che conserva gli altri parametri della changelist"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        # Campi lasciati vuoti nel form: nessun filtro
+        for name, values in list(self.used_parameters.items()):
+            values = [value for value in values if value]
+            if values:
+                self.used_parameters[name] = values
+            else:
+                del self.used_parameters[name]
+        self.other_params = [
+            (name, value)
+            for name, values in request.GET.lists()
+            if name not in self.expected_parameters() and name != 'p'
+            for value in values
+        ]
+
+    def value(self, name):
+        return self.used_parameters.get(name, [''])[-1]
+
+    def choices(self, changelist):
+        yield {
+            'selected': not self.used_parameters,
+            'query_string': changelist.get_query_string(remove=self.expected_parameters()),
+            'display': 'Tutte',
+        }
+
+
+class DateRangeFilter(FormListFilter):
+    """Intervallo di date (da/a) invece dell'elenco delle date"""
+    template = 'admin/attendances/date_range_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg_since = f'{field_path}__gte'
+        self.lookup_kwarg_until = f'{field_path}__lte'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.since = self.value(self.lookup_kwarg_since)
+        self.until = self.value(self.lookup_kwarg_until)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg_since, self.lookup_kwarg_until]
+
+
+class AutocompleteFilter(FormListFilter):
+    """ForeignKey con select ad autocompletamento invece dell'elenco completo"""
+    template = 'admin/attendances/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        # Campo del form per le scelte (queryset pigro): una sola query,
+        # per l'etichetta dell'opzione selezionata
+        widget = field.formfield(
+            widget=AutocompleteSelect(field, model_admin.admin_site), required=False
+        ).widget
+        self.widget = widget.render(
+            self.lookup_kwarg, self.value(self.lookup_kwarg) or None,
+            attrs={'id': f'filter_{field_path}', 'onchange': 'this.form.submit()'}
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    @staticmethod
+    def media(field, admin_site):
+        """Script e stili da aggiungere a ModelAdmin.media"""
+        return AutocompleteSelect(field, admin_site).media
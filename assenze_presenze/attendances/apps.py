@@ -1,7 +1,17 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
 
 
 class AttendancesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendances'
-    verbose_name = 'Presenze'
\ No newline at end of file
+    verbose_name = 'Presenze'
+    
+    def ready(self):
+        # Indice full-text: trigger eliminati da migrazioni successive
+        from . import fulltext
+        from .checks import check_live_broker
+        
+        post_migrate.connect(fulltext.ensure_installed, sender=self)
+        checks.register(check_live_broker)
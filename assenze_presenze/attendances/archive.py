@@ -0,0 +1,184 @@
+"""
+Archivio degli anni accademici passati.
+
+Le presenze e le giornate precedenti al cutoff (primo giorno di un mese,
+di norma l'inizio di un anno accademico) vengono spostate a lotti nelle
+tabelle Archived*: le tabelle "calde" restano piccole e contengono solo
+il periodo corrente.
+
+Le viste in lettura consultano l'archivio solo se l'intervallo richiesto
+lo tocca (``boundary()`` è il cutoff più recente, None se non c'è
+archivio); le statistiche sull'archivio vengono dai riepiloghi mensili
+congelati al momento dell'archiviazione, non dalle righe.
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from course_days.models import CourseDay
+from .models import (
+    Attendance,
+    ArchivedAttendance,
+    ArchivedCourseDay,
+    ArchiveRun,
+    ArchivedMonthSummary,
+    ArchivedParticipantSummary,
+)
+from .stats import status_counts
+
+
+COURSE_DAY_FIELDS = ['id', 'date', 'description', 'is_holiday', 'created_at', 'updated_at']
+ATTENDANCE_FIELDS = [
+    'id', 'user_id', 'course_day_id', 'participant_identifier',
+    'status', 'notes', 'created_at', 'updated_at'
+]
+
+
+def boundary():
+    """Cutoff dell'archivio (escluso), None se l'archivio è vuoto"""
+    return ArchiveRun.objects.filter(
+        completed_at__isnull=False
+    ).aggregate(cutoff=Max('cutoff'))['cutoff']
+
+
+async def aboundary():
+    result = await ArchiveRun.objects.filter(
+        completed_at__isnull=False
+    ).aaggregate(cutoff=Max('cutoff'))
+    return result['cutoff']
+
+
+def parse_month(value):
+    """'2025-01' → date(2025, 1, 1), None se non valido"""
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def is_archived_month(month, cutoff):
+    """Il mese (primo giorno) è interamente nell'archivio?"""
+    return cutoff is not None and month is not None and month < cutoff
+
+
+def academic_year_start(day, years_back=0):
+    """Primo giorno dell'anno accademico che contiene ``day``"""
+    start_month = settings.ACADEMIC_YEAR_START_MONTH
+    year = day.year if day.month >= start_month else day.year - 1
+    return date(year - years_back, start_month, 1)
+
+
+def archive_before(cutoff, batch_size=1000, progress=None):
+    """
+    Sposta nell'archivio giornate e presenze con data < ``cutoff``.
+
+    Ogni lotto di ``batch_size`` presenze è una transazione: copia nelle
+    tabelle di archivio ed eliminazione dalle tabelle calde. L'eliminazione
+    è un DELETE diretto, senza tombstone né eventi live: le righe restano
+    leggibili dall'archivio, i client del sync delta non devono toglierle
+    dalla copia locale. Se il processo
+    si interrompe, una nuova esecuzione riprende dal punto raggiunto.
+    Al termine ricalcola i riepiloghi dei mesi archiviati e registra il
+    nuovo cutoff, che rende l'archivio visibile alle viste.
+    """
+    if cutoff.day != 1:
+        raise ValueError('Il cutoff deve essere il primo giorno di un mese.')
+
+    run = ArchiveRun.objects.create(cutoff=cutoff)
+    old = Attendance.objects.filter(course_day__date__lt=cutoff)
+
+    while True:
+        with transaction.atomic():
+            rows = list(old.order_by('pk').values(*ATTENDANCE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            run.course_days += _copy_course_days({row['course_day_id'] for row in rows})
+            ArchivedAttendance.objects.bulk_create(
+                [ArchivedAttendance(**row) for row in rows],
+                ignore_conflicts=True
+            )
+            moved = Attendance.objects.filter(pk__in=[row['id'] for row in rows])
+            moved._raw_delete(moved.db)
+        run.attendances += len(rows)
+        if progress:
+            progress(run)
+
+    # Giornate rimaste (senza presenze o già svuotate)
+    while True:
+        with transaction.atomic():
+            ids = list(
+                CourseDay.objects.filter(date__lt=cutoff)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            run.course_days += _copy_course_days(ids)
+            CourseDay.objects.filter(pk__in=ids).delete()
+
+    rebuild_summaries()
+    run.completed_at = timezone.now()
+    run.save()
+    return run
+
+
+def _copy_course_days(ids):
+    """Copia nell'archivio le giornate non ancora archiviate"""
+    existing = set(
+        ArchivedCourseDay.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    missing = [pk for pk in ids if pk not in existing]
+    ArchivedCourseDay.objects.bulk_create([
+        ArchivedCourseDay(**row)
+        for row in CourseDay.objects.filter(pk__in=missing).values(*COURSE_DAY_FIELDS)
+    ])
+    return len(missing)
+
+
+@transaction.atomic
+def rebuild_summaries():
+    """
+    Ricalcola i riepiloghi congelati dalle righe archiviate.
+    Eseguito solo dall'archiviazione: le righe archiviate non cambiano
+    più (link-user aggiorna solo il collegamento all'utente).
+    """
+    ArchivedMonthSummary.objects.all().delete()
+    ArchivedMonthSummary.objects.bulk_create([
+        ArchivedMonthSummary(**row)
+        for row in ArchivedCourseDay.objects
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(
+            course_days=Count('id'),
+            holidays=Count('id', filter=Q(is_holiday=True))
+        )
+        .order_by()
+    ])
+
+    ArchivedParticipantSummary.objects.all().delete()
+    ArchivedParticipantSummary.objects.bulk_create([
+        ArchivedParticipantSummary(**row)
+        for row in ArchivedAttendance.objects
+        .filter(course_day__is_holiday=False)
+        .annotate(month=TruncMonth('course_day__date'))
+        .values('month', 'participant_identifier', 'user_id')
+        .annotate(**status_counts())
+        .order_by()
+    ], batch_size=1000)
+
+
+def link_user(identifier, user_id):
+    """Collega l'utente anche alle presenze archiviate e ai riepiloghi"""
+    updated = ArchivedAttendance.objects.filter(
+        participant_identifier=identifier
+    ).update(user_id=user_id)
+    if updated:
+        ArchivedParticipantSummary.objects.filter(
+            participant_identifier=identifier
+        ).update(user_id=user_id)
+    return updated
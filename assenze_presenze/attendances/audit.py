@@ -0,0 +1,216 @@
+"""
+Storico delle modifiche alle presenze (append-only, write-behind).
+
+Ogni percorso di scrittura (API CRUD, bulk, link-user, azioni admin)
+registra chi ha cambiato quale presenza, da quale stato a quale. Le voci
+non vengono scritte riga per riga nella transazione della modifica:
+``record()`` le accoda e le inserisce con un solo bulk_create
+
+- al commit della transazione (AUDIT_FLUSH_MODE='commit', default): un
+  INSERT per transazione, niente voci per modifiche annullate
+- da un thread in background (AUDIT_FLUSH_MODE='background') ogni
+  AUDIT_FLUSH_INTERVAL secondi o appena il buffer raggiunge
+  AUDIT_BUFFER_SIZE voci: le scritture non pagano l'INSERT, a costo di
+  perdere le voci ancora in memoria se il processo muore
+
+Le viste di storico chiamano ``flush()`` prima di leggere, così vedono
+anche le voci in attesa del processo.
+
+Le azioni admin su "tutte le righe che corrispondono al filtro" usano
+``record_status_change``: le voci sono inserite con un INSERT ... SELECT
+nella transazione della modifica, senza passare righe in memoria.
+
+Le voci sono registrate solo quando cambia lo stato o l'utente collegato
+(oltre a creazione ed eliminazione): le modifiche alle sole note non
+entrano nello storico.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import DateTimeField, IntegerField, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import AttendanceAuditEntry
+
+
+logger = logging.getLogger(__name__)
+
+Action = AttendanceAuditEntry.Action
+
+
+def entry(action, attendance_id, course_day_id, identifier, actor=None, source='',
+          old_status='', new_status='', old_user_id=None, new_user_id=None):
+    """Voce di storico con l'istante della modifica (non del flush)"""
+    return AttendanceAuditEntry(
+        attendance_id=attendance_id,
+        course_day_id=course_day_id,
+        participant_identifier=identifier,
+        action=action,
+        old_status=old_status or '',
+        new_status=new_status or '',
+        old_user_id=old_user_id,
+        new_user_id=new_user_id,
+        changed_by_id=getattr(actor, 'pk', actor),
+        source=source,
+        changed_at=timezone.now()
+    )
+
+
+def snapshot(attendance):
+    """Valori tracciati di una presenza, da passare a ``for_save``"""
+    return attendance.status, attendance.user_id
+
+
+def for_save(attendance, before, actor=None, source=''):
+    """
+    Voce per una presenza appena salvata; ``before`` è lo ``snapshot``
+    precedente (None per una creazione). None se nulla di tracciato è cambiato.
+    """
+    if before is None:
+        return entry(
+            Action.CREATE, attendance.pk, attendance.course_day_id,
+            attendance.participant_identifier, actor, source,
+            new_status=attendance.status, new_user_id=attendance.user_id
+        )
+    old_status, old_user_id = before
+    if (old_status, old_user_id) == snapshot(attendance):
+        return None
+    return entry(
+        Action.UPDATE, attendance.pk, attendance.course_day_id,
+        attendance.participant_identifier, actor, source,
+        old_status=old_status, new_status=attendance.status,
+        old_user_id=old_user_id, new_user_id=attendance.user_id
+    )
+
+
+def for_delete(attendance, actor=None, source=''):
+    return entry(
+        Action.DELETE, attendance.pk, attendance.course_day_id,
+        attendance.participant_identifier, actor, source,
+        old_status=attendance.status, old_user_id=attendance.user_id
+    )
+
+
+def _insert(entries):
+    AttendanceAuditEntry.objects.bulk_create(entries, batch_size=settings.AUDIT_BUFFER_SIZE)
+
+
+class AuditBuffer:
+    """Voci già committate in attesa di essere scritte dal flusher"""
+
+    def __init__(self, max_size=500, interval=1.0):
+        self.max_size = max_size
+        self.interval = interval
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, entries):
+        with self._lock:
+            self._entries.extend(entries)
+            full = len(self._entries) >= self.max_size
+        self._ensure_started()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Scrive le voci in attesa; restituisce quante"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+        if entries:
+            try:
+                _insert(entries)
+            except Exception:
+                # Rimesse in coda: riprova al prossimo giro
+                with self._lock:
+                    self._entries[:0] = entries
+                raise
+        return len(entries)
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name='attendance-audit', daemon=True
+                )
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Scrittura dello storico presenze fallita')
+
+
+buffer = AuditBuffer(
+    max_size=settings.AUDIT_BUFFER_SIZE,
+    interval=settings.AUDIT_FLUSH_INTERVAL
+)
+atexit.register(buffer.flush)
+
+
+def record(entries):
+    """
+    Accoda le voci (None ignorate) per la scrittura dopo il commit della
+    transazione corrente; fuori da una transazione subito.
+    """
+    entries = [item for item in entries if item is not None]
+    if not entries:
+        return
+    if settings.AUDIT_FLUSH_MODE == 'background':
+        transaction.on_commit(lambda: buffer.add(entries))
+    else:
+        transaction.on_commit(lambda: _insert(entries))
+
+
+def record_status_change(queryset, status, actor=None, source=''):
+    """
+    Voci UPDATE per le presenze di ``queryset`` che passeranno a ``status``,
+    con un solo INSERT ... SELECT. Va chiamata prima dell'update, nella
+    stessa transazione. Restituisce il numero di voci.
+    """
+    rows = queryset.exclude(status=status).order_by().values_list(
+        'pk', 'course_day_id', 'participant_identifier',
+        Value(Action.UPDATE), 'status', Value(status), 'user_id', 'user_id',
+        # Cast: un NULL senza tipo nella SELECT non si inserisce in una colonna intera (PostgreSQL)
+        Cast(Value(getattr(actor, 'pk', actor)), IntegerField()),
+        Value(source), Value(timezone.now(), output_field=DateTimeField())
+    )
+    select, params = rows.query.sql_with_params()
+    connection = connections[queryset.db]
+    columns = ', '.join(
+        connection.ops.quote_name(AttendanceAuditEntry._meta.get_field(name).column)
+        for name in (
+            'attendance_id', 'course_day_id', 'participant_identifier', 'action',
+            'old_status', 'new_status', 'old_user_id', 'new_user_id',
+            'changed_by', 'source', 'changed_at'
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(AttendanceAuditEntry._meta.db_table)} '
+            f'({columns}) {select}',
+            params
+        )
+        return cursor.rowcount
+
+
+def flush():
+    """Scrive subito le voci in attesa nel buffer del processo"""
+    return buffer.flush()
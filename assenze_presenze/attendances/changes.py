@@ -0,0 +1,117 @@
+"""
+Sync delta per i client offline (tablet, app).
+
+Ogni scrittura su una presenza le assegna un ``change_seq`` dal contatore
+ChangeSequence e aggiorna ``updated_at``; le eliminazioni lasciano una
+AttendanceTombstone con la propria sequenza. Vale anche per le scritture
+SQL su insiemi (azioni admin, link-user, eliminazioni a lotti): vedi
+AttendanceQuerySet. L'archiviazione no: le righe archiviate restano
+leggibili e i client le tengono.
+
+Il token è l'ultima sequenza ricevuta dal client. La risposta contiene
+le righe create/modificate e le eliminazioni con sequenza successiva, in
+ordine, fino a ``limit`` elementi; il client riparte dal ``next`` finché
+``has_more`` è vero. Senza token (o token 0) si ottiene l'intera lista a
+pagine, senza eliminazioni.
+
+Le sequenze diventano visibili nell'ordine in cui sono assegnate (il lock
+sul contatore è tenuto fino al commit): un token non salta mai righe
+committate dopo.
+
+Le tombstone più vecchie di ATTENDANCE_TOMBSTONE_RETENTION_DAYS vengono
+eliminate da ``prune_tombstones`` (comando omonimo): un token precedente
+all'ultima eliminata riceve TokenExpired (410) e il client riparte da zero.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Attendance, AttendanceTombstone, ChangeSequence
+
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+class TokenExpired(ValueError):
+    """Il token precede tombstone già eliminate: serve una sincronizzazione completa"""
+
+
+def parse_params(params):
+    """(since, limit) da ?since=&limit=; ValueError se non validi"""
+    since = params.get('since') or '0'
+    limit = params.get('limit') or DEFAULT_LIMIT
+    try:
+        since = int(since)
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('Parametri since/limit non validi.') from None
+    if since < 0 or limit < 1:
+        raise ValueError('Parametri since/limit non validi.')
+    return since, min(limit, MAX_LIMIT)
+
+
+def participant_tombstones(user):
+    """Eliminazioni visibili al partecipante (stesso criterio di stats.participant_filter)"""
+    return AttendanceTombstone.objects.filter(
+        Q(user_id=user.pk) | Q(participant_identifier=user.email)
+    )
+
+
+def pruned_through():
+    """Ultima sequenza delle tombstone eliminate per scadenza, 0 se nessuna"""
+    return ChangeSequence.objects.filter(
+        name=ChangeSequence.TOMBSTONES_PRUNED
+    ).values_list('value', flat=True).first() or 0
+
+
+@transaction.atomic
+def prune_tombstones(days=None):
+    """
+    Elimina le tombstone più vecchie di ``days`` giorni (default
+    ATTENDANCE_TOMBSTONE_RETENTION_DAYS) e registra l'ultima sequenza
+    eliminata. Restituisce il numero di tombstone eliminate.
+    """
+    if days is None:
+        days = settings.ATTENDANCE_TOMBSTONE_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    last = AttendanceTombstone.objects.filter(
+        deleted_at__lt=cutoff
+    ).aggregate(last=Max('change_seq'))['last']
+    if last is None:
+        return 0
+    ChangeSequence.objects.update_or_create(
+        name=ChangeSequence.TOMBSTONES_PRUNED,
+        defaults={'value': max(last, pruned_through())}
+    )
+    deleted, _ = AttendanceTombstone.objects.filter(change_seq__lte=last).delete()
+    return deleted
+
+
+def changes_since(rows, tombstones, since, limit):
+    """
+    Modifiche dopo ``since`` da due querysets già ristretti ai permessi.
+    Restituisce (righe, eliminazioni, next, has_more); TokenExpired se
+    alcune eliminazioni dopo ``since`` non sono più conservate.
+    """
+    if since and since < pruned_through():
+        raise TokenExpired('Token scaduto: ripetere la sincronizzazione completa (since=0).')
+    changed = list(rows.filter(change_seq__gt=since).order_by('change_seq')[:limit + 1])
+    deleted = []
+    if since:
+        deleted = list(tombstones.filter(change_seq__gt=since).order_by('change_seq')[:limit + 1])
+
+    # Fusione dei due flussi ordinati: i primi ``limit`` per sequenza
+    merged = sorted(changed + deleted, key=lambda item: item.change_seq)
+    page = merged[:limit]
+    next_seq = page[-1].change_seq if page else since
+    return (
+        [item for item in page if isinstance(item, Attendance)],
+        [item for item in page if isinstance(item, AttendanceTombstone)],
+        str(next_seq),
+        len(merged) > limit,
+    )
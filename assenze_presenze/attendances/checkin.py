@@ -0,0 +1,147 @@
+"""
+Check-in dei partecipanti con codice di sessione firmato.
+
+L'admin mostra in aula un codice (QR) generato per la giornata; i
+partecipanti lo scansionano e si segnano presenti da soli. A inizio
+lezione arrivano centinaia di check-in nello stesso minuto:
+
+- il codice è firmato (django.core.signing, SECRET_KEY) e contiene la
+  giornata e l'istante di emissione: si valida senza query e scade dopo
+  CHECKIN_CODE_TTL secondi
+- i check-in non vengono scritti uno per richiesta: il primo di una
+  finestra (CHECKIN_BATCH_WINDOW secondi, o CHECKIN_BATCH_SIZE check-in)
+  raccoglie quelli arrivati nel frattempo e li scrive tutti con un lotto
+  di ``rollcall.apply_marks`` per giornata, in una transazione; ogni
+  richiesta risponde solo dopo il commit del proprio lotto (group commit)
+- una seconda scansione dello stesso partecipante non scrive nulla: nello
+  stesso lotto i check-in sono coalescenti, e una presenza già PRESENT
+  non viene toccata
+
+Il raggruppamento è per processo, come la coda di scrittura (writes.py):
+rende di più con worker a thread o ASGI.
+"""
+
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from course_days.models import CourseDay
+from . import rollcall
+from .models import Attendance
+from .writes import run_write
+
+
+SALT = 'attendances.checkin'
+
+
+class InvalidCode(ValueError):
+    pass
+
+
+def make_code(course_day_id):
+    return signing.dumps(course_day_id, salt=SALT)
+
+
+def parse_code(code):
+    """Giornata del codice; InvalidCode se la firma non torna o è scaduto"""
+    try:
+        return signing.loads(code, salt=SALT, max_age=settings.CHECKIN_CODE_TTL)
+    except signing.SignatureExpired:
+        raise InvalidCode('Codice di check-in scaduto.') from None
+    except signing.BadSignature:
+        raise InvalidCode('Codice di check-in non valido.') from None
+
+
+def apply_checkins(checkins):
+    """
+    Segna presenti ``[(course_day_id, user_id, email)]`` in una transazione.
+    Una presenza già collegata all'utente con un altro identificativo viene
+    riusata; le nuove usano l'email. Restituisce le giornate esistenti.
+    """
+    by_day = defaultdict(dict)
+    for course_day_id, user_id, email in checkins:
+        by_day[course_day_id][user_id] = email
+
+    with transaction.atomic():
+        valid = set(CourseDay.objects.filter(pk__in=list(by_day)).values_list('pk', flat=True))
+        for course_day_id in valid:
+            users = by_day[course_day_id]
+            linked = dict(
+                Attendance.objects.filter(course_day_id=course_day_id, user_id__in=list(users))
+                .values_list('user_id', 'participant_identifier')
+            )
+            rollcall.apply_marks(
+                course_day_id,
+                {linked.get(user_id, email): (Attendance.Status.PRESENT, None)
+                 for user_id, email in users.items()},
+                None, 'checkin',
+                user_ids={email: user_id for user_id, email in users.items() if user_id not in linked}
+            )
+    return valid
+
+
+class CheckInBatcher:
+    """
+    Group commit dei check-in del processo; finestra e dimensione del
+    lotto da CHECKIN_BATCH_WINDOW/CHECKIN_BATCH_SIZE se non indicate.
+    """
+
+    def __init__(self, window=None, max_batch=None):
+        self.window = window
+        self.max_batch = max_batch
+        # Contatori per i benchmark
+        self.batches = 0
+        self.checkins = 0
+        self._pending = {}
+        self._leading = False
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+
+    def submit(self, course_day_id, user):
+        """Segna presente l'utente; ritorna dopo il commit del lotto"""
+        with self._lock:
+            key = (course_day_id, user.pk)
+            if key not in self._pending:
+                self._pending[key] = (user.email, Future())
+            future = self._pending[key][1]
+            if len(self._pending) >= (self.max_batch or settings.CHECKIN_BATCH_SIZE):
+                self._full.set()
+            leader = not self._leading
+            self._leading = True
+
+        if leader:
+            self._lead()
+        future.result()
+
+    def _lead(self):
+        window = settings.CHECKIN_BATCH_WINDOW if self.window is None else self.window
+        if window:
+            self._full.wait(window)
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._leading = False
+            self._full.clear()
+            self.batches += 1
+            self.checkins += len(batch)
+
+        try:
+            valid = run_write(apply_checkins, [
+                (course_day_id, user_id, email)
+                for (course_day_id, user_id), (email, _) in batch.items()
+            ])
+        except Exception as exc:
+            for _, future in batch.values():
+                future.set_exception(exc)
+            return
+        for (course_day_id, _), (_, future) in batch.items():
+            if course_day_id in valid:
+                future.set_result(course_day_id)
+            else:
+                future.set_exception(InvalidCode('Giornata di corso non trovata.'))
+
+
+batcher = CheckInBatcher()
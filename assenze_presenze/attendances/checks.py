@@ -0,0 +1,32 @@
+"""
+Controlli di sistema (``manage.py check``, eseguiti anche all'avvio).
+
+Il roll-call live (live.py) arriva agli osservatori tramite il broker
+LIVE_BROKER. LocalBroker consegna i messaggi solo nel processo che li
+pubblica: con più processi web una scrittura servita da un processo non
+aggiorna gli osservatori collegati agli altri.
+"""
+
+from django.conf import settings
+from django.core import checks
+from django.utils.module_loading import import_string
+
+from .live import LocalBroker
+
+
+PROCESS_LOCAL_BROKERS = (LocalBroker,)
+
+
+def check_live_broker(app_configs, **kwargs):
+    """attendances.E001: broker del processo con WEB_CONCURRENCY > 1"""
+    broker = settings.LIVE_BROKER
+    if settings.WEB_CONCURRENCY <= 1 or not issubclass(import_string(broker), PROCESS_LOCAL_BROKERS):
+        return []
+    return [checks.Error(
+        f'WEB_CONCURRENCY={settings.WEB_CONCURRENCY} con il broker {broker}, '
+        'privato di ogni processo: gli osservatori del roll-call live non '
+        'riceverebbero le scritture servite dagli altri processi.',
+        hint='Impostare LIVE_BROKER su un broker tra processi (Redis pub/sub, '
+             'LISTEN/NOTIFY di PostgreSQL), o WEB_CONCURRENCY=1.',
+        id='attendances.E001',
+    )]
@@ -0,0 +1,131 @@
+"""
+Eliminazione veloce di giornate e utenti con molte presenze.
+
+Il collector di Django, e soprattutto la pagina di conferma dell'admin
+che elenca ogni oggetto collegato, non reggono un mese di giornate con
+migliaia di presenze. Qui il lavoro dipendente è fatto con statement SQL
+su insiemi di chiavi, a lotti di BULK_DELETE_BATCH righe (ognuno una
+transazione, passando dalla coda di scrittura se attiva): nessuna
+presenza viene caricata come oggetto e il lock del DB è tenuto poco.
+
+Oltre BULK_DELETE_SYNC_LIMIT presenze coinvolte l'API esegue gli stessi
+lotti su un thread in background e risponde subito.
+
+Consistenza: le giornate sono eliminate per ultime, con i segnali che
+invalidano il calendario in memoria; i riepiloghi dell'archivio restano
+legati al partecipante (identificativo) e perdono solo il collegamento
+all'utente eliminato.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from course_days import calendar
+from course_days.models import CourseDay
+from .models import Attendance, ArchivedAttendance, ArchivedParticipantSummary
+from .writes import run_write
+
+
+logger = logging.getLogger(__name__)
+
+# Giornate/utenti eliminati per statement
+KEYS_PER_STATEMENT = 500
+
+
+def _chunks(values, size=KEYS_PER_STATEMENT):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _batched(operation, *args, batch_size):
+    """Ripete ``operation`` (un lotto per transazione) finché il lotto non è pieno"""
+    total = 0
+    while True:
+        done = run_write(operation, *args, batch_size)
+        total += done
+        if done < batch_size:
+            return total
+
+
+@transaction.atomic
+def _delete_attendance_batch(course_day_ids, batch_size):
+    pks = list(
+        Attendance.objects.filter(course_day_id__in=course_day_ids)
+        .order_by().values_list('pk', flat=True)[:batch_size]
+    )
+    if pks:
+        Attendance.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+@transaction.atomic
+def _detach_batch(model, user_ids, batch_size):
+    pks = list(
+        model.objects.filter(user_id__in=user_ids)
+        .order_by().values_list('pk', flat=True)[:batch_size]
+    )
+    if pks:
+        model.objects.filter(pk__in=pks).update(user_id=None)
+    return len(pks)
+
+
+def count_course_day_attendances(course_day_ids):
+    return Attendance.objects.filter(course_day_id__in=list(course_day_ids)).count()
+
+
+def count_user_attendances(user_ids):
+    return Attendance.objects.filter(user_id__in=list(user_ids)).count()
+
+
+def delete_course_days(course_day_ids, batch_size=None):
+    """
+    Elimina le giornate e le loro presenze.
+    Restituisce (giornate eliminate, presenze eliminate).
+    """
+    batch_size = batch_size or settings.BULK_DELETE_BATCH
+    course_days = attendances = 0
+    for chunk in _chunks(course_day_ids):
+        attendances += _batched(_delete_attendance_batch, chunk, batch_size=batch_size)
+        # Ormai senza presenze: il collector non ha più nulla da caricare
+        _, per_model = run_write(CourseDay.objects.filter(pk__in=chunk).delete)
+        course_days += per_model.get(CourseDay._meta.label, 0)
+    calendar.changed()
+    return course_days, attendances
+
+
+def remove_users(user_ids, batch_size=None):
+    """
+    Elimina gli utenti scollegando prima, a lotti, presenze e riepiloghi
+    (SET_NULL). Restituisce (utenti eliminati, presenze scollegate).
+    """
+    batch_size = batch_size or settings.BULK_DELETE_BATCH
+    user_model = get_user_model()
+    users = attendances = 0
+    for chunk in _chunks(user_ids):
+        attendances += _batched(_detach_batch, Attendance, chunk, batch_size=batch_size)
+        _batched(_detach_batch, ArchivedAttendance, chunk, batch_size=batch_size)
+        _batched(_detach_batch, ArchivedParticipantSummary, chunk, batch_size=batch_size)
+        _, per_model = run_write(user_model.objects.filter(pk__in=chunk).delete)
+        users += per_model.get(user_model._meta.label, 0)
+    return users, attendances
+
+
+def run_in_background(func, *args):
+    """Esegue ``func`` su un thread separato (con connessioni proprie)"""
+    def target():
+        try:
+            result = func(*args)
+            logger.info('%s completata: %s', func.__name__, result)
+        except Exception:
+            logger.exception('%s fallita', func.__name__)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name=f'bulk-{func.__name__}', daemon=True)
+    thread.start()
+    return thread
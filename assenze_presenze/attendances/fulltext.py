@@ -0,0 +1,197 @@
+"""
+Ricerca full-text su note e nomi dei partecipanti (SQLite FTS5).
+
+``notes__icontains`` è un LIKE '%...%' su tutte le righe. Su SQLite le
+note e i nomi (identificativo, nome e cognome dell'utente collegato)
+sono invece in una tabella FTS5, ``attendances_attendance_fts``, con
+rowid = id della presenza:
+
+- la tabella è tenuta allineata da trigger sul DB (insert, update di
+  note/identificativo/utente, delete, nome/cognome dell'utente): vale per
+  ogni percorso di scrittura, anche bulk_create, update di queryset,
+  eliminazioni a cascata e SQL diretto (seed_scale)
+- i termini sono cercati per prefisso, senza maiuscole né accenti
+  ('certif rit' trova "Certificato per ritardo"), tutti obbligatori
+- i risultati sono ordinati per rilevanza (bm25, i nomi pesano più delle
+  note) con un estratto evidenziato delle note
+
+Le migrazioni che ricostruiscono attendances_attendance o
+users_customuser su SQLite (molti AlterField) eliminano anche i
+trigger: vanno chiuse con ``install`` (vedi 0007_fulltext), e comunque
+``ensure_installed`` (post_migrate, apps.py) li reinstalla se mancano.
+Gli inserimenti massivi (seed_scale) tolgono l'indice e lo ricostruiscono
+una volta sola alla fine, invece di un trigger per riga.
+
+Sugli altri database (PostgreSQL) non c'è indice: ``search`` ripiega su
+note__icontains e sulla ricerca per prefisso dei nomi, ordinati per
+ultima modifica.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from config.search import terms
+from .models import Attendance
+
+
+TABLE = 'attendances_attendance_fts'
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Pesi bm25 delle colonne (notes, names)
+WEIGHTS = (1.0, 2.0)
+# Delimitatori dei termini trovati nell'estratto, resi poi come [termine]
+MARKS = ('\x02', '\x03')
+
+NAMES = (
+    "{row}.participant_identifier || ' ' || COALESCE(("
+    "SELECT first_name || ' ' || last_name FROM users_customuser WHERE id = {row}.user_id"
+    "), '')"
+)
+
+INSTALL = [
+    f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+    "notes, names, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+
+    f"CREATE TRIGGER {TABLE}_insert AFTER INSERT ON attendances_attendance BEGIN "
+    f"INSERT INTO {TABLE} (rowid, notes, names) "
+    f"VALUES (NEW.id, NEW.notes, {NAMES.format(row='NEW')}); "
+    "END",
+
+    f"CREATE TRIGGER {TABLE}_update "
+    "AFTER UPDATE OF notes, participant_identifier, user_id ON attendances_attendance "
+    "WHEN OLD.notes IS NOT NEW.notes "
+    "OR OLD.participant_identifier IS NOT NEW.participant_identifier "
+    "OR OLD.user_id IS NOT NEW.user_id BEGIN "
+    f"UPDATE {TABLE} SET notes = NEW.notes, names = {NAMES.format(row='NEW')} "
+    "WHERE rowid = NEW.id; "
+    "END",
+
+    f"CREATE TRIGGER {TABLE}_delete AFTER DELETE ON attendances_attendance BEGIN "
+    f"DELETE FROM {TABLE} WHERE rowid = OLD.id; "
+    "END",
+
+    # Nome o cognome cambiati: si aggiornano le presenze collegate
+    f"CREATE TRIGGER {TABLE}_user_update AFTER UPDATE OF first_name, last_name ON users_customuser "
+    "WHEN OLD.first_name IS NOT NEW.first_name OR OLD.last_name IS NOT NEW.last_name BEGIN "
+    f"UPDATE {TABLE} SET names = ("
+    f"SELECT {NAMES.format(row='a')} FROM attendances_attendance a WHERE a.id = {TABLE}.rowid"
+    ") WHERE rowid IN (SELECT id FROM attendances_attendance WHERE user_id = NEW.id); "
+    "END",
+
+    f"INSERT INTO {TABLE} (rowid, notes, names) "
+    f"SELECT a.id, a.notes, {NAMES.format(row='a')} FROM attendances_attendance a",
+]
+
+TRIGGERS = [f'{TABLE}_insert', f'{TABLE}_update', f'{TABLE}_delete', f'{TABLE}_user_update']
+
+UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_user_update",
+    f"DROP TRIGGER IF EXISTS {TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {TABLE}_insert",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+
+def available(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def install(connection):
+    """(Ri)crea tabella e trigger e reindicizza tutte le presenze"""
+    with connection.cursor() as cursor:
+        for statement in UNINSTALL + INSTALL:
+            cursor.execute(statement)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        for statement in UNINSTALL:
+            cursor.execute(statement)
+
+
+def installed(connection):
+    """Tabella e tutti i trigger presenti"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * (len(TRIGGERS) + 1))
+            ),
+            [TABLE, *TRIGGERS]
+        )
+        return cursor.fetchone()[0] == len(TRIGGERS) + 1
+
+
+def ensure_installed(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Ricevitore di post_migrate: reinstalla (e reindicizza) se una
+    migrazione successiva a 0007_fulltext ha eliminato tabella o trigger.
+    Restituisce True se ha reinstallato.
+    """
+    connection = connections[using]
+    if not available(using):
+        return False
+    if ('attendances', '0007_fulltext') not in MigrationRecorder(connection).applied_migrations():
+        return False
+    if installed(connection):
+        return False
+    install(connection)
+    return True
+
+
+def match_expression(query):
+    """'Certificato rit' → '"certificato"* "rit"*' (prefissi, tutti obbligatori)"""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms(query))
+
+
+def parse_params(params):
+    """(query, limit, offset) da ?q=&limit=&offset=; ValueError se non validi"""
+    query = params.get('q', '')
+    if not match_expression(query):
+        raise ValueError("Parametro 'q' obbligatorio.")
+    try:
+        limit = int(params.get('limit') or DEFAULT_LIMIT)
+        offset = int(params.get('offset') or 0)
+    except ValueError:
+        raise ValueError('Parametri limit/offset non validi.') from None
+    if limit < 1 or offset < 0:
+        raise ValueError('Parametri limit/offset non validi.')
+    return query, min(limit, MAX_LIMIT), offset
+
+
+def matching(queryset, query):
+    """Presenze di ``queryset`` che corrispondono a ``query`` (senza ordinamento)"""
+    if available(queryset.db):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match_expression(query)]
+        ))
+    for term in terms(query):
+        queryset = queryset.filter(
+            Q(notes__icontains=term) | Q(pk__in=Attendance.objects.search(term).values('pk'))
+        )
+    return queryset
+
+
+def search(query, limit, offset, using):
+    """
+    Pagina di risultati per rilevanza: [(id, estratto delle note)].
+    L'estratto è None se le note non contengono i termini (o senza FTS5).
+    """
+    if not available(using):
+        ids = (
+            matching(Attendance.objects.using(using), query)
+            .order_by('-change_seq').values_list('pk', flat=True)[offset:offset + limit]
+        )
+        return [(pk, None) for pk in ids]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, snippet({TABLE}, 0, %s, %s, '…', 12) FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s ORDER BY bm25({TABLE}, %s, %s) LIMIT %s OFFSET %s",
+            [*MARKS, match_expression(query), *WEIGHTS, limit, offset]
+        )
+        return [
+            (pk, snippet.replace(MARKS[0], '[').replace(MARKS[1], ']') if MARKS[0] in snippet else None)
+            for pk, snippet in cursor.fetchall()
+        ]
@@ -0,0 +1,284 @@
+"""
+Roll-call in diretta: eventi SSE per giornata (solo ASGI).
+
+Formatori e display seguivano la compilazione del registro facendo
+polling su by-course-day, ricalcolando lista e statistiche a ogni
+richiesta. Qui il lato scrittura pubblica una sola notifica per commit
+e ogni processo la distribuisce ai propri osservatori:
+
+    scrittura ──commit──▶ broker ──▶ Hub del processo ──▶ Channel (giornata)
+                                                          └─▶ N code SSE
+
+- Le scritture sulle presenze (Attendance.save/delete e AttendanceQuerySet)
+  chiamano ``publish_changes`` al commit con le giornate toccate, o None
+  quando non sono note (update SQL su insiemi): tutte le giornate
+  osservate si aggiornano.
+- Il broker (LIVE_BROKER) porta la notifica a ogni processo. LocalBroker
+  è il sostituto in-process di un broker tra processi (Redis pub/sub,
+  LISTEN/NOTIFY di PostgreSQL): stessa interfaccia, messaggi serializzati
+  in JSON come sul filo.
+- Ogni Channel, alla notifica, legge una volta sola le modifiche dopo
+  l'ultima sequenza inviata (change_seq, vedi changes.py) e le statistiche
+  della giornata, codifica l'evento e lo mette nelle code di tutti gli
+  osservatori. Raffiche di scritture sono coalescenti: al più un
+  aggiornamento ogni LIVE_MIN_INTERVAL secondi per giornata.
+
+Gli eventi portano ``id: <change_seq>``: un client che si riconnette con
+Last-Event-ID riceve solo le modifiche perse.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+from . import stats
+from .models import Attendance, AttendanceTombstone
+from .serializers import AttendanceSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# Campi delle righe negli eventi (vedi SparseFieldsMixin)
+LIVE_FIELDS = [
+    'id', 'user', 'user_full_name', 'participant_identifier',
+    'status', 'status_display', 'notes', 'updated_at'
+]
+
+renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+
+# --- Lettura: eventi di una giornata ---
+
+def _rows(course_day_id):
+    # change_seq (id degli eventi) arriva da AttendanceSerializer.required_columns
+    return AttendanceSerializer.sparse_queryset(
+        Attendance.objects.filter(course_day_id=course_day_id), LIVE_FIELDS
+    )
+
+
+def _event(kind, course_day_id, seq, rows, deleted):
+    """Frame SSE (bytes) con righe, eliminazioni e statistiche della giornata"""
+    day_stats = Attendance.objects.filter(course_day_id=course_day_id).aggregate(
+        total=Count('id'), **stats.status_counts()
+    )
+    data = renderer.render({
+        "course_day_id": course_day_id,
+        "changes": AttendanceSerializer(rows, many=True, fields=LIVE_FIELDS).data,
+        "deleted": deleted,
+        "stats": day_stats
+    })
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (seq, kind.encode(), data)
+
+
+def snapshot(course_day_id):
+    """(sequenza, frame) con tutte le presenze della giornata"""
+    rows = list(_rows(course_day_id))
+    seq = max(
+        [row.change_seq for row in rows] + [
+            AttendanceTombstone.objects.filter(course_day_id=course_day_id)
+            .aggregate(seq=Max('change_seq'))['seq'] or 0
+        ]
+    )
+    return seq, _event('snapshot', course_day_id, seq, rows, [])
+
+
+def delta(course_day_id, since, force=False):
+    """
+    (sequenza, frame) con le modifiche dopo ``since``; (since, None) se
+    non ce ne sono, salvo ``force``.
+    """
+    rows = list(_rows(course_day_id).filter(change_seq__gt=since).order_by('change_seq'))
+    tombstones = list(
+        AttendanceTombstone.objects.filter(course_day_id=course_day_id, change_seq__gt=since)
+        .values_list('change_seq', 'attendance_id')
+    )
+    if not rows and not tombstones and not force:
+        return since, None
+    seq = max([since] + [row.change_seq for row in rows] + [seq for seq, _ in tombstones])
+    return seq, _event('changes', course_day_id, seq, rows, [pk for _, pk in tombstones])
+
+
+# --- Distribuzione nel processo ---
+
+class Channel:
+    """Osservatori di una giornata nello stesso event loop"""
+
+    def __init__(self, course_day_id, last_seq, loop):
+        self.course_day_id = course_day_id
+        self.last_seq = last_seq
+        self.loop = loop
+        self.watchers = set()
+        self._dirty = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            if self.last_seq is None:
+                # Snapshot del primo osservatore in corso: poi segna di nuovo
+                continue
+            try:
+                seq, frame = await sync_to_async(delta)(self.course_day_id, self.last_seq)
+            except Exception:
+                logger.exception('Aggiornamento live della giornata %s fallito', self.course_day_id)
+                continue
+            if frame is not None:
+                self.last_seq = seq
+                for queue in self.watchers:
+                    queue.put_nowait(frame)
+            # Coalescenza: le notifiche arrivate nel frattempo diventano un solo giro
+            await asyncio.sleep(settings.LIVE_MIN_INTERVAL)
+
+    def close(self):
+        self._task.cancel()
+
+
+class Hub:
+    """Canali per giornata del processo; ``notify`` è thread-safe"""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def subscribe(self, course_day_id, since=None):
+        """
+        Coda di frame SSE per la giornata. Il primo frame è lo snapshot,
+        o le modifiche dopo ``since`` (riconnessione).
+        """
+        _ensure_listening()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        # Registrata prima dello snapshot: nessuna modifica va persa
+        channel = self._join(course_day_id, queue, loop)
+        try:
+            if since is None:
+                seq, frame = await sync_to_async(snapshot)(course_day_id)
+            else:
+                seq, frame = await sync_to_async(delta)(course_day_id, since, force=True)
+            if channel.last_seq is None:
+                channel.last_seq = seq
+                # Modifiche notificate durante lo snapshot
+                channel.mark_dirty()
+            queue.put_nowait(frame)
+            yield queue
+        finally:
+            self._leave(channel, queue)
+
+    def _join(self, course_day_id, queue, loop):
+        with self._lock:
+            channel = self._channels.get((course_day_id, loop))
+            if channel is None:
+                channel = Channel(course_day_id, None, loop)
+                self._channels[(course_day_id, loop)] = channel
+            channel.watchers.add(queue)
+            return channel
+
+    def _leave(self, channel, queue):
+        with self._lock:
+            channel.watchers.discard(queue)
+            if channel.watchers:
+                return
+            self._channels.pop((channel.course_day_id, channel.loop), None)
+        channel.close()
+
+    def watched(self):
+        with self._lock:
+            return {course_day_id for course_day_id, _ in self._channels}
+
+    def notify(self, message):
+        """Callback del broker: segna da aggiornare le giornate osservate"""
+        course_day_ids = message.get('course_day_ids')
+        with self._lock:
+            channels = [
+                channel for (course_day_id, _), channel in self._channels.items()
+                if course_day_ids is None or course_day_id in course_day_ids
+            ]
+        for channel in channels:
+            try:
+                channel.loop.call_soon_threadsafe(channel.mark_dirty)
+            except RuntimeError:
+                # Event loop chiuso: il canale se ne va con lui
+                with self._lock:
+                    self._channels.pop((channel.course_day_id, channel.loop), None)
+
+
+hub = Hub()
+
+
+# --- Broker tra processi ---
+
+class LocalBroker:
+    """
+    Sostituto in-process di un broker tra processi: i messaggi passano
+    da JSON come su Redis pub/sub e arrivano ai listener dello stesso
+    processo. Con più processi va sostituito (LIVE_BROKER) da un broker
+    con ``publish(message)`` e ``subscribe(listener)``: il controllo
+    attendances.E001 (checks.py) lo impone se WEB_CONCURRENCY > 1.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        payload = json.dumps(message)
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(json.loads(payload))
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+_listening = False
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_BROKER)()
+    return _broker
+
+
+def _ensure_listening():
+    """Il hub del processo si iscrive al broker al primo osservatore"""
+    global _listening
+    if not _listening:
+        broker = get_broker()
+        with _broker_lock:
+            if not _listening:
+                _listening = True
+                broker.subscribe(hub.notify)
+
+
+def publish_changes(course_day_ids):
+    """
+    Da chiamare al commit di una scrittura sulle presenze (vedi models.py).
+    ``course_day_ids``: giornate toccate, None se non note.
+    """
+    try:
+        get_broker().publish({
+            'course_day_ids': sorted(course_day_ids) if course_day_ids is not None else None
+        })
+    except Exception:
+        # Il live è accessorio: la scrittura è già committata
+        logger.exception('Notifica live fallita')
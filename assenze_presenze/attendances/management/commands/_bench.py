@@ -0,0 +1,202 @@
+"""
+Utility condivise dai comandi di benchmark (bench_*).
+
+Non è un comando: il prefisso ``_`` lo esclude da ``manage.py help``.
+"""
+
+import importlib
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.test.utils import setup_test_environment
+from django.urls import clear_url_caches
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+BENCH_PARTICIPANT_EMAIL = 'bench.participant@example.com'
+BENCH_ADMIN_EMAIL = 'bench.admin@example.com'
+# Prefisso di utenti e identificativi creati dai benchmark
+BENCH_PREFIX = 'bench.'
+
+
+def percentiles(samples):
+    """Riassume una lista di durate (secondi) in millisecondi"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(pick(0.50), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class Timer:
+    """Context manager che misura la durata in secondi"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def prepare():
+    """
+    Prepara il processo per il test client: aggiunge ``testserver`` agli
+    ALLOWED_HOSTS e disattiva DEBUG, che altrimenti accumula le query.
+    """
+    setup_test_environment(debug=False)
+
+
+def auth_header(user):
+    """
+    Header Authorization con un access token JWT per l'utente, nella forma
+    ``headers=`` accettata sia da Client che da AsyncClient.
+    """
+    return {'headers': {'Authorization': f'Bearer {AccessToken.for_user(user)}'}}
+
+
+def bench_admin():
+    """Restituisce (creandolo se serve) l'admin usato dai benchmark"""
+    from users.models import CustomUser
+
+    user, created = CustomUser.objects.get_or_create(
+        email=BENCH_ADMIN_EMAIL,
+        defaults={
+            'username': 'bench.admin',
+            'first_name': 'Bench',
+            'last_name': 'Admin',
+            'role': CustomUser.Role.ADMIN,
+        }
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    return user
+
+
+def bench_participant(days=60):
+    """
+    Restituisce un partecipante con presenze su ``days`` giornate,
+    creando utente, giornate e presenze mancanti.
+    """
+    from attendances.models import Attendance
+    from course_days.models import CourseDay
+    from users.models import CustomUser
+
+    user, created = CustomUser.objects.get_or_create(
+        email=BENCH_PARTICIPANT_EMAIL,
+        defaults={
+            'username': 'bench.participant',
+            'first_name': 'Bench',
+            'last_name': 'Participant',
+            'role': CustomUser.Role.PARTICIPANT,
+        }
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+
+    if not CourseDay.objects.exists():
+        start = timezone.now().date() - timedelta(days=days // 2)
+        CourseDay.objects.bulk_create([
+            CourseDay(date=start + timedelta(days=i), description=f'Lezione {i + 1}')
+            for i in range(days)
+        ])
+
+    existing = set(
+        Attendance.objects.filter(user=user).values_list('course_day_id', flat=True)
+    )
+    statuses = [Attendance.Status.PRESENT] * 8 + [Attendance.Status.ABSENT, Attendance.Status.EXCUSED]
+    Attendance.objects.bulk_create([
+        Attendance(
+            user=user,
+            course_day_id=course_day_id,
+            participant_identifier=user.email,
+            status=statuses[i % len(statuses)],
+        )
+        for i, course_day_id in enumerate(
+            CourseDay.objects.values_list('id', flat=True)[:days]
+        )
+        if course_day_id not in existing
+    ], ignore_conflicts=True)
+    return user
+
+
+@contextmanager
+def bench_data():
+    """
+    Elimina all'uscita i dati scritti dai benchmark sul database in uso.
+
+    Utenti e presenze dei benchmark hanno email/identificativo ``bench.*``:
+    le presenze sono eliminate con il loro storico (le tombstone restano,
+    così i client che le avevano sincronizzate le tolgono), così come lo
+    storico scritto dall'admin di benchmark, gli utenti ``bench.*`` e le
+    giornate create durante il benchmark rimaste senza presenze.
+    """
+    from attendances.models import Attendance, AttendanceAuditEntry
+    from course_days.models import CourseDay
+    from users.models import CustomUser
+
+    last_course_day = CourseDay.objects.aggregate(last=Max('id'))['last'] or 0
+    try:
+        yield
+    finally:
+        with transaction.atomic():
+            bench_users = CustomUser.objects.filter(email__startswith=BENCH_PREFIX)
+            Attendance.objects.filter(participant_identifier__startswith=BENCH_PREFIX).delete()
+            AttendanceAuditEntry.objects.filter(
+                Q(participant_identifier__startswith=BENCH_PREFIX)
+                | Q(changed_by__in=bench_users)
+            ).delete()
+            bench_users.delete()
+            CourseDay.objects.filter(
+                id__gt=last_course_day, attendances__isnull=True
+            ).delete()
+
+
+@contextmanager
+def restoring(queryset, *fields):
+    """
+    Ripristina all'uscita i valori di ``fields`` delle righe del queryset,
+    con un UPDATE per ogni combinazione di valori.
+    """
+    saved = {}
+    for row in queryset.values('pk', *fields):
+        saved.setdefault(tuple(row[field] for field in fields), []).append(row['pk'])
+    try:
+        yield
+    finally:
+        manager = queryset.model._default_manager
+        with transaction.atomic():
+            for values, pks in saved.items():
+                manager.filter(pk__in=pks).update(**dict(zip(fields, values)))
+
+
+def reload_urlconf(async_views):
+    """
+    Ricarica gli urlconf con le viste sincrone o asincrone.
+
+    Le viste sono scelte all'import in base a ASYNC_PARTICIPANT_VIEWS,
+    quindi per confrontarle nello stesso processo vanno re-importati.
+    """
+    from django.conf import settings
+
+    settings.ASYNC_PARTICIPANT_VIEWS = async_views
+    for module in ('attendances.urls', 'users.urls', settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
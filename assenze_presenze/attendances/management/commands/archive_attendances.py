@@ -0,0 +1,63 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendances.archive import academic_year_start, archive_before, boundary
+from attendances.models import Attendance
+from course_days.models import CourseDay
+
+
+class Command(BaseCommand):
+    """
+    Sposta nell'archivio gli anni accademici passati.
+
+    Di default archivia tutto ciò che precede l'anno accademico corrente
+    (ACADEMIC_YEAR_START_MONTH); ``--keep-years 2`` mantiene anche il
+    precedente, ``--before`` indica un cutoff esplicito (primo del mese).
+    Il lavoro procede a lotti di ``--batch-size`` presenze, ognuno in una
+    transazione: il comando si può interrompere e rilanciare.
+
+        python manage.py archive_attendances --dry-run
+        python manage.py archive_attendances --keep-years 1 --batch-size 5000
+    """
+    help = 'Archivia presenze e giornate degli anni accademici passati'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat, default=None,
+                            help='Cutoff (YYYY-MM-01): archivia le date precedenti')
+        parser.add_argument('--keep-years', type=int, default=1,
+                            help='Anni accademici da lasciare nelle tabelle calde')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            cutoff = options['before']
+        else:
+            if options['keep_years'] < 1:
+                raise CommandError('--keep-years deve essere almeno 1.')
+            cutoff = academic_year_start(timezone.now().date(), options['keep_years'] - 1)
+        if cutoff.day != 1:
+            raise CommandError('Il cutoff deve essere il primo giorno di un mese.')
+
+        current = boundary()
+        if current is not None and cutoff < current:
+            raise CommandError(f'L\'archivio arriva già al {current}.')
+
+        course_days = CourseDay.objects.filter(date__lt=cutoff).count()
+        attendances = Attendance.objects.filter(course_day__date__lt=cutoff).count()
+        self.stdout.write(
+            f'Da archiviare (prima del {cutoff}): {course_days} giornate, {attendances} presenze'
+        )
+        if options['dry_run']:
+            return
+
+        def progress(run):
+            self.stdout.write(f'  {run.attendances}/{attendances} presenze archiviate')
+
+        run = archive_before(cutoff, options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archiviate {run.course_days} giornate e {run.attendances} presenze '
+            f'(archivio fino al {run.cutoff}, escluso).'
+        ))
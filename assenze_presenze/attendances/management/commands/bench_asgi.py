@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+
+from ._bench import (
+    Timer, auth_header, bench_data, bench_participant, percentiles, prepare, reload_urlconf
+)
+
+
+ENDPOINTS = [
+    '/api/participant/attendances/',
+    '/api/participant/stats/',
+    '/api/participant/profile/',
+    '/api/me/',
+]
+
+
+class Command(BaseCommand):
+    """
+    Confronta le viste partecipante sincrone (WSGI) e asincrone (ASGI).
+
+    Il percorso WSGI è servito da un pool di ``--threads`` thread, come un
+    worker gthread; quello ASGI da un unico event loop. Le richieste partono
+    a ondate di ``--concurrency`` client simultanei e la latenza include
+    l'attesa in coda, cioè quella percepita dal client.
+
+    Esempio:
+        python manage.py bench_asgi --requests 400 --concurrency 100
+    """
+    help = 'Benchmark viste partecipante: WSGI (thread) contro ASGI (async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Richieste per endpoint')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Client simultanei per ondata')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Thread del worker WSGI simulato')
+        parser.add_argument('--json', action='store_true',
+                            help='Stampa i risultati in JSON')
+
+    def handle(self, *args, **options):
+        prepare()
+        results = {}
+
+        with bench_data():
+            headers = auth_header(bench_participant())
+            for endpoint in ENDPOINTS:
+                reload_urlconf(async_views=False)
+                results[f'wsgi {endpoint}'] = self.run_wsgi(endpoint, headers, options)
+                reload_urlconf(async_views=True)
+                results[f'asgi {endpoint}'] = asyncio.run(
+                    self.run_asgi(endpoint, headers, options)
+                )
+            reload_urlconf(async_views=False)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<45} {stats['throughput_rps']:>9.1f} req/s  "
+                f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  "
+                f"errori {stats['errors']}"
+            )
+
+    def run_wsgi(self, endpoint, headers, options):
+        latencies, errors = [], 0
+
+        def call(submitted_at):
+            client = Client()
+            response = client.get(endpoint, **headers)
+            close_old_connections()
+            return time.perf_counter() - submitted_at, response.status_code
+
+        with Timer() as total, ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for wave in self.waves(options):
+                now = time.perf_counter()
+                futures = [pool.submit(call, now) for _ in range(wave)]
+                for future in futures:
+                    elapsed, status_code = future.result()
+                    latencies.append(elapsed)
+                    errors += status_code != 200
+
+        return self.summary(latencies, errors, total.elapsed)
+
+    async def run_asgi(self, endpoint, headers, options):
+        latencies, errors = [], 0
+        client = AsyncClient()
+
+        async def call(submitted_at):
+            response = await client.get(endpoint, **headers)
+            return time.perf_counter() - submitted_at, response.status_code
+
+        with Timer() as total:
+            for wave in self.waves(options):
+                now = time.perf_counter()
+                for elapsed, status_code in await asyncio.gather(
+                    *(call(now) for _ in range(wave))
+                ):
+                    latencies.append(elapsed)
+                    errors += status_code != 200
+
+        return self.summary(latencies, errors, total.elapsed)
+
+    def waves(self, options):
+        remaining = options['requests']
+        while remaining > 0:
+            wave = min(options['concurrency'], remaining)
+            remaining -= wave
+            yield wave
+
+    def summary(self, latencies, errors, elapsed):
+        stats = percentiles(latencies)
+        stats['errors'] = errors
+        stats['throughput_rps'] = round(len(latencies) / elapsed, 1) if elapsed else 0.0
+        return stats
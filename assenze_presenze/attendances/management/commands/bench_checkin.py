@@ -0,0 +1,160 @@
+import json
+import random
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from attendances import checkin
+from attendances.models import Attendance
+from course_days.models import CourseDay
+from users.models import CustomUser
+from ._bench import auth_header, percentiles, prepare
+
+
+CHECKIN_EMAIL_DOMAIN = 'checkin.example.com'
+
+
+class Command(BaseCommand):
+    """
+    Raffica di check-in a inizio lezione.
+
+    ``--checkins`` partecipanti (creati se mancano) scansionano il codice
+    della giornata di benchmark con arrivi casuali in ``--duration``
+    secondi, da ``--concurrency`` thread nello stesso processo (come un
+    worker a thread); una quota ``--repeat`` scansiona due volte. Riporta
+    latenze, lotti scritti e verifica che ogni partecipante abbia una sola
+    presenza PRESENT.
+
+        python manage.py bench_checkin --checkins 1000 --duration 60
+        python manage.py bench_checkin --window 0     # un lotto per check-in
+    """
+    help = 'Benchmark dei check-in concorrenti dei partecipanti'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkins', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=60.0)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--repeat', type=float, default=0.05,
+                            help='Quota di partecipanti che scansionano due volte')
+        parser.add_argument('--window', type=float, default=None,
+                            help='Finestra del lotto in secondi (default: CHECKIN_BATCH_WINDOW)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true',
+                            help='Stampa i risultati in JSON')
+
+    def handle(self, *args, **options):
+        prepare()
+        rng = random.Random(options['seed'])
+        users = self.checkin_users(options['checkins'])
+        course_day = self.checkin_day()
+
+        code = checkin.make_code(course_day.pk)
+        scans = [(user, auth_header(user)['headers']) for user in users]
+        scans += rng.sample(scans, int(len(scans) * options['repeat']))
+        arrivals = sorted(rng.uniform(0, options['duration']) for _ in scans)
+        rng.shuffle(scans)
+        plan = list(zip(arrivals, scans))
+
+        checkin.batcher = checkin.CheckInBatcher(window=options['window'])
+        samples, errors = [], []
+        lock = threading.Lock()
+        started = time.perf_counter()
+
+        def worker(jobs):
+            client = Client()
+            url = reverse('participant-checkin')
+            for arrival, (user, headers) in jobs:
+                delay = started + arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                begin = time.perf_counter()
+                response = client.post(url, {'code': code}, content_type='application/json',
+                                       headers=headers)
+                elapsed = time.perf_counter() - begin
+                with lock:
+                    samples.append(elapsed)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(plan[n::options['concurrency']],))
+            for n in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        rows = Attendance.objects.filter(course_day=course_day, user__in=users)
+        present = rows.filter(status=Attendance.Status.PRESENT).count()
+        if rows.count() != len(users) or present != len(users):
+            raise CommandError(
+                f'Attese {len(users)} presenze PRESENT, trovate {present} su {rows.count()}.'
+            )
+
+        results = {
+            'checkins': len(plan),
+            'participants': len(users),
+            'duration_s': round(wall, 2),
+            'errors': len(errors),
+            'batches': checkin.batcher.batches,
+            'checkins_per_batch': round(checkin.batcher.checkins / max(checkin.batcher.batches, 1), 2),
+            'latency': percentiles(samples),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        latency = results['latency']
+        self.stdout.write(
+            f"{results['checkins']} check-in ({results['participants']} partecipanti) "
+            f"in {results['duration_s']} s, {results['errors']} errori"
+        )
+        self.stdout.write(
+            f"Lotti scritti: {results['batches']} "
+            f"({results['checkins_per_batch']} check-in per lotto)"
+        )
+        self.stdout.write(
+            f"Latenza p50 {latency['p50_ms']:.2f} ms  p95 {latency['p95_ms']:.2f} ms  "
+            f"p99 {latency['p99_ms']:.2f} ms  max {latency['max_ms']:.2f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(f'{present} presenze PRESENT, una per partecipante'))
+
+    @staticmethod
+    def checkin_users(count):
+        """Partecipanti del benchmark, creati senza hashing della password"""
+        existing = CustomUser.objects.filter(email__endswith=f'@{CHECKIN_EMAIL_DOMAIN}').count()
+        password = make_password(None)
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                email=f'checkin{n}@{CHECKIN_EMAIL_DOMAIN}',
+                username=f'bench.checkin{n}',
+                first_name='Check-in',
+                last_name=str(n),
+                password=password,
+                role=CustomUser.Role.PARTICIPANT,
+            )
+            for n in range(existing, count)
+        ])
+        return list(
+            CustomUser.objects.filter(email__endswith=f'@{CHECKIN_EMAIL_DOMAIN}').order_by('id')[:count]
+        )
+
+    @staticmethod
+    def checkin_day():
+        """Giornata di oggi del benchmark, senza presenze dei partecipanti"""
+        course_day, _ = CourseDay.objects.get_or_create(
+            date=timezone.localdate(), defaults={'description': 'Benchmark check-in'}
+        )
+        Attendance.objects.filter(
+            course_day=course_day, participant_identifier__endswith=f'@{CHECKIN_EMAIL_DOMAIN}'
+        ).delete()
+        return course_day
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+from django.test import Client
+
+from course_days.models import CourseDay
+from ._bench import auth_header, bench_admin, bench_data, bench_participant, percentiles, prepare
+
+
+class Command(BaseCommand):
+    """
+    Latenza delle letture dei partecipanti durante scritture bulk concorrenti.
+
+    ``--writers`` thread inviano di continuo POST a /api/admin/attendances/bulk/
+    mentre ``--readers`` thread leggono presenze e statistiche. Va lanciato una
+    volta per profilo database, per confrontarli; al termine utenti, giornate
+    e presenze scritte dal benchmark sono eliminate (vedi ``bench_data``):
+
+        DB_PROFILE=sqlite-basic python manage.py bench_db
+        DB_PROFILE=sqlite python manage.py bench_db
+        DB_PROFILE=postgresql DB_POOL=1 python manage.py bench_db
+        ATTENDANCE_WRITE_QUEUE=1 python manage.py bench_db
+    """
+    help = 'Benchmark letture sotto scritture bulk concorrenti per il profilo DB attivo'
+
+    READ_ENDPOINTS = ['/api/participant/attendances/', '/api/participant/stats/']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Durata del test in secondi')
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--batch', type=int, default=50,
+                            help='Presenze per ogni richiesta bulk')
+        parser.add_argument('--json', action='store_true',
+                            help='Stampa i risultati in JSON')
+
+    def handle(self, *args, **options):
+        prepare()
+        with bench_data():
+            results = self.run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        queue = ' + coda di scrittura' if settings.ATTENDANCE_WRITE_QUEUE else ''
+        self.stdout.write(f"Profilo: {results['profile']}{queue}")
+        for kind in ('read', 'write'):
+            stats = results[kind]
+            if not stats['count']:
+                self.stdout.write(f'{kind:<6} nessuna richiesta completata')
+                continue
+            self.stdout.write(
+                f"{kind:<6} {stats['count']:>6} ok  p50 {stats['p50_ms']:>8.2f} ms  "
+                f"p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms"
+            )
+        self.stdout.write(f"Righe scritte/s: {results['rows_written_per_s']}")
+        errors = results['errors']
+        self.stdout.write(
+            f"Errori: letture {errors['read']}, scritture {errors['write']} "
+            f"(database is locked: {errors['locked']})"
+        )
+
+    def run(self, options):
+        participant_headers = auth_header(bench_participant())
+        admin_headers = auth_header(bench_admin())
+        course_day_ids = list(CourseDay.objects.values_list('id', flat=True))
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_latencies, write_latencies = [], []
+        errors = {'read': 0, 'write': 0, 'locked': 0}
+
+        def record(kind, latencies, elapsed, ok, locked=False):
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[kind] += 1
+                    errors['locked'] += locked
+
+        def reader(n):
+            client = Client()
+            i = 0
+            while not stop.is_set():
+                endpoint = self.READ_ENDPOINTS[i % len(self.READ_ENDPOINTS)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    ok = client.get(endpoint, **participant_headers).status_code == 200
+                    locked = False
+                except OperationalError as exc:
+                    ok, locked = False, 'locked' in str(exc)
+                record('read', read_latencies, time.perf_counter() - start, ok, locked)
+            close_old_connections()
+
+        def writer(n):
+            client = Client()
+            i = 0
+            while not stop.is_set():
+                payload = {
+                    'course_day_id': course_day_ids[i % len(course_day_ids)],
+                    'attendances': [
+                        {
+                            'participant_identifier': f'bench.w{n}.{j}@example.com',
+                            'status': ('PRESENT', 'ABSENT', 'EXCUSED')[(i + j) % 3],
+                        }
+                        for j in range(options['batch'])
+                    ],
+                }
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = client.post(
+                        '/api/admin/attendances/bulk/',
+                        data=json.dumps(payload),
+                        content_type='application/json',
+                        **admin_headers
+                    )
+                    ok, locked = response.status_code == 201, False
+                except OperationalError as exc:
+                    ok, locked = False, 'locked' in str(exc)
+                record('write', write_latencies, time.perf_counter() - start, ok, locked)
+            close_old_connections()
+
+        threads = [
+            threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])
+        ] + [
+            threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        return {
+            'profile': settings.DB_PROFILE,
+            'read': percentiles(read_latencies),
+            'write': percentiles(write_latencies),
+            'rows_written_per_s': round(
+                len(write_latencies) * options['batch'] / options['duration'], 1
+            ),
+            'errors': errors,
+        }
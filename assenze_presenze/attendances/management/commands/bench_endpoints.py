@@ -0,0 +1,251 @@
+import json
+import time
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendances.models import Attendance, ArchivedAttendance, ArchivedParticipantSummary
+from course_days.models import CourseDay
+from users.models import CustomUser
+from ._bench import auth_header, bench_admin, bench_data, percentiles, prepare, restoring
+from .seed_scale import SEED_EMAIL_DOMAIN
+
+
+# Dimensioni dei dataset: parametri di seed_scale (utenti, giornate)
+SIZES = {
+    '1k': {'users': 10, 'days': 100},
+    '100k': {'users': 500, 'days': 200},
+    '1m': {'users': 5000, 'days': 200},
+}
+
+# Sopra questa soglia la lista admin completa (non paginata) non è misurata
+FULL_LIST_MAX_ROWS = 100_000
+
+SEED_PASSWORD = 'password123'
+
+
+class Command(BaseCommand):
+    """
+    Benchmark di ogni endpoint API con soglie di regressione.
+
+    Per ogni endpoint misura latenza (p50/p95/p99), numero di query e picco
+    di memoria (tracemalloc) e confronta con la baseline JSON della stessa
+    dimensione di dataset. Esce con errore se una metrica supera la baseline
+    oltre la tolleranza. Le scritture dei casi admin sono annullate alla
+    fine: righe ``bench.*`` e admin di benchmark eliminati (``bench_data``),
+    stato e collegamenti delle righe esistenti ripristinati.
+
+        python manage.py bench_endpoints --size 100k --seed-dataset --save-baseline
+        python manage.py bench_endpoints --size 100k --tolerance 0.25
+    """
+    help = 'Benchmark per endpoint con confronto rispetto alla baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES, default='1k')
+        parser.add_argument('--seed-dataset', action='store_true',
+                            help='Rigenera il dataset con seed_scale --flush-all '
+                                 '(elimina TUTTE le giornate e le presenze)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Non chiede conferma per --seed-dataset')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--baseline-dir', default=str(settings.BASE_DIR / 'benchmarks'))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Salva i risultati come nuova baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Peggioramento ammesso su latenza e memoria (0.2 = +20%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignora peggioramenti di latenza sotto questa soglia assoluta')
+        parser.add_argument('--query-tolerance', type=int, default=0,
+                            help='Query in più ammesse rispetto alla baseline')
+        parser.add_argument('--only', nargs='*', default=None,
+                            help='Misura solo gli endpoint indicati')
+
+    def handle(self, *args, **options):
+        prepare()
+        size = options['size']
+        if options['seed_dataset']:
+            call_command(
+                'seed_scale', flush_all=True, interactive=options['interactive'],
+                stdout=self.stdout, **SIZES[size]
+            )
+        if not CourseDay.objects.filter(attendances__isnull=False).exists():
+            raise CommandError('Dataset vuoto: usare --seed-dataset.')
+
+        results = {
+            'size': size,
+            'dataset': {
+                'users': CustomUser.objects.count(),
+                'course_days': CourseDay.objects.count(),
+                'attendances': Attendance.objects.count(),
+            },
+            'endpoints': {},
+        }
+
+        with ExitStack() as cleanup:
+            cleanup.enter_context(bench_data())
+            for name, call in self.cases(results['dataset'], cleanup).items():
+                if options['only'] and name not in options['only']:
+                    continue
+                results['endpoints'][name] = self.measure(call, options['iterations'])
+                stats = results['endpoints'][name]
+                self.stdout.write(
+                    f"{name:<28} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                    f"query {stats['queries']:>5}  picco {stats['peak_kib']:>9.1f} KiB"
+                )
+
+        baseline_path = Path(options['baseline_dir']) / f'{size}.json'
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline salvata in {baseline_path}'))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(f'Nessuna baseline in {baseline_path}: confronto saltato.')
+            return
+
+        regressions = self.compare(
+            json.loads(baseline_path.read_text()), results,
+            options['tolerance'], options['query_tolerance'], options['min_delta_ms']
+        )
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f'{len(regressions)} regressioni rispetto a {baseline_path}')
+        self.stdout.write(self.style.SUCCESS('Nessuna regressione rispetto alla baseline.'))
+
+    def cases(self, dataset, cleanup):
+        """
+        Endpoint da misurare: nome → funzione che esegue una richiesta.
+        Le righe esistenti modificate dai casi sono ripristinate all'uscita
+        da ``cleanup``.
+        """
+        client = Client()
+        admin = auth_header(bench_admin())
+        participant = CustomUser.objects.filter(
+            email__endswith=f'@{SEED_EMAIL_DOMAIN}'
+        ).order_by('id').first()
+        participant_headers = auth_header(participant)
+
+        course_day = CourseDay.objects.filter(attendances__isnull=False).order_by('date').first()
+        attendance = Attendance.objects.filter(course_day=course_day).order_by('id').first()
+        month = timezone.now().strftime('%Y-%m')
+        counter = iter(range(10 ** 9))
+
+        # attendances-update cambia lo stato, attendances-link-user il collegamento
+        cleanup.enter_context(restoring(Attendance.objects.filter(pk=attendance.pk), 'status', 'notes'))
+        for model in (Attendance, ArchivedAttendance, ArchivedParticipantSummary):
+            cleanup.enter_context(restoring(
+                model.objects.filter(participant_identifier=participant.email), 'user_id'
+            ))
+
+        def post(path, data, headers):
+            return client.post(path, data=json.dumps(data), content_type='application/json', **headers)
+
+        def create_and_destroy():
+            response = post('/api/admin/attendances/', {
+                'course_day': course_day.id,
+                'participant_identifier': f'bench.create{next(counter)}@example.com',
+                'status': 'PRESENT',
+            }, admin)
+            client.delete(f"/api/admin/attendances/{response.json()['data']['id']}/", **admin)
+            return response
+
+        cases = {
+            'attendances-list-month': lambda: client.get(
+                f'/api/admin/attendances/?month={month}', **admin),
+            'attendances-retrieve': lambda: client.get(
+                f'/api/admin/attendances/{attendance.id}/', **admin),
+            'attendances-update': lambda: client.patch(
+                f'/api/admin/attendances/{attendance.id}/',
+                data=json.dumps({'status': ('PRESENT', 'ABSENT')[next(counter) % 2]}),
+                content_type='application/json', **admin),
+            'attendances-create-destroy': create_and_destroy,
+            'attendances-bulk': lambda: post('/api/admin/attendances/bulk/', {
+                'course_day_id': course_day.id,
+                'attendances': [
+                    {'participant_identifier': f'bench.bulk{j}@example.com', 'status': 'PRESENT'}
+                    for j in range(50)
+                ],
+            }, admin),
+            'attendances-link-user': lambda: post('/api/admin/attendances/link-user/', {
+                'user_id': participant.id,
+                'participant_identifier': participant.email,
+            }, admin),
+            'attendances-by-course-day': lambda: client.get(
+                f'/api/admin/attendances/by-course-day/{course_day.id}/', **admin),
+            'course-days-list': lambda: client.get('/api/admin/course-days/', **admin),
+            'course-days-retrieve': lambda: client.get(
+                f'/api/admin/course-days/{course_day.id}/', **admin),
+            'participant-attendances': lambda: client.get(
+                '/api/participant/attendances/', **participant_headers),
+            'participant-stats': lambda: client.get(
+                '/api/participant/stats/', **participant_headers),
+            'participant-profile': lambda: client.get(
+                '/api/participant/profile/', **participant_headers),
+            'me': lambda: client.get('/api/me/', **participant_headers),
+            'login': lambda: post('/api/auth/login/', {
+                'email': participant.email, 'password': SEED_PASSWORD}, {}),
+        }
+        if dataset['attendances'] <= FULL_LIST_MAX_ROWS:
+            cases['attendances-list'] = lambda: client.get('/api/admin/attendances/', **admin)
+        return cases
+
+    def measure(self, call, iterations):
+        # Latenza senza tracing, poi una richiesta strumentata per query e memoria
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = call()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'Risposta {response.status_code}: {response.content[:200]!r}'
+                )
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                call()
+                _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        stats = percentiles(latencies)
+        stats['queries'] = len(queries)
+        stats['peak_kib'] = round((peak - current) / 1024, 1)
+        return stats
+
+    def compare(self, baseline, results, tolerance, query_tolerance, min_delta_ms):
+        if baseline['size'] != results['size']:
+            raise CommandError('La baseline è di un\'altra dimensione di dataset.')
+
+        regressions = []
+        for name, current in results['endpoints'].items():
+            previous = baseline['endpoints'].get(name)
+            if previous is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'peak_kib'):
+                limit = previous[metric] * (1 + tolerance)
+                if metric.endswith('_ms'):
+                    limit = max(limit, previous[metric] + min_delta_ms)
+                if current[metric] > limit:
+                    regressions.append(
+                        f'{name}: {metric} {current[metric]} > {limit:.2f} '
+                        f'(baseline {previous[metric]})'
+                    )
+            if current['queries'] > previous['queries'] + query_tolerance:
+                regressions.append(
+                    f"{name}: query {current['queries']} > {previous['queries']} (baseline)"
+                )
+        return regressions
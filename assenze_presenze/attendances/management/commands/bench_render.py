@@ -0,0 +1,107 @@
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+
+from attendances.models import Attendance
+from attendances.serializers import AttendanceSerializer
+from course_days.models import CourseDay
+from users.models import CustomUser
+from ._bench import Timer, percentiles
+
+
+class Command(BaseCommand):
+    """
+    Tempo di rendering JSON di una lista admin di presenze.
+
+    Costruisce in memoria (senza DB) ``--rows`` presenze con giornata e
+    utente, le serializza come GET /api/admin/attendances/ e misura il
+    solo rendering con il JSONRenderer di DRF e con ``--renderer``.
+    Verifica che l'output sia identico byte per byte.
+
+        python manage.py bench_render --rows 10000
+        python manage.py bench_render --renderer config.renderers.FastJSONRenderer --json
+    """
+    help = 'Benchmark del renderer JSON su una lista di presenze'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--renderer', default='config.renderers.FastJSONRenderer')
+        parser.add_argument('--json', action='store_true',
+                            help='Stampa i risultati in JSON')
+
+    def handle(self, *args, **options):
+        payload = {
+            'success': True,
+            'count': options['rows'],
+            'data': AttendanceSerializer(self.build_rows(options['rows']), many=True).data,
+        }
+        renderers = {
+            'stdlib': JSONRenderer(),
+            'candidate': import_string(options['renderer'])(),
+        }
+
+        outputs = {name: renderer.render(payload) for name, renderer in renderers.items()}
+        if outputs['stdlib'] != outputs['candidate']:
+            raise CommandError(f"{options['renderer']} non produce gli stessi byte di JSONRenderer.")
+
+        results = {
+            'rows': options['rows'],
+            'bytes': len(outputs['stdlib']),
+            'renderer': options['renderer'],
+        }
+        for name, renderer in renderers.items():
+            samples = []
+            for _ in range(options['iterations']):
+                with Timer() as timer:
+                    renderer.render(payload)
+                samples.append(timer.elapsed)
+            results[name] = percentiles(samples)
+        results['speedup'] = round(
+            results['stdlib']['p50_ms'] / max(results['candidate']['p50_ms'], 1e-6), 2
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{results['rows']} presenze, {results['bytes']} byte")
+        for name in renderers:
+            stats = results[name]
+            self.stdout.write(
+                f"{name:<10} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Speedup p50: {results['speedup']}x"))
+
+    @staticmethod
+    def build_rows(count):
+        """Presenze non salvate con giornata e utente già collegati"""
+        start = date(2025, 1, 7)
+        created = datetime(2025, 1, 7, 9, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        course_days = [
+            CourseDay(pk=n + 1, date=start + timedelta(days=7 * n), description=f'Lezione {n + 1}')
+            for n in range(40)
+        ]
+        users = [
+            CustomUser(pk=n + 1, email=f'partecipante{n}@example.com',
+                       first_name='Niccolò', last_name=f'Partecipante {n}')
+            for n in range(count // len(course_days) + 1)
+        ]
+        statuses = list(Attendance.Status.values)
+        rows = []
+        for n in range(count):
+            user = users[n // len(course_days)]
+            rows.append(Attendance(
+                pk=n + 1,
+                user=user,
+                course_day=course_days[n % len(course_days)],
+                participant_identifier=user.email,
+                status=statuses[n % len(statuses)],
+                notes='Certificato medico' if n % 5 == 0 else '',
+                created_at=created + timedelta(minutes=n),
+                updated_at=created + timedelta(minutes=n, seconds=1),
+            ))
+        return rows
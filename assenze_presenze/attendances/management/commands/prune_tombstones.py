@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from attendances.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    """
+    Elimina le tombstone del sync delta più vecchie della finestra di
+    conservazione (ATTENDANCE_TOMBSTONE_RETENTION_DAYS). Da lanciare
+    periodicamente; i client con un token precedente ricevono 410 e
+    ripartono da una sincronizzazione completa.
+
+        python manage.py prune_tombstones
+        python manage.py prune_tombstones --days 30
+    """
+    help = 'Elimina le tombstone del sync delta oltre la finestra di conservazione'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Giorni di conservazione (default: ATTENDANCE_TOMBSTONE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Eliminate {deleted} tombstone.'))
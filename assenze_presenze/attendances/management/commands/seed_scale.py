@@ -0,0 +1,222 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendances import fulltext
+from attendances.models import Attendance, AttendanceAuditEntry, AttendanceTombstone, ChangeSequence
+from config.search import normalize
+from course_days.models import CourseDay
+from users.models import CustomUser
+
+
+SEED_EMAIL_DOMAIN = 'seed.example.com'
+GUEST_EMAIL_DOMAIN = 'guest.example.com'
+
+# Distribuzione base degli stati; ogni partecipante ha una sua "assiduità"
+STATUS_WEIGHTS = [
+    (Attendance.Status.PRESENT, 0.82),
+    (Attendance.Status.ABSENT, 0.12),
+    (Attendance.Status.EXCUSED, 0.06),
+]
+NOTES = {
+    Attendance.Status.ABSENT: ['', '', '', 'ritardo', 'uscita anticipata'],
+    Attendance.Status.EXCUSED: ['certificato medico', 'permesso', 'visita medica'],
+}
+
+
+class Command(BaseCommand):
+    """
+    Genera un dataset sintetico di grandi dimensioni, deterministico dal seed.
+
+    - ``--users`` partecipanti registrati, più ``--unregistered`` identificativi
+      senza utente (presenze registrate prima della registrazione)
+    - ``--days`` giornate feriali consecutive, circa ``--holiday-ratio`` festive
+    - una presenza per partecipante per ogni giornata non festiva; per i
+      registrati una quota ``--linked-ratio`` ha ``user`` valorizzato, le altre
+      sono collegate solo tramite ``participant_identifier`` (l'email)
+
+    Le presenze sono inserite con INSERT a lotti (executemany) in un'unica
+    transazione, senza istanziare i modelli:
+
+        python manage.py seed_scale --users 5000 --days 200 --flush-all
+        (≈ 1M presenze)
+
+    Il dataset non convive con giornate esistenti: ``--flush-all`` svuota
+    prima TUTTE le giornate e le presenze del database (non solo quelle
+    generate da qui) e chiede conferma, salvo ``--noinput``.
+    """
+    help = 'Genera utenti, giornate e presenze sintetiche per test di scala'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--unregistered', type=int, default=None,
+                            help='Identificativi senza utente (default: 10%% di --users)')
+        parser.add_argument('--days', type=int, default=100)
+        parser.add_argument('--start', type=date.fromisoformat, default=None,
+                            help='Prima giornata (YYYY-MM-DD, default: metà corso = oggi)')
+        parser.add_argument('--holiday-ratio', type=float, default=0.03)
+        parser.add_argument('--linked-ratio', type=float, default=0.7)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--flush-all', action='store_true',
+                            help='Elimina prima TUTTE le giornate e le presenze, con storico e '
+                                 'tombstone (non solo quelle seed), e gli utenti seed')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Non chiede conferma per --flush-all')
+
+    def handle(self, *args, **options):
+        if options['flush_all'] and options['interactive'] and not self.confirm_flush():
+            self.stdout.write('Operazione annullata.')
+            return
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if not options['flush_all'] and CourseDay.objects.exists():
+                raise CommandError(
+                    'Esistono già giornate di corso: usare --flush-all per rigenerare.'
+                )
+
+            # Senza trigger FTS durante DELETE e INSERT (uno per riga):
+            # l'indice è ricostruito alla fine con un solo INSERT ... SELECT
+            reindex = fulltext.available(connection.alias)
+            if reindex:
+                fulltext.uninstall(connection)
+            if options['flush_all']:
+                self.flush()
+            users = self.create_users(options)
+            course_days = self.create_course_days(rng, options)
+            total = self.create_attendances(rng, users, course_days, options)
+            if reindex:
+                fulltext.install(connection)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Creati {len(users)} utenti, {len(course_days)} giornate, '
+            f'{total} presenze in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def confirm_flush(self):
+        answer = input(
+            f"--flush-all elimina tutte le {CourseDay.objects.count()} giornate e le "
+            f"{Attendance.objects.count()} presenze del database "
+            f"'{connection.settings_dict['NAME']}', non solo quelle seed.\n"
+            "Digitare 'si' per continuare: "
+        )
+        return answer.strip().lower() in ('si', 'sì')
+
+    def flush(self):
+        # DELETE diretti: AttendanceQuerySet.delete leggerebbe ogni riga per
+        # lasciarne la tombstone. Storico e tombstone del dataset precedente
+        # non servono più; l'indice full-text è già stato tolto (vedi handle)
+        for model in (AttendanceAuditEntry, AttendanceTombstone, Attendance):
+            model.objects.all()._raw_delete(connection.alias)
+        CourseDay.objects.all().delete()
+        CustomUser.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').delete()
+
+    def create_users(self, options):
+        # Un solo hash per tutti: PBKDF2 per ogni utente richiederebbe minuti
+        password = make_password('password123')
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                email=f'user{i}@{SEED_EMAIL_DOMAIN}',
+                username=f'seed_user{i}',
+                first_name=f'Nome{i}',
+                last_name=f'Cognome{i}',
+                password=password,
+                role=CustomUser.Role.PARTICIPANT,
+            )
+            for i in range(options['users'])
+        ], batch_size=options['batch_size'])
+        return list(
+            CustomUser.objects
+            .filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+            .order_by('id')
+            .values_list('id', 'email')
+        )
+
+    def create_course_days(self, rng, options):
+        start = options['start']
+        if start is None:
+            # Il corso è a metà: circa metà delle giornate sono passate
+            start = timezone.now().date() - timedelta(days=options['days'] * 7 // 10)
+
+        days = []
+        current = start
+        while len(days) < options['days']:
+            if current.weekday() < 5:
+                days.append(current)
+            current += timedelta(days=1)
+
+        CourseDay.objects.bulk_create([
+            CourseDay(
+                date=day,
+                description=f'Lezione {i + 1}',
+                is_holiday=rng.random() < options['holiday_ratio'],
+            )
+            for i, day in enumerate(days)
+        ], batch_size=options['batch_size'])
+        return list(
+            CourseDay.objects.filter(is_holiday=False).order_by('date').values_list('id', flat=True)
+        )
+
+    def create_attendances(self, rng, users, course_day_ids, options):
+        unregistered = options['unregistered']
+        if unregistered is None:
+            unregistered = options['users'] // 10
+
+        participants = [
+            (email, user_id if rng.random() < options['linked_ratio'] else None)
+            for user_id, email in users
+        ] + [
+            (f'guest{i}@{GUEST_EMAIL_DOMAIN}', None)
+            for i in range(unregistered)
+        ]
+
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        base_weights = [weight for _, weight in STATUS_WEIGHTS]
+
+        meta = Attendance._meta
+        columns = ['user', 'course_day', 'participant_identifier', 'status', 'notes',
+                   'created_at', 'updated_at', 'change_seq', 'search_identifier']
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(meta.db_table),
+            ', '.join(connection.ops.quote_name(meta.get_field(c).column) for c in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        now = timezone.now()
+        total = 0
+        rows = []
+        # Sequenze del flusso di modifiche (changes.py) riservate in blocco
+        change_seq = ChangeSequence.reserve(max(len(participants) * len(course_day_ids), 1))
+
+        with connection.cursor() as cursor:
+            for identifier, user_id in participants:
+                search_identifier = normalize(identifier, 255)
+                # Assiduità individuale: sposta peso tra presente e assente
+                shift = rng.uniform(-0.15, 0.1)
+                weights = [base_weights[0] + shift, base_weights[1] - shift, base_weights[2]]
+                for course_day_id, status in zip(
+                    course_day_ids,
+                    rng.choices(statuses, weights=weights, k=len(course_day_ids))
+                ):
+                    notes = rng.choice(NOTES[status]) if status in NOTES else ''
+                    rows.append((
+                        user_id, course_day_id, identifier, status, notes, now, now,
+                        change_seq, search_identifier
+                    ))
+                    change_seq += 1
+                    if len(rows) >= options['batch_size']:
+                        cursor.executemany(sql, rows)
+                        total += len(rows)
+                        rows = []
+            if rows:
+                cursor.executemany(sql, rows)
+                total += len(rows)
+
+        return total
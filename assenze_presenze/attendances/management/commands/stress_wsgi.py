@@ -0,0 +1,236 @@
+import http.client
+import json
+import os
+import random
+import signal
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from course_days.models import CourseDay
+from users.models import CustomUser
+from ._bench import auth_header, bench_admin, bench_data, percentiles
+from .seed_scale import SEED_EMAIL_DOMAIN
+
+
+SEED_PASSWORD = 'password123'
+
+# Mix di traffico: (nome, peso)
+MIX = [
+    ('participant-attendances', 40),
+    ('participant-stats', 30),
+    ('admin-bulk', 10),
+    ('login', 10),
+    ('admin-export-month', 5),
+    ('admin-by-course-day', 5),
+]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """
+    Stress test dell'applicazione WSGI sotto carico misto.
+
+    Avvia ``config.wsgi.application`` su un server pre-fork (``--workers``
+    processi, un worker = una richiesta alla volta come un worker sync di
+    gunicorn) e lo bombarda con un mix realistico: polling dei partecipanti,
+    bulk degli admin, raffiche di login ed export mensili. Per ogni livello
+    di concorrenza riporta throughput, latenze di coda ed errori per
+    endpoint. Tutto in locale, senza rete esterna; richiede un dataset
+    creato con seed_scale.
+
+        python manage.py seed_scale --users 500 --days 200 --flush-all
+        python manage.py stress_wsgi --workers 4 --concurrency 1 8 32 64
+
+    Con ``--url`` il carico va a un server già avviato (es. gunicorn).
+    """
+    help = 'Carico misto concorrente contro l\'applicazione WSGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--url', default=None,
+                            help='host:porta di un server esterno (non avvia il pre-fork)')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Secondi per ogni livello di concorrenza')
+        parser.add_argument('--participants', type=int, default=200,
+                            help='Partecipanti distinti usati dal polling')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        participants = list(
+            CustomUser.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+            .order_by('id')[:options['participants']]
+        )
+        course_day_ids = list(
+            CourseDay.objects.filter(is_holiday=False).values_list('id', flat=True)
+        )
+        if not participants or not course_day_ids:
+            raise CommandError('Dataset vuoto: eseguire prima seed_scale.')
+
+        with bench_data():
+            results = self.run(participants, course_day_ids, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.report(results)
+
+    def run(self, participants, course_day_ids, options):
+        self.fixtures = {
+            'participants': [
+                (user.email, auth_header(user)['headers']) for user in participants
+            ],
+            'admin': auth_header(bench_admin())['headers'],
+            'course_day_ids': course_day_ids,
+            'month': CourseDay.objects.order_by('date').values_list('date', flat=True)[
+                len(course_day_ids) // 2
+            ].strftime('%Y-%m'),
+        }
+
+        pids = []
+        if options['url']:
+            host, _, port = options['url'].partition(':')
+            address = (host, int(port or 80))
+        else:
+            address = ('127.0.0.1', options['port'])
+            pids = self.start_server(address, options['workers'])
+
+        try:
+            return {
+                concurrency: self.run_level(address, concurrency, options)
+                for concurrency in options['concurrency']
+            }
+        finally:
+            for pid in pids:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+
+    def start_server(self, address, workers):
+        """Server pre-fork: socket aperto nel padre, condiviso dai worker"""
+        from config.wsgi import application
+
+        # Come in produzione: niente DEBUG, host locali ammessi
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+        server = make_server(*address, application, handler_class=QuietHandler)
+        server.request_queue_size = 1024
+        connections.close_all()
+
+        pids = []
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+                try:
+                    server.serve_forever()
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        server.socket.close()
+        return pids
+
+    def run_level(self, address, concurrency, options):
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        samples = {name: [] for name, _ in MIX}
+        errors = {name: 0 for name, _ in MIX}
+        names = [name for name, _ in MIX]
+        weights = [weight for _, weight in MIX]
+
+        def client(n):
+            rng = random.Random(options['seed'] * 1000 + n)
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights=weights)[0]
+                method, path, body, headers = self.build_request(name, rng)
+                start = time.perf_counter()
+                try:
+                    connection = http.client.HTTPConnection(*address, timeout=60)
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    connection.close()
+                    ok = response.status < 400
+                except OSError:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        samples[name].append(elapsed)
+                    else:
+                        errors[name] += 1
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        level = {}
+        for name in names:
+            stats = percentiles(samples[name])
+            total = len(samples[name]) + errors[name]
+            stats['throughput_rps'] = round(len(samples[name]) / elapsed, 1)
+            stats['errors'] = errors[name]
+            stats['error_rate'] = round(errors[name] / total, 4) if total else 0.0
+            level[name] = stats
+        return level
+
+    def build_request(self, name, rng):
+        fixtures = self.fixtures
+        email, participant_headers = rng.choice(fixtures['participants'])
+        json_headers = {'Content-Type': 'application/json'}
+
+        if name == 'participant-attendances':
+            return 'GET', '/api/participant/attendances/', None, participant_headers
+        if name == 'participant-stats':
+            return 'GET', '/api/participant/stats/', None, participant_headers
+        if name == 'admin-bulk':
+            body = {
+                'course_day_id': rng.choice(fixtures['course_day_ids']),
+                'attendances': [
+                    {
+                        'participant_identifier': rng.choice(fixtures['participants'])[0],
+                        'status': rng.choice(['PRESENT', 'ABSENT', 'EXCUSED']),
+                    }
+                    for _ in range(30)
+                ],
+            }
+            return 'POST', '/api/admin/attendances/bulk/', json.dumps(body), {
+                **fixtures['admin'], **json_headers}
+        if name == 'login':
+            body = {'email': email, 'password': SEED_PASSWORD}
+            return 'POST', '/api/auth/login/', json.dumps(body), json_headers
+        if name == 'admin-export-month':
+            return 'GET', f"/api/admin/attendances/?month={fixtures['month']}", None, fixtures['admin']
+        if name == 'admin-by-course-day':
+            course_day_id = rng.choice(fixtures['course_day_ids'])
+            return 'GET', f'/api/admin/attendances/by-course-day/{course_day_id}/', None, fixtures['admin']
+        raise ValueError(name)
+
+    def report(self, results):
+        for concurrency, level in results.items():
+            total_rps = sum(stats['throughput_rps'] for stats in level.values())
+            self.stdout.write(f'\nConcorrenza {concurrency}: {total_rps:.1f} req/s totali')
+            for name, stats in level.items():
+                if not stats['count']:
+                    self.stdout.write(f"  {name:<26} nessuna richiesta riuscita, errori {stats['errors']}")
+                    continue
+                self.stdout.write(
+                    f"  {name:<26} {stats['throughput_rps']:>7.1f} req/s  "
+                    f"p50 {stats['p50_ms']:>8.1f}  p95 {stats['p95_ms']:>8.1f}  "
+                    f"p99 {stats['p99_ms']:>8.1f} ms  errori {stats['error_rate']:.1%}"
+                )
@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from config.db_router import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    """
+    Copia il database SQLite primario sul file della replica locale.
+
+    Sostituisce la replicazione in sviluppo: con REPLICA_SQLITE_PATH
+    impostato, la replica è un secondo file SQLite aggiornato da questo
+    comando (una volta, o in ciclo con ``--interval``). Usa la backup API
+    di SQLite, quindi è sicuro anche con il primario in uso.
+
+        REPLICA_SQLITE_PATH=replica.sqlite3 python manage.py sync_replica --interval 2
+    """
+    help = 'Sincronizza la replica SQLite locale con il database primario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Ripeti ogni N secondi (0 = una volta sola)')
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections.settings:
+            raise CommandError('Nessuna replica configurata (REPLICA_SQLITE_PATH).')
+
+        primary = connections['default'].settings_dict
+        replica = connections[REPLICA_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != primary['ENGINE']:
+            raise CommandError('sync_replica supporta solo primario e replica SQLite.')
+
+        while True:
+            start = time.perf_counter()
+            self.copy(str(primary['NAME']), str(replica['NAME']))
+            self.stdout.write(
+                f'Replica aggiornata in {(time.perf_counter() - start) * 1000:.1f} ms'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path):
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,95 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCourseDay',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField(unique=True, verbose_name='Data')),
+                ('description', models.CharField(blank=True, max_length=255, verbose_name='Descrizione')),
+                ('is_holiday', models.BooleanField(default=False, verbose_name='Giorno festivo')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Giornata archiviata',
+                'verbose_name_plural': 'Giornate archiviate',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMonthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('course_days', models.PositiveIntegerField(default=0)),
+                ('holidays', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateField(verbose_name='Archiviato fino a (escluso)')),
+                ('course_days', models.PositiveIntegerField(default=0)),
+                ('attendances', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Archiviazione',
+                'verbose_name_plural': 'Archiviazioni',
+                'ordering': ['-cutoff'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('participant_identifier', models.CharField(db_index=True, max_length=255, verbose_name='Identificativo partecipante')),
+                ('status', models.CharField(choices=[('PRESENT', 'Presente'), ('ABSENT', 'Assente'), ('EXCUSED', 'Giustificato')], max_length=20, verbose_name='Stato')),
+                ('notes', models.TextField(blank=True, verbose_name='Note')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_attendances', to=settings.AUTH_USER_MODEL, verbose_name='Utente')),
+                ('course_day', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='attendances.archivedcourseday', verbose_name='Giornata')),
+            ],
+            options={
+                'verbose_name': 'Presenza archiviata',
+                'verbose_name_plural': 'Presenze archiviate',
+                'ordering': ['course_day__date', 'participant_identifier'],
+                'unique_together': {('course_day', 'participant_identifier')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedParticipantSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('participant_identifier', models.CharField(db_index=True, max_length=255)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('excused', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+                'indexes': [models.Index(fields=['month', 'participant_identifier'], name='attendances_month_02a4ce_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0003_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceAuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attendance_id', models.BigIntegerField(verbose_name='Presenza')),
+                ('course_day_id', models.IntegerField(verbose_name='Giornata')),
+                ('participant_identifier', models.CharField(max_length=255, verbose_name='Identificativo partecipante')),
+                ('action', models.CharField(choices=[('CREATE', 'Creazione'), ('UPDATE', 'Modifica'), ('DELETE', 'Eliminazione'), ('LINK', 'Collegamento utente')], max_length=10, verbose_name='Azione')),
+                ('old_status', models.CharField(blank=True, max_length=20, verbose_name='Stato precedente')),
+                ('new_status', models.CharField(blank=True, max_length=20, verbose_name='Nuovo stato')),
+                ('old_user_id', models.BigIntegerField(blank=True, null=True)),
+                ('new_user_id', models.BigIntegerField(blank=True, null=True)),
+                ('source', models.CharField(max_length=20, verbose_name='Origine')),
+                ('changed_at', models.DateTimeField(verbose_name='Data modifica')),
+                ('changed_by', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Modificato da')),
+            ],
+            options={
+                'verbose_name': 'Storico presenza',
+                'verbose_name_plural': 'Storico presenze',
+                'ordering': ['-changed_at', '-id'],
+                'indexes': [models.Index(fields=['attendance_id', 'changed_at'], name='attendances_attenda_36057c_idx'), models.Index(fields=['participant_identifier', 'changed_at'], name='attendances_partici_b6ed8d_idx'), models.Index(fields=['changed_at'], name='attendances_changed_86f3d0_idx')],
+            },
+        ),
+    ]
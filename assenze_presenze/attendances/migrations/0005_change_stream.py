@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:20
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing(apps, schema_editor):
+    """Le presenze esistenti entrano nel flusso con change_seq = id"""
+    Attendance = apps.get_model('attendances', 'Attendance')
+    ChangeSequence = apps.get_model('attendances', 'ChangeSequence')
+    db = schema_editor.connection.alias
+    Attendance.objects.using(db).update(change_seq=F('id'))
+    last = Attendance.objects.using(db).aggregate(last=Max('id'))['last'] or 0
+    ChangeSequence.objects.using(db).update_or_create(name='attendances', defaults={'value': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0004_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attendance_id', models.BigIntegerField(verbose_name='Presenza')),
+                ('course_day_id', models.IntegerField(verbose_name='Giornata')),
+                ('participant_identifier', models.CharField(max_length=255, verbose_name='Identificativo partecipante')),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('change_seq', models.BigIntegerField(unique=True, verbose_name='Sequenza modifica')),
+                ('deleted_at', models.DateTimeField(verbose_name='Data eliminazione')),
+            ],
+            options={
+                'verbose_name': 'Presenza eliminata',
+                'verbose_name_plural': 'Presenze eliminate',
+                'ordering': ['change_seq'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Sequenza modifica'),
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+from config.search import normalize
+
+
+def fill_search_identifier(apps, schema_editor):
+    """Copia normalizzata dell'identificativo per le presenze esistenti, a lotti"""
+    Attendance = apps.get_model('attendances', 'Attendance')
+    db = schema_editor.connection.alias
+    batch = []
+    rows = Attendance.objects.using(db).only('participant_identifier').iterator(chunk_size=5000)
+    for attendance in rows:
+        attendance.search_identifier = normalize(attendance.participant_identifier, 255)
+        batch.append(attendance)
+        if len(batch) == 5000:
+            Attendance.objects.using(db).bulk_update(batch, ['search_identifier'])
+            batch = []
+    Attendance.objects.using(db).bulk_update(batch, ['search_identifier'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0005_change_stream'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='search_identifier',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_identifier, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:02
+
+from django.db import migrations
+
+from attendances import fulltext
+
+
+def install(apps, schema_editor):
+    """Tabella FTS5 e trigger (solo SQLite), indicizzando le presenze esistenti"""
+    if schema_editor.connection.vendor == 'sqlite':
+        fulltext.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        fulltext.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0006_search'),
+        ('users', '0002_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendances', '0007_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancetombstone',
+            index=models.Index(fields=['user_id', 'change_seq'], name='attendances_user_id_e105b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancetombstone',
+            index=models.Index(fields=['participant_identifier', 'change_seq'], name='attendances_partici_f15edd_idx'),
+        ),
+    ]
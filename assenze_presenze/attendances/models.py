@@ -1,7 +1,130 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F, Max, Min, Q
 from django.conf import settings
+from django.utils import timezone
+
+from config.search import normalize, prefix_q, terms
+
+
+class ChangeSequence(models.Model):
+    """
+    Contatore monotono del flusso di modifiche (sync delta, vedi changes.py).
+    
+    ``reserve`` aggiorna la riga dentro la transazione della scrittura: il
+    lock sulla riga è tenuto fino al commit, quindi le sequenze diventano
+    visibili nell'ordine in cui sono state assegnate.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    
+    ATTENDANCES = 'attendances'
+    # Ultima sequenza delle tombstone eliminate per scadenza (changes.py)
+    TOMBSTONES_PRUNED = 'attendance_tombstones_pruned'
+    
+    @classmethod
+    def reserve(cls, count=1, name=ATTENDANCES, using=None):
+        """Riserva ``count`` valori consecutivi; restituisce il primo"""
+        manager = cls.objects.db_manager(using)
+        with transaction.atomic(using=manager.db, savepoint=False):
+            if not manager.filter(name=name).update(value=F('value') + count):
+                manager.get_or_create(name=name)
+                manager.filter(name=name).update(value=F('value') + count)
+            return manager.filter(name=name).values_list('value', flat=True).get() - count + 1
+
+
+def _publish_changes(using, course_day_ids):
+    """Notifica il roll-call live (live.py) al commit; None = giornate non note"""
+    from .live import publish_changes
+    
+    course_day_ids = set(course_day_ids) if course_day_ids is not None else None
+    transaction.on_commit(lambda: publish_changes(course_day_ids), using=using)
+
+
+class AttendanceQuerySet(models.QuerySet):
+    """
+    Le scritture SQL su insiemi (update, delete, bulk_create) alimentano
+    comunque il flusso di modifiche: update aggiorna updated_at e
+    change_seq, delete lascia una AttendanceTombstone per riga. Al commit
+    notificano il roll-call live (live.py). ``search_identifier`` segue
+    ``participant_identifier`` anche qui.
+    
+    Una sola riservazione per statement: la riga ``pk`` riceve
+    ``base + pk`` (valori unici, con buchi se le chiavi non sono contigue).
+    """
+    
+    def _reserve_for_pks(self):
+        bounds = self.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return None
+        return ChangeSequence.reserve(bounds['last'] - bounds['first'] + 1, using=self.db) - bounds['first']
+    
+    def search(self, query):
+        """
+        Presenze con identificativo, o email/nome/cognome dell'utente
+        collegato, che iniziano con ogni termine (indici, config/search.py)
+        """
+        from users.models import CustomUser
+        
+        for term in terms(query):
+            self = self.filter(
+                prefix_q('search_identifier', term)
+                | Q(user__in=CustomUser.objects.search(term).values('pk'))
+            )
+        return self
+    
+    def update(self, **kwargs):
+        if isinstance(kwargs.get('participant_identifier'), str):
+            kwargs['search_identifier'] = normalize(kwargs['participant_identifier'], 255)
+        with transaction.atomic(using=self.db, savepoint=False):
+            base = self._reserve_for_pks()
+            if base is None:
+                return 0
+            kwargs.setdefault('updated_at', timezone.now())
+            _publish_changes(self.db, None)
+            return super().update(change_seq=F('id') + base, **kwargs)
+    
+    update.alters_data = True
+    
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(
+                self.order_by().values_list('pk', 'course_day_id', 'participant_identifier', 'user_id')
+            )
+            if rows:
+                first = min(row[0] for row in rows)
+                base = ChangeSequence.reserve(
+                    max(row[0] for row in rows) - first + 1, using=self.db
+                ) - first
+                now = timezone.now()
+                AttendanceTombstone.objects.using(self.db).bulk_create([
+                    AttendanceTombstone(
+                        attendance_id=pk,
+                        course_day_id=course_day_id,
+                        participant_identifier=identifier,
+                        user_id=user_id,
+                        change_seq=base + pk,
+                        deleted_at=now
+                    )
+                    for pk, course_day_id, identifier, user_id in rows
+                ], batch_size=1000)
+                _publish_changes(self.db, {row[1] for row in rows})
+            return super().delete()
+    
+    delete.alters_data = True
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if not objs:
+            return objs
+        with transaction.atomic(using=self.db, savepoint=False):
+            first = ChangeSequence.reserve(len(objs), using=self.db)
+            for offset, obj in enumerate(objs):
+                obj.change_seq = first + offset
+                obj.search_identifier = normalize(obj.participant_identifier, 255)
+            _publish_changes(self.db, {obj.course_day_id for obj in objs})
+            return super().bulk_create(objs, *args, **kwargs)
+
 
-# Create your models here.
 class Attendance(models.Model):
     """
     Modello per la gestione delle presenze/assenze.
@@ -47,6 +170,14 @@ class Attendance(models.Model):
         help_text='Email o codice identificativo'
     )
     
+    # Copia normalizzata per la ricerca per prefisso (config/search.py)
+    search_identifier = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    
     # Stato presenza
     status = models.CharField(
         max_length=20,
@@ -72,6 +203,16 @@ class Attendance(models.Model):
         verbose_name='Ultimo aggiornamento'
     )
     
+    # Posizione nel flusso di modifiche (sync delta, vedi changes.py)
+    change_seq = models.BigIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name='Sequenza modifica'
+    )
+    
+    objects = AttendanceQuerySet.as_manager()
+    
     class Meta:
         ordering = ['course_day__date', 'participant_identifier']
         verbose_name = 'Presenza'
@@ -82,6 +223,248 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.participant_identifier} - {self.course_day.date} - {self.get_status_display()}"
     
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], 'change_seq', 'updated_at', 'search_identifier'
+            }
+        self.search_identifier = normalize(self.participant_identifier, 255)
+        with transaction.atomic(using=using, savepoint=False):
+            self.change_seq = ChangeSequence.reserve(using=using)
+            super().save(*args, **kwargs)
+            _publish_changes(using, [self.course_day_id])
+    
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            AttendanceTombstone.objects.using(using).create(
+                attendance_id=self.pk,
+                course_day_id=self.course_day_id,
+                participant_identifier=self.participant_identifier,
+                user_id=self.user_id,
+                change_seq=ChangeSequence.reserve(using=using),
+                deleted_at=timezone.now()
+            )
+            _publish_changes(using, [self.course_day_id])
+            return super().delete(*args, **kwargs)
+    
     def is_present(self):
         """Verifica se è presente (include giustificati)"""
-        return self.status in [self.Status.PRESENT, self.Status.EXCUSED]
\ No newline at end of file
+        return self.status in [self.Status.PRESENT, self.Status.EXCUSED]
+
+# --- Archivio degli anni accademici passati (vedi archive.py) ---
+
+class ArchivedCourseDay(models.Model):
+    """
+    Giornata di corso archiviata.
+    Mantiene la stessa chiave primaria della CourseDay originale.
+    """
+    id = models.IntegerField(primary_key=True)
+    date = models.DateField(unique=True, verbose_name='Data')
+    description = models.CharField(max_length=255, blank=True, verbose_name='Descrizione')
+    is_holiday = models.BooleanField(default=False, verbose_name='Giorno festivo')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Giornata archiviata'
+        verbose_name_plural = 'Giornate archiviate'
+    
+    def __str__(self):
+        return f"{self.date} - {self.description or 'Lezione'}"
+
+
+class ArchivedAttendanceQuerySet(models.QuerySet):
+    """Ricerca per prefisso come AttendanceQuerySet (filtri della lista admin)"""
+    
+    def search(self, query):
+        """
+        Identificativo o utente collegato che iniziano con ogni termine.
+        L'archivio non ha la colonna normalizzata: l'identificativo usa
+        istartswith, l'utente gli indici di CustomUser.
+        """
+        from users.models import CustomUser
+        
+        for term in terms(query):
+            self = self.filter(
+                Q(participant_identifier__istartswith=term)
+                | Q(user__in=CustomUser.objects.search(term).values('pk'))
+            )
+        return self
+
+
+class ArchivedAttendance(models.Model):
+    """
+    Presenza archiviata: stessi campi e stessa chiave primaria
+    della presenza originale.
+    """
+    Status = Attendance.Status
+    
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_attendances',
+        verbose_name='Utente'
+    )
+    course_day = models.ForeignKey(
+        ArchivedCourseDay,
+        on_delete=models.CASCADE,
+        related_name='attendances',
+        verbose_name='Giornata'
+    )
+    participant_identifier = models.CharField(
+        max_length=255,
+        db_index=True,
+        verbose_name='Identificativo partecipante'
+    )
+    status = models.CharField(max_length=20, choices=Status.choices, verbose_name='Stato')
+    notes = models.TextField(blank=True, verbose_name='Note')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    objects = ArchivedAttendanceQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['course_day__date', 'participant_identifier']
+        verbose_name = 'Presenza archiviata'
+        verbose_name_plural = 'Presenze archiviate'
+        unique_together = ['course_day', 'participant_identifier']
+    
+    def __str__(self):
+        return f"{self.participant_identifier} - {self.course_day.date} - {self.get_status_display()}"
+    
+    def is_present(self):
+        """Verifica se è presente (include giustificati)"""
+        return self.status in [self.Status.PRESENT, self.Status.EXCUSED]
+
+
+class ArchiveRun(models.Model):
+    """
+    Esecuzione dell'archiviazione: tutto ciò che precede ``cutoff``
+    (primo giorno di un mese) è nell'archivio.
+    """
+    cutoff = models.DateField(verbose_name='Archiviato fino a (escluso)')
+    course_days = models.PositiveIntegerField(default=0)
+    attendances = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-cutoff']
+        verbose_name = 'Archiviazione'
+        verbose_name_plural = 'Archiviazioni'
+    
+    def __str__(self):
+        return f"Archivio fino al {self.cutoff}"
+
+
+class ArchivedMonthSummary(models.Model):
+    """Riepilogo congelato del calendario di un mese archiviato"""
+    month = models.DateField(unique=True)
+    course_days = models.PositiveIntegerField(default=0)
+    holidays = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['month']
+
+
+class ArchivedParticipantSummary(models.Model):
+    """
+    Riepilogo congelato delle presenze archiviate di un partecipante
+    in un mese (per identificativo e utente collegato).
+    """
+    month = models.DateField()
+    participant_identifier = models.CharField(max_length=255, db_index=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_summaries'
+    )
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    excused = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['month']
+        indexes = [
+            models.Index(fields=['month', 'participant_identifier']),
+        ]
+
+
+class AttendanceAuditEntry(models.Model):
+    """
+    Voce dello storico delle presenze (append-only, vedi audit.py).
+    Nessuna FK verso la presenza: lo storico sopravvive all'eliminazione.
+    """
+    class Action(models.TextChoices):
+        CREATE = 'CREATE', 'Creazione'
+        UPDATE = 'UPDATE', 'Modifica'
+        DELETE = 'DELETE', 'Eliminazione'
+        LINK = 'LINK', 'Collegamento utente'
+    
+    attendance_id = models.BigIntegerField(verbose_name='Presenza')
+    course_day_id = models.IntegerField(verbose_name='Giornata')
+    participant_identifier = models.CharField(max_length=255, verbose_name='Identificativo partecipante')
+    action = models.CharField(max_length=10, choices=Action.choices, verbose_name='Azione')
+    old_status = models.CharField(max_length=20, blank=True, verbose_name='Stato precedente')
+    new_status = models.CharField(max_length=20, blank=True, verbose_name='Nuovo stato')
+    old_user_id = models.BigIntegerField(null=True, blank=True)
+    new_user_id = models.BigIntegerField(null=True, blank=True)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_constraint=False,
+        verbose_name='Modificato da'
+    )
+    source = models.CharField(max_length=20, verbose_name='Origine')
+    changed_at = models.DateTimeField(verbose_name='Data modifica')
+    
+    class Meta:
+        ordering = ['-changed_at', '-id']
+        verbose_name = 'Storico presenza'
+        verbose_name_plural = 'Storico presenze'
+        indexes = [
+            models.Index(fields=['attendance_id', 'changed_at']),
+            models.Index(fields=['participant_identifier', 'changed_at']),
+            models.Index(fields=['changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.participant_identifier} {self.old_status or '-'} → {self.new_status or '-'} ({self.changed_at})"
+
+
+class AttendanceTombstone(models.Model):
+    """
+    Presenza eliminata, per il sync delta (vedi changes.py): i client
+    offline la tolgono dalla copia locale.
+    """
+    attendance_id = models.BigIntegerField(verbose_name='Presenza')
+    course_day_id = models.IntegerField(verbose_name='Giornata')
+    participant_identifier = models.CharField(max_length=255, verbose_name='Identificativo partecipante')
+    user_id = models.BigIntegerField(null=True, blank=True)
+    change_seq = models.BigIntegerField(unique=True, verbose_name='Sequenza modifica')
+    deleted_at = models.DateTimeField(verbose_name='Data eliminazione')
+    
+    class Meta:
+        ordering = ['change_seq']
+        verbose_name = 'Presenza eliminata'
+        verbose_name_plural = 'Presenze eliminate'
+        # Sync delta del partecipante (changes.participant_tombstones)
+        indexes = [
+            models.Index(fields=['user_id', 'change_seq']),
+            models.Index(fields=['participant_identifier', 'change_seq']),
+        ]
+    
+    def __str__(self):
+        return f"{self.participant_identifier} - giornata {self.course_day_id} (eliminata)"
+
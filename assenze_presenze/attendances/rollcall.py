@@ -0,0 +1,232 @@
+"""
+Sessioni di appello (roll-call) con segni bufferizzati.
+
+Chi fa l'appello da tablet tocca un partecipante alla volta: con l'API
+CRUD ogni tocco è una richiesta con get_object, la query di unicità del
+serializer, un save e la risposta completa. In una sessione invece:
+
+    POST /rollcall/                 → apre la sessione per una giornata
+    POST /rollcall/{id}/marks/      → segni {participant_identifier, status, notes?}
+    GET  /rollcall/{id}/            → registro della giornata con i segni in attesa
+    POST /rollcall/{id}/close/      → scrive i segni rimasti e chiude
+
+I segni restano nella cache di Django (stessa condizione del calendario:
+con più processi serve una cache condivisa, CACHES), coalescenti per
+partecipante: vale l'ultimo stato, le note solo se indicate. Vengono
+scritti a lotti con ``apply_marks`` (un bulk_create e un update per
+combinazione stato/note, nella coda di scrittura) quando sono almeno
+ROLLCALL_FLUSH_SIZE o il più vecchio ha più di ROLLCALL_FLUSH_INTERVAL
+secondi, e alla chiusura.
+
+Una sessione non toccata per ROLLCALL_SESSION_TTL secondi scade: i segni
+ancora in attesa (al più un lotto) vanno persi.
+"""
+
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import audit
+from .models import Attendance
+from .writes import run_write
+
+
+KEY_PREFIX = 'attendances:rollcall:'
+# Attesa massima del lock di sessione (segni concorrenti sulla stessa sessione)
+LOCK_WAIT = 10
+LOCK_TIMEOUT = 30
+
+
+class SessionNotFound(LookupError):
+    pass
+
+
+class SessionBusy(TimeoutError):
+    pass
+
+
+def _key(session_id):
+    return f'{KEY_PREFIX}{session_id}'
+
+
+@contextmanager
+def _locked(session_id):
+    """Lock della sessione tra processi (cache.add è atomico)"""
+    key = f'{_key(session_id)}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(key, 1, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise SessionBusy('Sessione di appello occupata, riprovare.')
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def _save(session):
+    cache.set(_key(session['id']), session, settings.ROLLCALL_SESSION_TTL)
+
+
+def open_session(course_day_id, actor):
+    session = {
+        'id': uuid.uuid4().hex,
+        'course_day_id': course_day_id,
+        'opened_by': actor.pk,
+        'marks': {},
+        'first_pending_at': None,
+        'created_count': 0,
+        'updated_count': 0,
+    }
+    _save(session)
+    return session
+
+
+def get_session(session_id):
+    """Sessione aperta; SessionNotFound se non esiste o è scaduta"""
+    session = cache.get(_key(session_id))
+    if session is None:
+        raise SessionNotFound('Sessione di appello non trovata o scaduta.')
+    return session
+
+
+def add_marks(session_id, marks, actor):
+    """
+    Aggiunge i segni ``[{participant_identifier, status, notes?}]`` e
+    scrive il lotto se è il momento. Restituisce la sessione aggiornata.
+    """
+    with _locked(session_id):
+        session = get_session(session_id)
+        pending = session['marks']
+        for mark in marks:
+            identifier = mark['participant_identifier']
+            notes = mark.get('notes')
+            if notes is None and identifier in pending:
+                notes = pending[identifier][1]
+            pending[identifier] = [mark['status'], notes]
+        if pending and session['first_pending_at'] is None:
+            session['first_pending_at'] = time.time()
+
+        if pending and (len(pending) >= settings.ROLLCALL_FLUSH_SIZE
+                        or time.time() - session['first_pending_at'] >= settings.ROLLCALL_FLUSH_INTERVAL):
+            _flush(session, actor)
+        _save(session)
+        return session
+
+
+def close_session(session_id, actor):
+    """Scrive i segni in attesa e chiude; restituisce la sessione finale"""
+    with _locked(session_id):
+        session = get_session(session_id)
+        _flush(session, actor)
+        cache.delete(_key(session_id))
+        return session
+
+
+def _flush(session, actor):
+    if not session['marks']:
+        return
+    created, updated = run_write(
+        apply_marks, session['course_day_id'], session['marks'], actor, 'rollcall'
+    )
+    session['created_count'] += created
+    session['updated_count'] += updated
+    session['marks'] = {}
+    session['first_pending_at'] = None
+
+
+def apply_marks(course_day_id, marks, actor=None, source='rollcall', user_ids=None):
+    """
+    Scrive i segni ``{participant_identifier: (status, notes)}`` di una
+    giornata (notes None = invariate) con una query per le righe esistenti,
+    un bulk_create per le nuove e un update per ogni combinazione
+    stato/note. Le righe già nello stato indicato non vengono toccate.
+    ``user_ids`` ({participant_identifier: user_id}) collega le righe nuove.
+    Restituisce (create, aggiornate).
+    """
+    existing = {
+        identifier: (pk, status, user_id, notes)
+        for pk, identifier, status, user_id, notes in Attendance.objects.filter(
+            course_day_id=course_day_id, participant_identifier__in=list(marks)
+        ).values_list('pk', 'participant_identifier', 'status', 'user_id', 'notes')
+    }
+
+    new_rows = []
+    changed = {}
+    entries = []
+    for identifier, (status, notes) in marks.items():
+        row = existing.get(identifier)
+        if row is None:
+            new_rows.append(Attendance(
+                course_day_id=course_day_id,
+                user_id=(user_ids or {}).get(identifier),
+                participant_identifier=identifier,
+                status=status,
+                notes=notes or ''
+            ))
+            continue
+        pk, old_status, user_id, old_notes = row
+        notes = old_notes if notes is None else notes
+        if (status, notes) == (old_status, old_notes):
+            continue
+        changed.setdefault((status, notes), []).append(pk)
+        if status != old_status:
+            entries.append(audit.entry(
+                audit.Action.UPDATE, pk, course_day_id, identifier, actor, source,
+                old_status=old_status, new_status=status,
+                old_user_id=user_id, new_user_id=user_id
+            ))
+
+    with transaction.atomic(savepoint=False):
+        # Righe create nel frattempo da un'altra scrittura: aggiornate
+        for obj in Attendance.objects.bulk_create(
+            new_rows, update_conflicts=True,
+            unique_fields=['course_day', 'participant_identifier'],
+            update_fields=['status', 'notes', 'change_seq', 'updated_at']
+        ):
+            entries.append(audit.for_save(obj, None, actor, source))
+        for (status, notes), pks in changed.items():
+            Attendance.objects.filter(pk__in=pks).update(status=status, notes=notes)
+        audit.record(entries)
+    return len(new_rows), sum(len(pks) for pks in changed.values())
+
+
+def overlay(attendances, course_day, marks):
+    """
+    Presenze della giornata con i segni in attesa applicati in memoria
+    (righe nuove non salvate, id None) e statistiche come by-course-day.
+    """
+    rows = []
+    for attendance in attendances:
+        mark = marks.get(attendance.participant_identifier)
+        if mark is not None:
+            attendance.status = mark[0]
+            if mark[1] is not None:
+                attendance.notes = mark[1]
+        rows.append(attendance)
+
+    known = {attendance.participant_identifier for attendance in rows}
+    rows += [
+        Attendance(
+            course_day=course_day,
+            participant_identifier=identifier,
+            status=status,
+            notes=notes or ''
+        )
+        for identifier, (status, notes) in marks.items()
+        if identifier not in known
+    ]
+
+    counts = Counter(attendance.status for attendance in rows)
+    day_stats = {
+        'total': len(rows),
+        'present': counts[Attendance.Status.PRESENT],
+        'absent': counts[Attendance.Status.ABSENT],
+        'excused': counts[Attendance.Status.EXCUSED],
+    }
+    return rows, day_stats
@@ -1,9 +1,71 @@
 from rest_framework import serializers
-from .models import Attendance
-from users.serializers import UserSerializer
+from .models import Attendance, ArchivedAttendance, AttendanceAuditEntry, AttendanceTombstone
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Sottoinsieme dei campi (?fields=a,b / ?omit=c) anche in SQL.
+    
+    ``fields=`` al costruttore limita i campi serializzati;
+    ``sparse_queryset`` toglie dal queryset le colonne e le select_related
+    che servono solo ai campi esclusi. ``field_columns`` indica le colonne
+    (notazione di only()) dei campi che non sono colonne omonime,
+    ``required_columns`` quelle da caricare comunque. Se l'ordinamento di
+    default del modello segue una relazione che nessun campo richiesto
+    carica, ``join_free_ordering`` lo sostituisce per evitare il JOIN.
+    """
+    field_columns = {}
+    required_columns = ('pk',)
+    join_free_ordering = None
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in [name for name in self.fields if name not in fields]:
+                self.fields.pop(name)
+    
+    @classmethod
+    def requested_fields(cls, params):
+        """Campi richiesti in ordine di Meta.fields, None = tutti"""
+        if params.get('fields') is None and params.get('omit') is None:
+            return None
+        
+        def names(value):
+            return [name.strip() for name in (value or '').split(',') if name.strip()]
+        
+        selected = names(params.get('fields')) if params.get('fields') is not None else cls.Meta.fields
+        omitted = names(params.get('omit'))
+        unknown = sorted(set(selected + omitted) - set(cls.Meta.fields))
+        if unknown:
+            raise serializers.ValidationError({
+                "fields": f"Campi non validi: {', '.join(unknown)}."
+            })
+        return [name for name in cls.Meta.fields if name in selected and name not in omitted]
+    
+    @classmethod
+    def sparse_queryset(cls, queryset, fields):
+        """Carica solo le colonne (e le relazioni) dei campi richiesti"""
+        if fields is None:
+            return queryset
+        columns = set()
+        for name in fields:
+            columns.update(cls.field_columns.get(name, (name,)))
+        related = sorted({column.split('__')[0] for column in columns if '__' in column})
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        # La FK va caricata per seguire la relazione
+        queryset = queryset.only(*cls.required_columns, *related, *columns)
+        ordering_joins = {
+            name.lstrip('-').split('__')[0] for name in queryset.model._meta.ordering if '__' in name
+        }
+        if cls.join_free_ordering and not queryset.query.order_by and ordering_joins.isdisjoint(related):
+            queryset = queryset.order_by(*cls.join_free_ordering)
+        return queryset
+
+
+class AttendanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer completo per le presenze.
     Usato dall'admin per CRUD.
@@ -49,6 +111,20 @@ class AttendanceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    field_columns = {
+        'user_email': ('user__email',),
+        'user_full_name': ('user__first_name', 'user__last_name'),
+        'course_day_date': ('course_day__date',),
+        'course_day_description': ('course_day__description',),
+        'status_display': ('status',),
+    }
+    # Cursore del flusso di modifiche e degli eventi live (changes.py,
+    # live.py): senza, ogni riga lo caricherebbe con una query
+    required_columns = ('pk', 'change_seq')
+    # Meta.ordering passa da course_day__date: per giornata, poi partecipante
+    # (indice di unique_together), senza JOIN; in by-course-day l'ordine è identico
+    join_free_ordering = ('course_day_id', 'participant_identifier')
+    
     def validate(self, data):
         """Validazione: verifica unicità presenza per giornata"""
         course_day = data.get('course_day')
@@ -72,7 +148,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         return data
 
 
-class ParticipantAttendanceSerializer(serializers.ModelSerializer):
+class ParticipantAttendanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer per visualizzazione presenze del partecipante.
     Solo campi in lettura, nessuna modifica permessa.
@@ -104,6 +180,69 @@ class ParticipantAttendanceSerializer(serializers.ModelSerializer):
         ]
         # Tutti i campi in sola lettura!
         read_only_fields = fields
+    
+    field_columns = {
+        'date': ('course_day__date',),
+        'description': ('course_day__description',),
+        'status_display': ('status',),
+        'is_present': ('status',),
+    }
+    required_columns = ('pk', 'change_seq')
+
+
+class ArchivedAttendanceSerializer(AttendanceSerializer):
+    """
+    Presenza archiviata per l'admin: stessi campi di AttendanceSerializer.
+    Solo lettura (l'archivio non si modifica dalle API).
+    """
+    class Meta(AttendanceSerializer.Meta):
+        model = ArchivedAttendance
+        read_only_fields = AttendanceSerializer.Meta.fields
+    
+    required_columns = ('pk',)
+
+
+class ArchivedParticipantAttendanceSerializer(ParticipantAttendanceSerializer):
+    """Presenza archiviata vista dal partecipante"""
+    class Meta(ParticipantAttendanceSerializer.Meta):
+        model = ArchivedAttendance
+    
+    required_columns = ('pk',)
+
+
+class AttendanceAuditEntrySerializer(serializers.ModelSerializer):
+    """Voce dello storico di una presenza (solo lettura)"""
+    action_display = serializers.CharField(source='get_action_display', read_only=True)
+    
+    class Meta:
+        model = AttendanceAuditEntry
+        fields = [
+            'id',
+            'attendance_id',
+            'course_day_id',
+            'participant_identifier',
+            'action',
+            'action_display',
+            'old_status',
+            'new_status',
+            'old_user_id',
+            'new_user_id',
+            'changed_by',
+            'source',
+            'changed_at'
+        ]
+        read_only_fields = fields
+
+
+class AttendanceTombstoneSerializer(serializers.ModelSerializer):
+    """Presenza eliminata nel sync delta (id della presenza, non della tombstone)"""
+    id = serializers.IntegerField(source='attendance_id', read_only=True)
+    course_day = serializers.IntegerField(source='course_day_id', read_only=True)
+    
+    class Meta:
+        model = AttendanceTombstone
+        fields = ['id', 'course_day', 'participant_identifier', 'deleted_at']
+        read_only_fields = fields
 
 
 class BulkAttendanceItemSerializer(serializers.Serializer):
@@ -152,6 +291,66 @@ class BulkAttendanceSerializer(serializers.Serializer):
         return value
 
 
+class RollCallOpenSerializer(serializers.Serializer):
+    """
+    Serializer per aprire una sessione di appello.
+    """
+    course_day_id = serializers.IntegerField(
+        help_text='ID della giornata di corso'
+    )
+    
+    def validate_course_day_id(self, value):
+        """Verifica che la giornata esista"""
+        from course_days.models import CourseDay
+        if not CourseDay.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Giornata di corso non trovata.")
+        return value
+
+
+class CheckInCodeSerializer(RollCallOpenSerializer):
+    """
+    Serializer per generare il codice di check-in di una giornata.
+    """
+
+
+class CheckInSerializer(serializers.Serializer):
+    """
+    Serializer per il check-in del partecipante.
+    """
+    code = serializers.CharField(
+        max_length=200,
+        help_text='Codice di check-in mostrato in aula'
+    )
+
+
+class RollCallMarkSerializer(serializers.Serializer):
+    """
+    Segno di appello: senza ``notes`` le note restano invariate.
+    """
+    participant_identifier = serializers.CharField(
+        max_length=255,
+        help_text='Email o codice identificativo'
+    )
+    status = serializers.ChoiceField(
+        choices=Attendance.Status.choices
+    )
+    notes = serializers.CharField(
+        required=False,
+        allow_blank=True
+    )
+
+
+class RollCallMarksSerializer(serializers.Serializer):
+    """
+    Serializer per i segni inviati a una sessione di appello.
+    """
+    marks = RollCallMarkSerializer(
+        many=True,
+        allow_empty=False,
+        help_text='Segni da registrare, nell\'ordine dei tocchi'
+    )
+
+
 class LinkUserSerializer(serializers.Serializer):
     """
     Serializer per collegare un utente alle sue presenze.
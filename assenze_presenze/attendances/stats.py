@@ -0,0 +1,122 @@
+"""
+Query e calcoli delle statistiche presenze del partecipante.
+
+Condivisi da ParticipantStatsView e dalla sua variante asincrona: il
+numero di query è costante (nessun ciclo per mese), indipendentemente da
+quanti mesi o presenze ha il partecipante. Le giornate vengono dal
+calendario in memoria (course_days/calendar.py); le giornate festive non
+contano, né come giornate né come presenze.
+"""
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Attendance, ArchivedMonthSummary, ArchivedParticipantSummary
+
+
+def status_counts():
+    """Aggregazioni per stato, da usare in aggregate()/annotate()"""
+    return {
+        'present': Count('id', filter=Q(status=Attendance.Status.PRESENT)),
+        'absent': Count('id', filter=Q(status=Attendance.Status.ABSENT)),
+        'excused': Count('id', filter=Q(status=Attendance.Status.EXCUSED)),
+    }
+
+
+def participant_filter(user):
+    """Presenze del partecipante: per utente collegato o per email"""
+    return Q(user=user) | Q(participant_identifier=user.email)
+
+
+def participant_attendances(user, today):
+    """Presenze del partecipante fino a oggi (giornate festive escluse)"""
+    return Attendance.objects.filter(
+        participant_filter(user),
+        course_day__date__lte=today,
+        course_day__is_holiday=False
+    )
+
+
+def monthly_status_counts(attendances):
+    """Conteggi per stato raggruppati per mese, in ordine di mese"""
+    return (
+        attendances
+        .annotate(month=TruncMonth('course_day__date'))
+        .values('month')
+        .annotate(**status_counts())
+        .order_by('month')
+    )
+
+
+def archived_days_per_month():
+    """Giornate di lezione per mese dell'archivio (riepiloghi congelati)"""
+    return ArchivedMonthSummary.objects.values('month').annotate(
+        total=F('course_days') - F('holidays')
+    )
+
+
+def archived_monthly_status_counts(user):
+    """Come monthly_status_counts, dai riepiloghi congelati dell'archivio"""
+    return (
+        ArchivedParticipantSummary.objects
+        .filter(participant_filter(user))
+        .values('month')
+        .annotate(present=Sum('present'), absent=Sum('absent'), excused=Sum('excused'))
+        .order_by('month')
+    )
+
+
+def percentage(present, excused, total_days):
+    """PRESENT + EXCUSED contano come presenza"""
+    if total_days > 0:
+        return round(((present + excused) / total_days) * 100, 2)
+    return 0.0
+
+
+def build_stats(total_past_days, total_future_days, counts, months, days_per_month,
+                archived_months=(), archived_days=()):
+    """
+    Payload delle statistiche.
+
+    ``months``: righe di monthly_status_counts;
+    ``days_per_month``: dict mese → giornate passate del mese;
+    ``archived_months``/``archived_days``: righe di
+    archived_monthly_status_counts/archived_days_per_month, da sommare
+    se il periodo richiesto comprende l'archivio.
+    """
+    if archived_days:
+        days_per_month = {
+            **{row['month']: row['total'] for row in archived_days},
+            **days_per_month
+        }
+        total_past_days += sum(row['total'] for row in archived_days)
+        archived_months = list(archived_months)
+        counts = {
+            key: counts[key] + sum(row[key] for row in archived_months)
+            for key in ('present', 'absent', 'excused')
+        }
+        months = archived_months + list(months)
+
+    monthly_breakdown = []
+    for row in months:
+        total_days = days_per_month.get(row['month'], 0)
+        monthly_breakdown.append({
+            'month': row['month'].strftime('%Y-%m'),
+            'total_days': total_days,
+            'present': row['present'],
+            'absent': row['absent'],
+            'excused': row['excused'],
+            'percentage': percentage(row['present'], row['excused'], total_days)
+        })
+
+    return {
+        "total_course_days_past": total_past_days,
+        "total_course_days_future": total_future_days,
+        "present": counts['present'],
+        "absent": counts['absent'],
+        "excused": counts['excused'],
+        "attendance_percentage": percentage(
+            counts['present'], counts['excused'], total_past_days
+        ),
+        "monthly_breakdown": monthly_breakdown
+    }
@@ -1,3 +1,1629 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+import asyncio
+from contextlib import aclosing
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.messages import get_messages
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import (
+    AsyncClient, LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.testing import QueryBudgetTestCase
+from course_days import calendar
+from course_days.models import CourseDay
+from users.models import CustomUser
+from . import archive, changes, fulltext, live, writes
+from .checks import check_live_broker
+from .models import Attendance, ArchivedParticipantSummary, AttendanceAuditEntry, AttendanceTombstone
+from .views import AsyncParticipantAttendanceListView, AsyncParticipantStatsView, CourseDayLiveView
+
+
+def create_user(email, **extra):
+    """Utente di test con password nota; username dalla parte locale dell'email"""
+    return CustomUser.objects.create_user(
+        email=email, username=email.split('@')[0], password='password123', **extra
+    )
+
+
+def create_participants(count):
+    """Mario Rossi e ``count - 1`` altri partecipanti"""
+    participants = [create_user('mrossi@example.com', first_name='Mario', last_name='Rossi')]
+    participants += [
+        create_user(f'partecipante{n}@example.com', first_name='Partecipante', last_name=str(n))
+        for n in range(1, count)
+    ]
+    return participants
+
+
+def create_register(participants, days):
+    """
+    ``days`` giornate passate, una a settimana, con una presenza per ogni
+    partecipante: stati a rotazione, 'nota' su una riga ogni due.
+    """
+    start = date.today() - timedelta(days=days * 10)
+    statuses = list(Attendance.Status.values)
+    course_days = []
+    for i in range(days):
+        course_day = CourseDay.objects.create(
+            date=start + timedelta(days=i * 7), description=f'Lezione {i + 1}'
+        )
+        for j, user in enumerate(participants):
+            Attendance.objects.create(
+                course_day=course_day,
+                participant_identifier=user.email,
+                user=user,
+                status=statuses[(i + j) % len(statuses)],
+                notes='nota' if (i + j) % 2 else ''
+            )
+        course_days.append(course_day)
+    return course_days
+
+
+class AdminAttendanceQueryBudgetTest(QueryBudgetTestCase):
+    """Budget di query degli endpoint admin delle presenze"""
+    
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.admin)
+    
+    def test_list(self):
+        self.assertQueryBudget(3, lambda size: self.client.get(reverse('attendance-list')))
+    
+    def test_list_filtered(self):
+        self.assertQueryBudget(3, lambda size: self.client.get(reverse('attendance-list'), {
+            'course_day': self.course_days[0].pk, 'status': 'PRESENT',
+            'search': 'ross', 'ordering': '-course_day__date'
+        }))
+    
+    def test_list_month(self):
+        def request(size):
+            month = self.course_days[0].date.strftime('%Y-%m')
+            return self.client.get(reverse('attendance-list'), {'month': month})
+        self.assertQueryBudget(4, request)
+    
+    def test_retrieve(self):
+        self.assertQueryBudget(
+            2,
+            lambda attendance: self.client.get(reverse('attendance-detail', args=[attendance.pk])),
+            setup=lambda size: Attendance.objects.filter(notes='nota').last()
+        )
+    
+    def test_create(self):
+        def request(size):
+            return self.client.post(reverse('attendance-list'), {
+                'course_day': self.course_days[-1].pk,
+                'participant_identifier': f'nuovo{size}@budget.test',
+                'status': 'PRESENT'
+            })
+        self.assertQueryBudget(7, request, expected_status=201)
+    
+    def test_update(self):
+        def request(attendance):
+            return self.client.put(reverse('attendance-detail', args=[attendance.pk]), {
+                'course_day': attendance.course_day_id,
+                'participant_identifier': attendance.participant_identifier,
+                'status': 'EXCUSED',
+                'notes': 'Certificato medico'
+            })
+        self.assertQueryBudget(
+            7, request, setup=lambda size: Attendance.objects.filter(user__isnull=False).last()
+        )
+    
+    def test_destroy(self):
+        self.assertQueryBudget(
+            6,
+            lambda attendance: self.client.delete(reverse('attendance-detail', args=[attendance.pk])),
+            setup=lambda size: Attendance.objects.last()
+        )
+    
+    def test_bulk(self):
+        def request(size):
+            # Payload fisso (2 esistenti che cambiano + 2 nuove): un
+            # bulk_create e un update per combinazione stato/note, ognuno
+            # con la sua riservazione di change_seq, e la rilettura
+            identifiers = [self.participants[0].email, self.participants[1].email]
+            identifiers += [f'ospite{size}.{n}@budget.test' for n in range(2)]
+            return self.client.post(reverse('attendance-bulk'), {
+                'course_day_id': self.course_days[0].pk,
+                'attendances': [
+                    {'participant_identifier': identifier, 'status': 'PRESENT', 'notes': f'Lotto {size}'}
+                    for identifier in identifiers
+                ]
+            }, format='json')
+        self.assertQueryBudget(12, request, expected_status=201)
+    
+    def test_link_user(self):
+        def setup(size):
+            identifier = f'da.collegare{size}@budget.test'
+            for course_day in self.course_days:
+                Attendance.objects.create(
+                    course_day=course_day, participant_identifier=identifier
+                )
+            return identifier
+        
+        def request(identifier):
+            return self.client.post(reverse('attendance-link-user'), {
+                'user_id': self.participants[-1].pk,
+                'participant_identifier': identifier
+            })
+        self.assertQueryBudget(8, request, setup=setup)
+    
+    def test_by_course_day(self):
+        def request(size):
+            return self.client.get(
+                reverse('attendance-by-course-day', args=[self.course_days[0].pk])
+            )
+        self.assertQueryBudget(4, request)
+    
+    def test_changes(self):
+        # Utente, tombstone scadute (changes.pruned_through), righe, tombstone
+        self.assertQueryBudget(
+            4, lambda size: self.client.get(reverse('attendance-changes'), {'since': 1})
+        )
+    
+    def test_changes_sparse(self):
+        # change_seq caricato anche se non richiesto: niente query per riga
+        self.assertQueryBudget(4, lambda size: self.client.get(
+            reverse('attendance-changes'), {'since': 1, 'fields': 'id,status'}
+        ))
+    
+    def test_live_events(self):
+        # Frame del roll-call live: righe sparse con change_seq, tombstone
+        # e statistiche, senza query per riga
+        for size in (self.SMALL, self.LARGE):
+            self.grow(size)
+            course_day_id = self.course_days[0].pk
+            with self.assertNumQueries(3):
+                live.snapshot(course_day_id)
+            with self.assertNumQueries(3):
+                live.delta(course_day_id, 0)
+    
+    def test_fulltext_search(self):
+        def setup(size):
+            Attendance.objects.filter(user=self.participant).update(notes='Certificato medico')
+        self.assertQueryBudget(
+            3,
+            lambda size: self.client.get(reverse('attendance-fulltext-search'), {'q': 'certif'}),
+            setup=setup
+        )
+    
+    def test_admin_changelist(self):
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        url = reverse('admin:attendances_attendance_changelist')
+        self.assertQueryBudget(9, lambda size: self.client.get(url))
+        self.assertQueryBudget(10, lambda size: self.client.get(url, {
+            'q': 'mario', 'course_day__id__exact': self.course_days[0].pk,
+            'course_day__date__gte': self.course_days[0].date.isoformat()
+        }))
+    
+    def test_participant_forbidden(self):
+        self.authenticate(self.participant)
+        self.assertQueryBudget(
+            1, lambda size: self.client.get(reverse('attendance-list')),
+            expected_status=403
+        )
+
+
+class ParticipantAttendanceQueryBudgetTest(QueryBudgetTestCase):
+    """Budget di query delle viste del partecipante"""
+    
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.participant)
+    
+    def test_attendances(self):
+        self.assertQueryBudget(
+            3, lambda size: self.client.get(reverse('participant-attendances'))
+        )
+    
+    def test_attendances_filtered(self):
+        def request(size):
+            month = self.course_days[0].date.strftime('%Y-%m')
+            return self.client.get(
+                reverse('participant-attendances'), {'month': month, 'status': 'PRESENT'}
+            )
+        self.assertQueryBudget(3, request)
+    
+    def test_stats(self):
+        # Include la ricostruzione del calendario (grow() lo invalida)
+        self.assertQueryBudget(
+            5, lambda size: self.client.get(reverse('participant-stats'))
+        )
+    
+    def test_changes(self):
+        self.assertQueryBudget(4, lambda size: self.client.get(
+            reverse('participant-attendance-changes'), {'since': 1}
+        ))
+    
+    def test_changes_sparse(self):
+        self.assertQueryBudget(4, lambda size: self.client.get(
+            reverse('participant-attendance-changes'), {'since': 1, 'fields': 'id,status'}
+        ))
+    
+    @override_settings(CHECKIN_BATCH_WINDOW=0)
+    def test_checkin(self):
+        from . import checkin
+        
+        def setup(size):
+            course_day = self.course_days[0]
+            Attendance.objects.filter(course_day=course_day, user=self.participant).update(status='ABSENT')
+            return checkin.make_code(course_day.pk)
+        
+        # Utente del token, giornate, presenze collegate, righe esistenti + update
+        self.assertQueryBudget(
+            10,
+            lambda code: self.client.post(reverse('participant-checkin'), {'code': code}, format='json'),
+            setup=setup
+        )
+    
+    def test_anonymous(self):
+        self.client.credentials()
+        self.assertQueryBudget(
+            0, lambda size: self.client.get(reverse('participant-stats')),
+            expected_status=401
+        )
+
+
+class ParticipantStatsTest(APITestCase):
+    """Statistiche del partecipante: conteggi coerenti con le presenze"""
+    
+    DAYS = 6
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_days = create_register(participants, cls.DAYS)
+    
+    def setUp(self):
+        # Il calendario in memoria sopravvive al rollback tra i test
+        calendar.invalidate()
+        self.client.force_authenticate(self.participant)
+    
+    def test_stats_values(self):
+        response = self.client.get(reverse('participant-stats'))
+        data = response.data['data']
+        attendances = Attendance.objects.filter(user=self.participant)
+        self.assertEqual(data['total_course_days_past'], self.DAYS)
+        self.assertEqual(
+            data['present'], attendances.filter(status=Attendance.Status.PRESENT).count()
+        )
+        self.assertEqual(
+            sum(month['total_days'] for month in data['monthly_breakdown']), self.DAYS
+        )
+    
+    def test_stats_exclude_holidays(self):
+        holiday = self.course_days[0]
+        holiday.is_holiday = True
+        holiday.save()
+        response = self.client.get(reverse('participant-stats'))
+        data = response.data['data']
+        attendances = Attendance.objects.filter(
+            user=self.participant, course_day__is_holiday=False
+        )
+        self.assertEqual(data['total_course_days_past'], self.DAYS - 1)
+        self.assertEqual(
+            data['present'] + data['absent'] + data['excused'], attendances.count()
+        )
+        self.assertEqual(
+            sum(month['total_days'] for month in data['monthly_breakdown']), self.DAYS - 1
+        )
+
+
+class FullTextInstallTest(TestCase):
+    """post_migrate reinstalla l'indice full-text se una migrazione ne ha eliminato i trigger"""
+    
+    def test_reinstalled_after_migrate(self):
+        from django.db import connection
+        from django.db.models.signals import post_migrate
+        from django.apps import apps
+        
+        course_day = CourseDay.objects.create(date=date.today(), description='Lezione')
+        attendance = Attendance.objects.create(
+            course_day=course_day, participant_identifier='ospite@example.com', notes='Ritardo treno'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {fulltext.TABLE}_update')
+        self.assertFalse(fulltext.installed(connection))
+        
+        app_config = apps.get_app_config('attendances')
+        post_migrate.send(sender=app_config, app_config=app_config, verbosity=0,
+                          interactive=False, using=connection.alias, apps=apps, plan=[])
+        self.assertTrue(fulltext.installed(connection))
+        self.assertEqual(list(fulltext.matching(Attendance.objects.all(), 'treno')), [attendance])
+        Attendance.objects.filter(pk=attendance.pk).update(notes='Uscita anticipata')
+        self.assertEqual(list(fulltext.matching(Attendance.objects.all(), 'anticip')), [attendance])
+
+
+class WriteCoordinatorTest(TestCase):
+    """Coda di scrittura: lotti, isolamento degli errori, retry sul lock"""
+    
+    def setUp(self):
+        self.coordinator = writes.WriteCoordinator(retries=2, backoff=0)
+    
+    def execute(self, *funcs):
+        batch = [writes._Operation(func, (), {}) for func in funcs]
+        self.coordinator._execute(batch)
+        return [operation.future for operation in batch]
+    
+    def flaky(self, failures):
+        """Operazione che trova il DB bloccato ``failures`` volte"""
+        calls = []
+        
+        def func():
+            calls.append(None)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            return len(calls)
+        return func, calls
+    
+    def test_run_write_pass_through(self):
+        with override_settings(ATTENDANCE_WRITE_QUEUE=False), \
+                mock.patch.object(writes.coordinator, 'run') as run:
+            self.assertEqual(writes.run_write(lambda a, b=0: a + b, 1, b=2), 3)
+        run.assert_not_called()
+        
+        with override_settings(ATTENDANCE_WRITE_QUEUE=True), \
+                mock.patch.object(writes.coordinator, 'run', return_value='ok') as run:
+            self.assertEqual(writes.run_write(len, 'abc'), 'ok')
+        run.assert_called_once_with(len, 'abc')
+    
+    def test_retry_when_locked(self):
+        other, other_calls = self.flaky(failures=0)
+        func, calls = self.flaky(failures=2)
+        first, second = self.execute(other, func)
+        self.assertEqual((second.result(), len(calls)), (3, 3))
+        # Il lotto è ritentato per intero, compresa l'operazione già riuscita
+        self.assertEqual(first.result(), 3)
+    
+    def test_retries_exhausted(self):
+        func, calls = self.flaky(failures=10)
+        with self.assertLogs(writes.logger, 'ERROR'):
+            future, = self.execute(func)
+        self.assertIsInstance(future.exception(), OperationalError)
+        self.assertEqual(len(calls), 3)
+    
+    def test_error_isolated(self):
+        failing, ok = self.execute(lambda: int('x'), lambda: 'ok')
+        self.assertIsInstance(failing.exception(), ValueError)
+        self.assertEqual(ok.result(), 'ok')
+        
+        # Errore del DB diverso dal lock: nessun retry
+        func, calls = self.flaky(failures=1)
+        with mock.patch.object(writes, 'is_busy_error', return_value=False):
+            future, = self.execute(func)
+        self.assertIsInstance(future.exception(), OperationalError)
+        self.assertEqual(len(calls), 1)
+
+
+class WriteCoordinatorThreadTest(TransactionTestCase):
+    """Scritture eseguite dal thread della coda, visibili dopo il risultato"""
+    
+    def test_run(self):
+        coordinator = writes.WriteCoordinator(max_wait=0)
+        
+        def create(description):
+            return CourseDay.objects.create(date=date.today(), description=description).pk
+        
+        pk = coordinator.run(create, 'Lezione dalla coda')
+        self.assertEqual(CourseDay.objects.get(pk=pk).description, 'Lezione dalla coda')
+        with self.assertRaises(ValueError):
+            coordinator.run(int, 'x')
+
+
+class SeedScaleTest(TestCase):
+    """seed_scale con parametri minimi: conteggi, collegamenti, --flush-all"""
+    
+    OPTIONS = {'users': 4, 'unregistered': 2, 'days': 5, 'holiday_ratio': 0, 'linked_ratio': 0.5}
+    
+    def seed(self, **options):
+        call_command('seed_scale', stdout=StringIO(), **{**self.OPTIONS, **options})
+    
+    def test_seed(self):
+        self.seed()
+        self.assertEqual(CustomUser.objects.filter(email__endswith='@seed.example.com').count(), 4)
+        self.assertEqual(CourseDay.objects.count(), 5)
+        self.assertEqual(Attendance.objects.count(), (4 + 2) * 5)
+        # Ogni partecipante registrato una volta sola, collegato o no
+        linked = Attendance.objects.filter(user__isnull=False)
+        self.assertTrue(linked.exists())
+        self.assertFalse(linked.exclude(participant_identifier__endswith='@seed.example.com').exists())
+        self.assertEqual(
+            Attendance.objects.filter(participant_identifier__endswith='@guest.example.com').count(), 2 * 5
+        )
+        # Numeri di sequenza distinti, come le scritture dell'API
+        self.assertEqual(Attendance.objects.values('change_seq').distinct().count(), 30)
+        self.assertTrue(Attendance.objects.search('user1').exists())
+        
+        with self.assertRaises(CommandError):
+            self.seed()
+        # --flush-all chiede conferma
+        with mock.patch('builtins.input', return_value='no'):
+            self.seed(flush_all=True, users=2, unregistered=0)
+        self.assertEqual(Attendance.objects.count(), (4 + 2) * 5)
+        with mock.patch('builtins.input', return_value='si') as confirm:
+            self.seed(flush_all=True, users=2, unregistered=0)
+        self.assertIn('30 presenze', confirm.call_args.args[0])
+        self.assertEqual(Attendance.objects.count(), 2 * 5)
+        self.assertEqual(CustomUser.objects.filter(email__endswith='@seed.example.com').count(), 2)
+        self.seed(flush_all=True, interactive=False, users=2, unregistered=0)
+        self.assertEqual(Attendance.objects.count(), 2 * 5)
+        # --flush-all non lascia tombstone del dataset precedente
+        self.assertFalse(AttendanceTombstone.objects.exists())
+        # Indice full-text ricostruito una volta, trigger di nuovo attivi
+        self.assertEqual(fulltext.matching(Attendance.objects.all(), 'user1').count(), 5)
+        self.assertFalse(fulltext.ensure_installed())
+        Attendance.objects.filter(participant_identifier='user0@seed.example.com').update(notes='Sciopero')
+        self.assertEqual(fulltext.matching(Attendance.objects.all(), 'sciop').count(), 5)
+
+
+@mock.patch('attendances.management.commands._bench.setup_test_environment')
+class BenchmarkCommandTest(TestCase):
+    """Comandi di benchmark con parametri minimi (il test runner prepara già l'ambiente)"""
+    
+    def run_json(self, name, **options):
+        stdout = StringIO()
+        call_command(name, json=True, stdout=stdout, **options)
+        return json.loads(stdout.getvalue())
+    
+    def test_bench_endpoints(self, setup_test_environment):
+        call_command('seed_scale', users=3, days=4, holiday_ratio=0, linked_ratio=0, stdout=StringIO())
+        rows = list(Attendance.objects.order_by('pk').values_list('pk', 'status', 'notes', 'user_id'))
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            options = {'baseline_dir': baseline_dir, 'iterations': 1, 'stdout': StringIO()}
+            call_command('bench_endpoints', save_baseline=True, **options)
+            # Scritture dei casi admin annullate: stesse righe, nessun utente o storico bench
+            self.assertEqual(
+                list(Attendance.objects.order_by('pk').values_list('pk', 'status', 'notes', 'user_id')), rows
+            )
+            self.assertFalse(CustomUser.objects.filter(email__startswith='bench.').exists())
+            self.assertFalse(AttendanceAuditEntry.objects.exists())
+            baseline_path = Path(baseline_dir) / '1k.json'
+            baseline = json.loads(baseline_path.read_text())
+            self.assertEqual(baseline['dataset']['attendances'], 12)
+            self.assertIn('attendances-list', baseline['endpoints'])
+            self.assertGreater(baseline['endpoints']['me']['queries'], 0)
+            
+            # Solo differenze oltre le tolleranze sono regressioni
+            loose = {'tolerance': 1000, 'min_delta_ms': 10 ** 6, 'query_tolerance': 10}
+            call_command('bench_endpoints', only=['me'], **loose, **options)
+            baseline['endpoints']['me']['queries'] = -100
+            baseline_path.write_text(json.dumps(baseline))
+            with self.assertRaisesRegex(CommandError, '1 regressioni'):
+                call_command('bench_endpoints', only=['me'], stderr=StringIO(), **loose, **options)
+    
+    def test_bench_endpoints_empty(self, setup_test_environment):
+        with self.assertRaises(CommandError):
+            call_command('bench_endpoints', stdout=StringIO())
+    
+    def test_bench_render(self, setup_test_environment):
+        results = self.run_json('bench_render', rows=20, iterations=2)
+        self.assertEqual(results['rows'], 20)
+        self.assertEqual(results['candidate']['count'], 2)
+        self.assertGreater(results['speedup'], 0)
+
+
+@mock.patch('attendances.management.commands._bench.setup_test_environment')
+class ConcurrentBenchmarkCommandTest(TransactionTestCase):
+    """Benchmark con più thread: le loro connessioni devono vedere i dati, niente TestCase"""
+    
+    run_json = BenchmarkCommandTest.run_json
+    
+    def test_bench_db(self, setup_test_environment):
+        results = self.run_json('bench_db', duration=0.3, readers=1, writers=1, batch=2)
+        self.assertGreater(results['read']['count'] + results['write']['count'], 0)
+        self.assertEqual(set(results['errors']), {'read', 'write', 'locked'})
+        # Utenti, giornate, presenze e storico del benchmark non restano nel DB
+        self.assertFalse(CustomUser.objects.filter(email__startswith='bench.').exists())
+        self.assertFalse(CourseDay.objects.exists())
+        self.assertFalse(Attendance.objects.exists())
+        self.assertFalse(AttendanceAuditEntry.objects.exists())
+    
+    def test_bench_asgi(self, setup_test_environment):
+        results = self.run_json('bench_asgi', requests=2, concurrency=2, threads=2)
+        # Ogni endpoint servito dalle viste sincrone (WSGI) e asincrone (ASGI)
+        endpoints = {name.split()[1] for name in results}
+        self.assertEqual(
+            set(results), {f'{kind} {endpoint}' for kind in ('wsgi', 'asgi') for endpoint in endpoints}
+        )
+        for stats in results.values():
+            self.assertEqual((stats['count'], stats['errors']), (2, 0))
+    
+    def test_bench_checkin(self, setup_test_environment):
+        results = self.run_json('bench_checkin', checkins=4, duration=0.2, concurrency=2, repeat=0.5)
+        self.assertEqual((results['checkins'], results['participants'], results['errors']), (6, 4, 0))
+        self.assertGreaterEqual(results['batches'], 1)
+
+
+class StressWSGITest(LiveServerTestCase):
+    """stress_wsgi contro il server dei test (--url), con parametri minimi"""
+    
+    def test_mixed_load(self):
+        call_command('seed_scale', users=3, days=4, holiday_ratio=0, stdout=StringIO())
+        url = f'{self.server_thread.host}:{self.server_thread.port}'
+        stdout = StringIO()
+        call_command(
+            'stress_wsgi', url=url, concurrency=[1], duration=0.5, participants=2, json=True,
+            stdout=stdout
+        )
+        level = json.loads(stdout.getvalue())['1']
+        self.assertTrue(any(stats['count'] for stats in level.values()))
+        self.assertEqual({name: stats['errors'] for name, stats in level.items() if stats['errors']}, {})
+        
+        stdout = StringIO()
+        call_command('stress_wsgi', url=url, concurrency=[1], duration=0.1, participants=2, stdout=stdout)
+        self.assertIn('Concorrenza 1:', stdout.getvalue())
+    
+    def test_empty_dataset(self):
+        with self.assertRaises(CommandError):
+            call_command('stress_wsgi', url='127.0.0.1:1', stdout=StringIO())
+
+
+class ArchiveTest(APITestCase):
+    """Archiviazione: le letture restano uguali prima e dopo"""
+    
+    OFFSETS = [-400, -380, -200, -30, -10, 10]
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, = create_participants(1)
+        today = date.today()
+        cls.course_days = [
+            CourseDay.objects.create(date=today + timedelta(days=offset), description=f'Giorno {offset}')
+            for offset in cls.OFFSETS
+        ]
+        statuses = list(Attendance.Status.values)
+        for i, course_day in enumerate(cls.course_days):
+            Attendance.objects.create(
+                course_day=course_day,
+                participant_identifier=cls.participant.email,
+                user=cls.participant if i % 2 else None,
+                status=statuses[i % len(statuses)]
+            )
+            Attendance.objects.create(course_day=course_day, participant_identifier='ospite@example.com')
+        cls.cutoff = (today - timedelta(days=100)).replace(day=1)
+    
+    def setUp(self):
+        calendar.invalidate()
+    
+    def participant_reads(self):
+        self.client.force_authenticate(self.participant)
+        month = self.course_days[1].date.strftime('%Y-%m')
+        return [
+            self.client.get(reverse('participant-attendances')).data,
+            self.client.get(reverse('participant-attendances'), {'month': month}).data,
+            self.client.get(reverse('participant-attendances'), {'status': 'ABSENT'}).data,
+            self.client.get(reverse('participant-stats')).data,
+        ]
+    
+    def test_participant_reads_unchanged(self):
+        before = self.participant_reads()
+        run = archive.archive_before(self.cutoff, batch_size=2)
+        self.assertEqual((run.course_days, run.attendances), (3, 6))
+        self.assertEqual(Attendance.objects.count(), 6)
+        self.assertEqual(self.participant_reads(), before)
+    
+    def test_admin_reads(self):
+        archived_day = self.course_days[0]
+        archived_attendance = Attendance.objects.filter(course_day=archived_day).first()
+        call_command('archive_attendances', before=self.cutoff, stdout=StringIO())
+        self.client.force_authenticate(self.admin)
+        
+        # Senza mese: solo il periodo corrente, salvo ?archived=1
+        response = self.client.get(reverse('attendance-list'))
+        self.assertEqual(response.data['count'], 6)
+        response = self.client.get(reverse('attendance-list'), {'archived': '1'})
+        self.assertEqual(response.data['count'], 12)
+        
+        response = self.client.get(
+            reverse('attendance-list'), {'month': archived_day.date.strftime('%Y-%m')}
+        )
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['data'][0]['course_day_date'], str(archived_day.date))
+        
+        response = self.client.get(reverse('attendance-detail', args=[archived_attendance.pk]))
+        self.assertEqual(response.data['data']['participant_identifier'],
+                         archived_attendance.participant_identifier)
+        
+        response = self.client.get(reverse('attendance-by-course-day', args=[archived_day.pk]))
+        self.assertEqual(response.data['stats']['total'], 2)
+        
+        response = self.client.post(reverse('course-day-list'), {'date': archived_day.date})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_admin_archived_list_filters(self):
+        archive.archive_before(self.cutoff)
+        self.client.force_authenticate(self.admin)
+        url = reverse('attendance-list')
+        month = self.course_days[0].date.strftime('%Y-%m')
+        
+        def identifiers(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            return [row['participant_identifier'] for row in response.data['data']]
+        
+        # Filtri, ricerca e ordinamento valgono anche per le righe archiviate
+        self.assertEqual(identifiers(archived='1', participant_identifier='ospite@example.com'),
+                         ['ospite@example.com'] * 6)
+        self.assertEqual(identifiers(archived='1', search='rossi'), [self.participant.email] * 3)
+        self.assertEqual(identifiers(month=month, search='OSP'), ['ospite@example.com'])
+        self.assertEqual(identifiers(month=month, status='PRESENT'), [self.participant.email])
+        
+        response = self.client.get(url, {'archived': '1', 'ordering': '-course_day__date'})
+        archived_dates = [row['course_day_date'] for row in response.data['data'][:6]]
+        self.assertEqual(archived_dates, sorted(archived_dates, reverse=True))
+        self.assertEqual(self.client.get(url, {'archived': '1', 'course_day': 'x'}).status_code, 400)
+    
+    def test_link_user_updates_archive(self):
+        archive.archive_before(self.cutoff)
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(reverse('attendance-link-user'), {
+            'user_id': self.participant.pk,
+            'participant_identifier': 'ospite@example.com'
+        })
+        self.assertEqual(response.data['data']['updated_count'], 6)
+        summaries = ArchivedParticipantSummary.objects.filter(
+            participant_identifier='ospite@example.com'
+        )
+        self.assertTrue(summaries.exists())
+        self.assertFalse(summaries.exclude(user=self.participant).exists())
+    
+    def test_cutoff_first_of_month(self):
+        with self.assertRaises(ValueError):
+            archive.archive_before(self.cutoff + timedelta(days=1))
+    
+    def test_no_tombstones(self):
+        # Le righe archiviate restano leggibili: nessuna eliminazione per il sync delta
+        self.client.force_authenticate(self.admin)
+        token = self.client.get(reverse('attendance-changes')).data['next']
+        with mock.patch('attendances.live.publish_changes') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            archive.archive_before(self.cutoff)
+        publish.assert_not_called()
+        self.assertFalse(AttendanceTombstone.objects.exists())
+        response = self.client.get(reverse('attendance-changes'), {'since': token})
+        self.assertEqual(response.data['data'], {'changes': [], 'deleted': []})
+
+
+class AuditTest(APITestCase):
+    """Storico: ogni percorso di scrittura registra chi ha cambiato cosa"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, cls.other = create_participants(2)
+        cls.course_days = create_register([cls.participant, cls.other], 2)
+        cls.attendance = Attendance.objects.get(
+            course_day=cls.course_days[0], participant_identifier=cls.participant.email
+        )
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+    
+    def history(self, **params):
+        return self.client.get(reverse('attendance-participant-history'), params).data
+    
+    def test_api_update_and_delete(self):
+        url = reverse('attendance-detail', args=[self.attendance.pk])
+        old_status = self.attendance.status
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'status': 'EXCUSED'})
+            # Solo note: nessuna voce
+            self.client.patch(url, {'notes': 'Certificato'})
+            self.client.delete(url)
+        
+        response = self.client.get(reverse('attendance-history', args=[self.attendance.pk]))
+        self.assertEqual(
+            [(e['action'], e['old_status'], e['new_status']) for e in response.data['data']],
+            [('DELETE', 'EXCUSED', ''), ('UPDATE', old_status, 'EXCUSED')]
+        )
+        self.assertEqual(response.data['data'][0]['changed_by'], self.admin.pk)
+    
+    def test_bulk_link_user_and_admin_action(self):
+        from .admin import AttendanceAdmin
+        from django.contrib.admin.sites import site
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('attendance-bulk'), {
+                'course_day_id': self.course_days[0].pk,
+                'attendances': [
+                    {'participant_identifier': 'ospite@example.com', 'status': 'PRESENT'},
+                    {'participant_identifier': self.participant.email,
+                     'status': self.attendance.status},
+                ]
+            }, format='json')
+            self.client.post(reverse('attendance-link-user'), {
+                'user_id': self.other.pk,
+                'participant_identifier': 'ospite@example.com'
+            })
+            request = type('Request', (), {'user': self.admin})()
+            AttendanceAdmin(Attendance, site)._mark_as(
+                Attendance.objects.filter(participant_identifier='ospite@example.com'),
+                Attendance.Status.ABSENT, request.user
+            )
+        
+        entries = self.history(participant='ospite@example.com')['data']
+        self.assertEqual(
+            [(e['source'], e['action'], e['new_status'], e['new_user_id']) for e in entries],
+            [
+                ('admin', 'UPDATE', 'ABSENT', self.other.pk),
+                ('link-user', 'LINK', 'PRESENT', self.other.pk),
+                ('bulk', 'CREATE', 'PRESENT', None),
+            ]
+        )
+        # Riga invariata nel bulk: nessuna voce
+        self.assertEqual(self.history(participant=self.participant.email)['data'], [])
+    
+    def test_rollback_discards_entries(self):
+        from django.db import transaction
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.client.patch(
+                        reverse('attendance-detail', args=[self.attendance.pk]), {'status': 'EXCUSED'}
+                    )
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(AttendanceAuditEntry.objects.exists())
+    
+    @override_settings(AUDIT_FLUSH_MODE='background')
+    def test_background_buffer_flushed_before_reads(self):
+        from . import audit
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('attendance-detail', args=[self.attendance.pk]), {'status': 'EXCUSED'}
+            )
+        self.assertEqual(audit.buffer.pending(), 1)
+        self.assertEqual(len(self.history(participant=self.participant.email)['data']), 1)
+        self.assertEqual(audit.buffer.pending(), 0)
+    
+    def test_history_pagination(self):
+        url = reverse('attendance-detail', args=[self.attendance.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            for status in ['PRESENT', 'ABSENT', 'EXCUSED'] * 2:
+                self.client.patch(url, {'status': status})
+        
+        first = self.history(participant=self.participant.email, limit=3)
+        self.assertEqual(len(first['data']), 3)
+        second = self.client.get(first['next']).data
+        seen = [e['id'] for e in first['data'] + second['data']]
+        self.assertEqual(len(set(seen)), AttendanceAuditEntry.objects.count())
+        
+        response = self.client.get(reverse('attendance-participant-history'))
+        self.assertEqual(response.status_code, 400)
+
+
+class FastJSONRendererTest(APITestCase):
+    """Il renderer veloce produce gli stessi byte del JSONRenderer di DRF"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_days = create_register(participants, 2)
+    
+    def setUp(self):
+        calendar.invalidate()
+    
+    def assertSameBytes(self, data, accepted_media_type=None):
+        from rest_framework.renderers import JSONRenderer
+        from config.renderers import FastJSONRenderer
+        
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type)
+        )
+    
+    def test_responses(self):
+        self.client.force_authenticate(self.admin)
+        for url in [reverse('attendance-list'), reverse('attendance-by-course-day', args=[self.course_days[0].pk])]:
+            response = self.client.get(url)
+            self.assertSameBytes(response.data)
+        self.client.force_authenticate(self.participant)
+        self.assertSameBytes(self.client.get(reverse('participant-stats')).data)
+    
+    def test_types_and_fallbacks(self):
+        from datetime import datetime, time, timezone as dt_timezone
+        from decimal import Decimal
+        from zoneinfo import ZoneInfo
+        
+        self.assertSameBytes({
+            'success': True,
+            'utc': datetime(2025, 1, 7, 9, 30, 0, 5, tzinfo=dt_timezone.utc),
+            'rome': datetime(2025, 7, 1, 10, tzinfo=ZoneInfo('Europe/Rome')),
+            'naive': datetime(2025, 1, 7),
+            'date': date(2025, 1, 7),
+            'time': time(10, 30),
+            'decimal': Decimal('12.50'),
+            'duration': timedelta(hours=1),
+            'text': 'Niccolò \u2028 "virgolette"',
+            # Fallback sulla stdlib
+            'exponent': 1e16,
+            'big': 2 ** 70,
+            'keys': {1: 'a'},
+        })
+        self.assertSameBytes({'success': True}, 'application/json; indent=4')
+
+
+class SparseFieldsTest(APITestCase):
+    """?fields= / ?omit= restringono risposta e query"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_days = create_register(participants, 2)
+    
+    def get(self, url, params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        # Solo le query sulle presenze (non l'autenticazione)
+        return response.data, '\n'.join(
+            query['sql'] for query in context.captured_queries if 'attendances_attendance' in query['sql']
+        )
+    
+    def test_admin_list(self):
+        self.client.force_authenticate(self.admin)
+        data, sql = self.get(reverse('attendance-list'), {'fields': 'participant_identifier,status'})
+        self.assertEqual(list(data['data'][0]), ['participant_identifier', 'status'])
+        self.assertNotIn('users_customuser', sql)
+        self.assertNotIn('"notes"', sql)
+        # Nessun campo della giornata: niente JOIN per l'ordinamento
+        self.assertNotIn('JOIN', sql)
+        
+        data, sql = self.get(reverse('attendance-list'), {'omit': 'user_email,user_full_name,notes'})
+        self.assertNotIn('user_email', data['data'][0])
+        self.assertIn('course_day_date', data['data'][0])
+        self.assertNotIn('users_customuser', sql)
+        
+        data, sql = self.get(
+            reverse('attendance-by-course-day', args=[self.course_days[0].pk]),
+            {'fields': 'user_full_name'}
+        )
+        self.assertEqual(list(data['data'][0]), ['user_full_name'])
+        self.assertIn(self.participant.get_full_name(), [row['user_full_name'] for row in data['data']])
+        self.assertNotIn('course_days_courseday', sql)
+        
+        # Stesso ordine (per partecipante) della risposta completa
+        full, _ = self.get(reverse('attendance-by-course-day', args=[self.course_days[0].pk]), {})
+        data, sql = self.get(
+            reverse('attendance-by-course-day', args=[self.course_days[0].pk]),
+            {'fields': 'id,status'}
+        )
+        self.assertEqual(data['data'], [{'id': row['id'], 'status': row['status']} for row in full['data']])
+        self.assertNotIn('JOIN', sql)
+        
+        response = self.client.get(reverse('attendance-list'), {'fields': 'status,password'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_participant_list(self):
+        self.client.force_authenticate(self.participant)
+        data, sql = self.get(reverse('participant-attendances'), {'fields': 'date,is_present'})
+        self.assertEqual(list(data['data'][0]), ['date', 'is_present'])
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"notes"', sql)
+        
+        full, _ = self.get(reverse('participant-attendances'), {})
+        data, _ = self.get(reverse('participant-attendances'), {'omit': 'notes'})
+        self.assertEqual(data['data'], [
+            {name: value for name, value in row.items() if name != 'notes'} for row in full['data']
+        ])
+
+
+class ChangesTest(APITestCase):
+    """Sync delta: ogni percorso di scrittura avanza il flusso di modifiche"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, cls.other = create_participants(2)
+        cls.course_days = create_register([cls.participant, cls.other], 2)
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+    
+    def sync(self, since='', url_name='attendance-changes', **params):
+        response = self.client.get(reverse(url_name), {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+    
+    def test_full_then_delta(self):
+        full = self.sync()
+        self.assertEqual(len(full['data']['changes']), Attendance.objects.count())
+        self.assertEqual(self.sync(full['next'])['data'], {'changes': [], 'deleted': []})
+        
+        from .admin import AttendanceAdmin
+        
+        first, second = Attendance.objects.filter(participant_identifier=self.participant.email)[:2]
+        self.client.patch(reverse('attendance-detail', args=[first.pk]), {'notes': 'Ritardo'})
+        AttendanceAdmin._mark_as(
+            Attendance.objects.filter(pk=second.pk), Attendance.Status.EXCUSED, self.admin
+        )
+        self.client.post(reverse('attendance-link-user'), {
+            'user_id': self.participant.pk,
+            'participant_identifier': self.other.email
+        })
+        doomed = Attendance.objects.get(participant_identifier=self.other.email,
+                                        course_day=self.course_days[0])
+        self.client.delete(reverse('attendance-detail', args=[doomed.pk]))
+        
+        delta = self.sync(full['next'])
+        changed = {row['id'] for row in delta['data']['changes']}
+        self.assertEqual(changed, {
+            first.pk, second.pk,
+            *Attendance.objects.filter(participant_identifier=self.other.email)
+            .values_list('pk', flat=True)
+        })
+        self.assertEqual([row['id'] for row in delta['data']['deleted']], [doomed.pk])
+        
+        # L'update SQL dell'azione admin aggiorna anche updated_at
+        updated_at = {row['id']: row['updated_at'] for row in full['data']['changes']}
+        self.assertGreater(
+            next(row['updated_at'] for row in delta['data']['changes'] if row['id'] == second.pk),
+            updated_at[second.pk]
+        )
+    
+    def test_pages(self):
+        since, seen = '', []
+        while True:
+            page = self.sync(since, limit=1)
+            seen += [row['id'] for row in page['data']['changes']]
+            since = page['next']
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(Attendance.objects.values_list('pk', flat=True)))
+        
+        response = self.client.get(reverse('attendance-changes'), {'since': 'ieri'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_course_day_deletion_leaves_tombstones(self):
+        token = self.sync()['next']
+        course_day = self.course_days[0]
+        ids = set(course_day.attendances.values_list('pk', flat=True))
+        self.client.delete(reverse('course-day-detail', args=[course_day.pk]))
+        self.assertEqual({row['id'] for row in self.sync(token)['data']['deleted']}, ids)
+    
+    def test_tombstone_retention(self):
+        token = self.sync()['next']
+        first, second = Attendance.objects.filter(participant_identifier=self.other.email)[:2]
+        second_pk = second.pk
+        first.delete()
+        AttendanceTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=91))
+        recent_token = self.sync(token)['next']
+        second.delete()
+        
+        stdout = StringIO()
+        call_command('prune_tombstones', stdout=stdout)
+        self.assertIn('Eliminate 1 tombstone', stdout.getvalue())
+        self.assertEqual(list(AttendanceTombstone.objects.values_list('attendance_id', flat=True)), [second_pk])
+        
+        # Token precedente all'eliminazione scartata: sincronizzazione completa
+        response = self.client.get(reverse('attendance-changes'), {'since': token})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(len(self.sync()['data']['changes']), Attendance.objects.count())
+        self.assertEqual(
+            [row['id'] for row in self.sync(recent_token)['data']['deleted']], [second_pk]
+        )
+        self.assertEqual(changes.prune_tombstones(), 0)
+    
+    def test_participant(self):
+        self.client.force_authenticate(self.participant)
+        full = self.sync(url_name='participant-attendance-changes', fields='id,status')
+        own = Attendance.objects.filter(participant_identifier=self.participant.email)
+        self.assertEqual(len(full['data']['changes']), own.count())
+        self.assertEqual(list(full['data']['changes'][0]), ['id', 'status'])
+        
+        Attendance.objects.filter(participant_identifier=self.other.email).update(notes='x')
+        own.first().delete()
+        delta = self.sync(full['next'], url_name='participant-attendance-changes')
+        self.assertEqual(delta['data']['changes'], [])
+        self.assertEqual(len(delta['data']['deleted']), 1)
+
+
+@override_settings(LIVE_MIN_INTERVAL=0)
+class LiveTest(TestCase):
+    """Roll-call in diretta: una lettura per aggiornamento, N osservatori"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_days = create_register(participants, 2)
+        cls.course_day = cls.course_days[0]
+    
+    async def next_frame(self, queue):
+        return await asyncio.wait_for(queue.get(), 5)
+    
+    async def test_fan_out(self):
+        hub = live.Hub()
+        async with hub.subscribe(self.course_day.pk) as first, \
+                hub.subscribe(self.course_day.pk) as second:
+            for queue in (first, second):
+                self.assertIn(b'event: snapshot', await self.next_frame(queue))
+            self.assertEqual(hub.watched(), {self.course_day.pk})
+            
+            attendance = await Attendance.objects.filter(course_day=self.course_day).afirst()
+            attendance.notes = 'Uscita anticipata'
+            await sync_to_async(attendance.save)()
+            with mock.patch.object(live, 'delta', wraps=live.delta) as delta:
+                # Notifiche di altre giornate ignorate, di questa coalescenti
+                hub.notify({'course_day_ids': [self.course_days[1].pk]})
+                hub.notify({'course_day_ids': [self.course_day.pk]})
+                hub.notify({'course_day_ids': None})
+                frames = [await self.next_frame(first), await self.next_frame(second)]
+            
+            self.assertEqual(delta.call_count, 1)
+            self.assertIs(frames[0], frames[1])
+            self.assertIn(b'event: changes', frames[0])
+            self.assertIn(b'Uscita anticipata', frames[0])
+            self.assertTrue(frames[0].startswith(b'id: %d\n' % (await Attendance.objects.aget(
+                pk=attendance.pk)).change_seq))
+        self.assertEqual(hub.watched(), set())
+    
+    async def test_stream(self):
+        client = AsyncClient()
+        url = reverse('attendance-live', args=[self.course_day.pk])
+        response = await client.get(url)
+        self.assertEqual(response.status_code, 401)
+        
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        response = await client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        # Il contenuto dal generatore della vista, chiuso esplicitamente
+        # (la risposta del test client non chiude il generatore interno)
+        async with aclosing(CourseDayLiveView.stream(self.course_day.pk, None)) as stream:
+            frame = await asyncio.wait_for(anext(stream), 5)
+        self.assertTrue(frame.startswith(b'id: '))
+        self.assertIn(b'event: snapshot', frame)
+        self.assertIn(self.participant.email.encode(), frame)
+        
+        missing = reverse('attendance-live', args=[0])
+        self.assertEqual((await client.get(missing, headers=headers)).status_code, 404)
+
+
+class LiveBrokerCheckTest(SimpleTestCase):
+    """Controllo di avvio: più processi web richiedono un broker tra processi"""
+    
+    def errors(self):
+        return [message.id for message in check_live_broker(None)]
+    
+    def test_single_process(self):
+        with override_settings(WEB_CONCURRENCY=1):
+            self.assertEqual(self.errors(), [])
+    
+    def test_local_broker(self):
+        with override_settings(WEB_CONCURRENCY=4, LIVE_BROKER='attendances.live.LocalBroker'):
+            self.assertEqual(self.errors(), ['attendances.E001'])
+    
+    def test_shared_broker(self):
+        broker = f'{__name__}.SharedBroker'
+        with override_settings(WEB_CONCURRENCY=4, LIVE_BROKER=broker):
+            self.assertEqual(self.errors(), [])
+    
+    def test_registered(self):
+        from django.core import checks
+        
+        self.assertIn(check_live_broker, checks.registry.registry.get_checks())
+
+
+class SharedBroker:
+    """Broker tra processi fittizio per LiveBrokerCheckTest"""
+    
+    def publish(self, message):
+        pass
+    
+    def subscribe(self, listener):
+        pass
+
+
+@override_settings(ROLLCALL_FLUSH_SIZE=3, ROLLCALL_FLUSH_INTERVAL=3600)
+class RollCallTest(APITestCase):
+    """Sessioni di appello: segni coalescenti, scritti a lotti"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_day = create_register(participants, 2)[0]
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            reverse('attendance-rollcall-list'), {'course_day_id': self.course_day.pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.session_id = response.data['data']['session_id']
+    
+    def mark(self, *marks):
+        return self.client.post(
+            reverse('attendance-rollcall-marks', args=[self.session_id]), {'marks': marks}, format='json'
+        )
+    
+    def test_pending_marks_visible_then_committed(self):
+        existing = Attendance.objects.get(course_day=self.course_day, participant_identifier=self.participant.email)
+        old_status = existing.status
+        self.mark({'participant_identifier': self.participant.email, 'status': 'ABSENT'})
+        response = self.mark(
+            {'participant_identifier': self.participant.email, 'status': 'EXCUSED', 'notes': 'Certificato'},
+            {'participant_identifier': 'nuovo@example.com', 'status': 'PRESENT'}
+        )
+        self.assertEqual(response.data['data']['pending_count'], 2)
+        
+        # Ancora nulla nel DB, ma la lettura della sessione vede i segni
+        self.assertFalse(Attendance.objects.filter(participant_identifier='nuovo@example.com').exists())
+        existing.refresh_from_db()
+        self.assertNotEqual(existing.notes, 'Certificato')
+        
+        data = self.client.get(reverse('attendance-rollcall-detail', args=[self.session_id])).data
+        rows = {row['participant_identifier']: row for row in data['data']}
+        self.assertEqual(rows[self.participant.email]['status'], 'EXCUSED')
+        self.assertEqual(rows['nuovo@example.com']['id'], None)
+        self.assertEqual(data['stats']['total'], 3)
+        self.assertEqual(sorted(data['pending']), sorted([self.participant.email, 'nuovo@example.com']))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('attendance-rollcall-close', args=[self.session_id]))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            (response.data['data']['created_count'], response.data['data']['updated_count']), (1, 1)
+        )
+        existing.refresh_from_db()
+        self.assertEqual((existing.status, existing.notes), ('EXCUSED', 'Certificato'))
+        self.assertEqual(
+            Attendance.objects.get(participant_identifier='nuovo@example.com').course_day, self.course_day
+        )
+        self.assertEqual(
+            AttendanceAuditEntry.objects.filter(source='rollcall').count(),
+            1 + (old_status != 'EXCUSED')
+        )
+        
+        # Sessione chiusa
+        self.assertEqual(self.mark({'participant_identifier': 'x', 'status': 'PRESENT'}).status_code, 404)
+    
+    def test_batches(self):
+        identifiers = [f'tocco{n}@example.com' for n in range(7)]
+        for identifier in identifiers:
+            self.assertEqual(self.mark({'participant_identifier': identifier, 'status': 'PRESENT'}).status_code, 200)
+        # Due lotti da ROLLCALL_FLUSH_SIZE, uno ancora in attesa
+        self.assertEqual(Attendance.objects.filter(participant_identifier__in=identifiers).count(), 6)
+        
+        # Un segno senza scrittura: nessuna query
+        with self.assertNumQueries(0):
+            self.mark({'participant_identifier': identifiers[0], 'status': 'ABSENT'})
+        
+        self.client.post(reverse('attendance-rollcall-close', args=[self.session_id]))
+        self.assertEqual(Attendance.objects.filter(participant_identifier__in=identifiers).count(), 7)
+        self.assertEqual(Attendance.objects.get(participant_identifier=identifiers[0]).status, 'ABSENT')
+    
+    def test_validation(self):
+        self.assertEqual(self.mark().status_code, 400)
+        self.assertEqual(self.mark({'participant_identifier': 'x', 'status': 'BOH'}).status_code, 400)
+        response = self.client.post(reverse('attendance-rollcall-list'), {'course_day_id': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.participant)
+        self.assertEqual(self.mark({'participant_identifier': 'x', 'status': 'PRESENT'}).status_code, 403)
+
+
+@override_settings(CHECKIN_BATCH_WINDOW=0)
+class CheckInTest(APITestCase):
+    """Check-in con codice firmato: nessuna query per il codice, idempotente"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_day = create_register(participants, 2)[0]
+        cls.newcomer = create_user('nuovo@example.com')
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            reverse('attendance-checkin-code'), {'course_day_id': self.course_day.pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.code = response.data['data']['code']
+    
+    def check_in(self, code=None):
+        return self.client.post(reverse('participant-checkin'), {'code': code or self.code}, format='json')
+    
+    def test_check_in_twice(self):
+        self.client.force_authenticate(self.newcomer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.check_in().status_code, 200)
+            self.assertEqual(self.check_in().status_code, 200)
+        
+        attendance = Attendance.objects.get(course_day=self.course_day, participant_identifier=self.newcomer.email)
+        self.assertEqual((attendance.status, attendance.user_id), ('PRESENT', self.newcomer.pk))
+        self.assertEqual(
+            AttendanceAuditEntry.objects.filter(attendance_id=attendance.pk, source='checkin').count(), 1
+        )
+        
+        # Seconda scansione: nessuna scrittura oltre alla lettura del lotto
+        change_seq = attendance.change_seq
+        self.assertEqual(self.check_in().status_code, 200)
+        attendance.refresh_from_db()
+        self.assertEqual(attendance.change_seq, change_seq)
+    
+    def test_existing_row(self):
+        attendance = Attendance.objects.get(course_day=self.course_day, participant_identifier=self.participant.email)
+        Attendance.objects.filter(pk=attendance.pk).update(status='ABSENT')
+        self.client.force_authenticate(self.participant)
+        self.assertEqual(self.check_in().status_code, 200)
+        attendance.refresh_from_db()
+        self.assertEqual(attendance.status, 'PRESENT')
+        self.assertEqual(
+            Attendance.objects.filter(course_day=self.course_day, user=self.participant).count(), 1
+        )
+    
+    def test_invalid_codes(self):
+        self.client.force_authenticate(self.participant)
+        self.assertEqual(self.check_in(self.code + 'x').status_code, 400)
+        with mock.patch('django.core.signing.time.time', return_value=10 ** 10):
+            response = self.check_in()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('scaduto', response.data['error'])
+        
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.check_in().status_code, 403)
+
+
+class AttendanceAdminTest(TestCase):
+    """Changelist dell'admin: filtri a form, ricerca indicizzata, azioni su tutte le righe"""
+    
+    DAYS = 6
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user(
+            'admin@example.com', role=CustomUser.Role.ADMIN, is_staff=True, is_superuser=True
+        )
+        cls.participant, *_ = participants = create_participants(cls.DAYS)
+        cls.course_days = create_register(participants, cls.DAYS)
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:attendances_attendance_changelist')
+    
+    def changelist(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def listed(self, response):
+        return sorted(
+            (row.course_day_id, row.participant_identifier)
+            for row in response.context['cl'].result_list
+        )
+    
+    def test_prefix_search(self):
+        mine = sorted((day.pk, self.participant.email) for day in self.course_days)
+        # Cognome e nome per prefisso, in qualsiasi ordine, senza accenti
+        self.assertEqual(self.listed(self.changelist(q='ROSS mar')), mine)
+        self.assertEqual(self.listed(self.changelist(q='Màrio')), mine)
+        self.assertEqual(self.listed(self.changelist(q='mrossi@')), mine)
+        # Non per sottostringa
+        self.assertEqual(self.listed(self.changelist(q='ssi')), [])
+        
+        self.participant.last_name = 'Bianchi'
+        self.participant.save()
+        self.assertEqual(self.listed(self.changelist(q='rossi')), [])
+        self.assertEqual(self.listed(self.changelist(q='bianchi')), mine)
+    
+    def test_form_filters(self):
+        first, second = self.course_days[:2]
+        response = self.changelist(**{
+            'course_day__date__gte': first.date.isoformat(),
+            'course_day__date__lte': second.date.isoformat(),
+            'user__id__exact': self.participant.pk,
+        })
+        self.assertEqual(self.listed(response), [
+            (first.pk, self.participant.email), (second.pk, self.participant.email)
+        ])
+        # Campi vuoti del form: nessun filtro
+        response = self.changelist(**{'course_day__date__gte': '', 'course_day__id__exact': first.pk})
+        self.assertEqual(len(response.context['cl'].result_list), self.DAYS)
+        self.assertContains(response, str(first))
+    
+    def test_capped_and_estimated_count(self):
+        total = self.DAYS * self.DAYS
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=10):
+            response = self.changelist(status='PRESENT')
+            self.assertEqual(response.context['cl'].result_count, 11)
+            response = self.changelist()
+            self.assertEqual(response.context['cl'].result_count, 11)
+            
+            from django.db import connection
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            response = self.changelist()
+            self.assertEqual(response.context['cl'].result_count, total)
+    
+    def test_mark_all_matching(self):
+        course_day = self.course_days[0]
+        query = f'?course_day__id__exact={course_day.pk}'
+        changing = Attendance.objects.filter(course_day=course_day).exclude(status='EXCUSED').count()
+        unchanged = Attendance.objects.filter(course_day=course_day, status='EXCUSED').count()
+        self.assertGreater(unchanged, 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url + query, {
+                'action': 'mark_as_excused',
+                'select_across': '1',
+                'index': '0',
+                '_selected_action': [Attendance.objects.filter(course_day=course_day)[0].pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        # Il messaggio distingue le righe cambiate da quelle già nello stato
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            [f'{changing} presenze aggiornate a GIUSTIFICATO, {unchanged} già in stato GIUSTIFICATO.']
+        )
+        self.assertEqual(
+            Attendance.objects.filter(course_day=course_day).exclude(status='EXCUSED').count(), 0
+        )
+        self.assertEqual(
+            Attendance.objects.exclude(course_day=course_day).filter(status='EXCUSED').count(),
+            (self.DAYS - 1) * self.DAYS // len(Attendance.Status.values)
+        )
+        entries = AttendanceAuditEntry.objects.filter(source='admin')
+        self.assertEqual(entries.count(), changing)
+        self.assertEqual(
+            set(entries.values_list('new_status', 'changed_by', 'course_day_id')),
+            {('EXCUSED', self.admin.pk, course_day.pk)}
+        )
+
+
+class ListFiltersTest(APITestCase):
+    """Filtri, ricerca per prefisso e ordinamento della lista presenze"""
+    
+    DAYS = 6
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(cls.DAYS)
+        cls.course_days = create_register(participants, cls.DAYS)
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+    
+    def rows(self, expected_status=200, **params):
+        response = self.client.get(reverse('attendance-list'), params)
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data.get('data', response.data)
+    
+    def test_field_filters(self):
+        course_day = self.course_days[1]
+        rows = self.rows(course_day=course_day.pk, status='PRESENT')
+        self.assertEqual(
+            sorted(row['id'] for row in rows),
+            sorted(Attendance.objects.filter(course_day=course_day, status='PRESENT')
+                   .values_list('pk', flat=True))
+        )
+        self.assertEqual(len(self.rows(user=self.participant.pk)), self.DAYS)
+        self.assertEqual(len(self.rows(participant_identifier=self.participant.email)), self.DAYS)
+        # Valori vuoti ignorati, non validi rifiutati
+        self.assertEqual(len(self.rows(user='')), self.DAYS * self.DAYS)
+        self.assertIn('course_day', self.rows(expected_status=400, course_day='abc'))
+    
+    def test_prefix_search(self):
+        mine = sorted(
+            Attendance.objects.filter(user=self.participant).values_list('pk', flat=True)
+        )
+        self.assertEqual(sorted(row['id'] for row in self.rows(search='rossi MAR')), mine)
+        self.assertEqual(sorted(row['id'] for row in self.rows(search='mrossi@example')), mine)
+        self.assertEqual(self.rows(search='ossi'), [])
+        # Identificativo senza utente collegato
+        Attendance.objects.create(
+            course_day=self.course_days[0], participant_identifier='Ospite.Verdi@esterno.test'
+        )
+        self.assertEqual(
+            [row['participant_identifier'] for row in self.rows(search='ospite.v')],
+            ['Ospite.Verdi@esterno.test']
+        )
+    
+    def test_ordering_only_on_indexed_fields(self):
+        from config.filters import is_indexed
+        from .views import AdminAttendanceViewSet
+        
+        for field in AdminAttendanceViewSet.ordering_fields:
+            self.assertTrue(is_indexed(Attendance, field), field)
+        self.assertFalse(is_indexed(Attendance, 'status'))
+        self.assertFalse(is_indexed(Attendance, 'participant_identifier'))
+        
+        rows = self.rows(ordering='-id')
+        self.assertEqual([row['id'] for row in rows], sorted((row['id'] for row in rows), reverse=True))
+        # Campo non indicizzato: ignorato, resta l'ordinamento di default
+        default = [row['id'] for row in self.rows()]
+        self.assertEqual([row['id'] for row in self.rows(ordering='status')], default)
+        
+        dates = [row['course_day_date'] for row in self.rows(ordering='-course_day__date')]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(dates[0], self.course_days[-1].date.isoformat())
+
+
+class FullTextSearchTest(APITestCase):
+    """Ricerca FTS5 su note e nomi: indice allineato su ogni scrittura, rilevanza, pagine"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin@example.com', role=CustomUser.Role.ADMIN)
+        cls.participant, *_ = participants = create_participants(2)
+        cls.course_days = create_register(participants, 2)
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('attendance-fulltext-search')
+    
+    def found(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['data']]
+    
+    def test_index_follows_every_write_path(self):
+        from . import rollcall
+        
+        first, second = self.course_days
+        mine = Attendance.objects.get(course_day=first, user=self.participant)
+        
+        # save, update di queryset, bulk_create con upsert
+        mine.notes = 'Ritardo per sciopero'
+        mine.save()
+        self.assertEqual(self.found('sciop'), [mine.pk])
+        Attendance.objects.filter(pk=mine.pk).update(notes='Uscita anticipata')
+        self.assertEqual(self.found('sciopero'), [])
+        self.assertEqual(self.found('anticip'), [mine.pk])
+        rollcall.apply_marks(first.pk, {
+            mine.participant_identifier: ('EXCUSED', 'Visita specialistica'),
+            'ospite@esterno.test': ('PRESENT', 'Ospite della mattina'),
+        })
+        guest = Attendance.objects.get(participant_identifier='ospite@esterno.test')
+        self.assertEqual(self.found('visita'), [mine.pk])
+        self.assertEqual(self.found('ospite mattina'), [guest.pk])
+        
+        # Nomi dell'utente collegato, anche dopo un cambio di cognome
+        both = sorted(Attendance.objects.filter(user=self.participant).values_list('pk', flat=True))
+        self.assertEqual(sorted(self.found('mario rossi')), both)
+        self.participant.last_name = 'Verdi'
+        self.participant.save()
+        self.assertEqual(self.found('rossi'), [])
+        self.assertEqual(sorted(self.found('verdi')), both)
+        
+        # Eliminazioni, anche a cascata con la giornata
+        guest.delete()
+        self.assertEqual(self.found('ospite'), [])
+        second.delete()
+        self.assertEqual(self.found('verdi'), [mine.pk])
+    
+    def test_ranking_snippet_and_pages(self):
+        rows = Attendance.objects.filter(course_day=self.course_days[0]).order_by('pk')
+        Attendance.objects.filter(pk=rows[0].pk).update(
+            notes='Presente solo al pomeriggio: ritardo del treno regionale delle otto'
+        )
+        Attendance.objects.filter(pk=rows[1].pk).update(notes='Ritardo. Ritardo ripetuto, ritardo')
+        
+        response = self.client.get(self.url, {'q': 'RITARDÒ', 'limit': 1})
+        self.assertEqual([row['id'] for row in response.data['data']], [rows[1].pk])
+        self.assertIn('[Ritardo]', response.data['data'][0]['snippet'])
+        self.assertIsNone(response.data['previous'])
+        
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['data']], [rows[0].pk])
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        
+        # Solo nei nomi: nessun estratto
+        response = self.client.get(self.url, {'q': 'example'})
+        self.assertEqual({row['snippet'] for row in response.data['data']}, {None})
+        
+        self.assertEqual(self.client.get(self.url, {'q': ' '}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'x', 'limit': 'tanti'}).status_code, 400)
+    
+    def test_admin_search_includes_notes(self):
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        attendance = Attendance.objects.filter(user=self.participant).first()
+        Attendance.objects.filter(pk=attendance.pk).update(notes='Certificato medico')
+        
+        response = self.client.get(reverse('admin:attendances_attendance_changelist'), {'q': 'certificato'})
+        self.assertEqual([row.pk for row in response.context['cl'].result_list], [attendance.pk])
+
+
+# Viste asincrone accanto a quelle sincrone: ASYNC_PARTICIPANT_VIEWS è
+# letto una volta sola, all'import di attendances/urls.py
+urlpatterns = [
+    path('async/participant/attendances/', AsyncParticipantAttendanceListView.as_view(),
+         name='async-participant-attendances'),
+    path('async/participant/stats/', AsyncParticipantStatsView.as_view(), name='async-participant-stats'),
+    path('', include('config.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncParticipantViewsTest(APITestCase):
+    """Viste asincrone attraverso lo stack ASGI: stesse risposte di quelle sincrone"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.participant = CustomUser.objects.create_user(
+            email='mario.rossi@example.com',
+            username='mario.rossi',
+            password='password123',
+            first_name='Mario',
+            last_name='Rossi'
+        )
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com',
+            username='admin',
+            password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+        today = date.today()
+        statuses = list(Attendance.Status.values)
+        for n in range(4):
+            course_day = CourseDay.objects.create(
+                date=today - timedelta(days=n * 7 + 1), description=f'Lezione {n + 1}'
+            )
+            Attendance.objects.create(
+                course_day=course_day,
+                participant_identifier=cls.participant.email,
+                user=cls.participant,
+                status=statuses[n % len(statuses)],
+                notes='Ritardo' if n % 2 else ''
+            )
+        cls.month = (today - timedelta(days=1)).strftime('%Y-%m')
+        CourseDay.objects.create(date=today + timedelta(days=7), description='Prossima lezione')
+    
+    def setUp(self):
+        calendar.invalidate()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.participant)}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+    
+    async def assertSameResponse(self, name, params=None):
+        expected = await sync_to_async(self.client.get)(reverse(name), params)
+        response = await self.async_client.get(reverse(f'async-{name}'), params, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        self.assertEqual(response.content, expected.content)
+    
+    async def test_attendances(self):
+        await self.assertSameResponse('participant-attendances')
+        await self.assertSameResponse('participant-attendances', {'month': self.month, 'status': 'PRESENT'})
+        await self.assertSameResponse('participant-attendances', {'fields': 'id,status'})
+    
+    async def test_stats(self):
+        await self.assertSameResponse('participant-stats')
+    
+    async def test_permissions(self):
+        url = reverse('async-participant-attendances')
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        
+        admin = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        self.assertEqual((await self.async_client.get(url, headers=admin)).status_code, 403)
+        self.assertEqual((await self.async_client.post(url, headers=self.headers)).status_code, 405)
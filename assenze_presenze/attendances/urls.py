@@ -1,20 +1,42 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AdminAttendanceViewSet,
+    RollCallViewSet,
     ParticipantAttendanceListView,
-    ParticipantStatsView
+    ParticipantAttendanceChangesView,
+    ParticipantCheckInView,
+    ParticipantStatsView,
+    AsyncParticipantAttendanceListView,
+    AsyncParticipantStatsView,
+    CourseDayLiveView
 )
 
+# Sotto ASGI le viste partecipante girano in modalità asincrona
+if settings.ASYNC_PARTICIPANT_VIEWS:
+    attendance_list_view = AsyncParticipantAttendanceListView
+    stats_view = AsyncParticipantStatsView
+else:
+    attendance_list_view = ParticipantAttendanceListView
+    stats_view = ParticipantStatsView
+
 # Router per ViewSet admin
 router = DefaultRouter()
+# Prima delle presenze: 'rollcall' non va letto come {id} di una presenza
+router.register(r'admin/attendances/rollcall', RollCallViewSet, basename='attendance-rollcall')
 router.register(r'admin/attendances', AdminAttendanceViewSet, basename='attendance')
 
 urlpatterns = [
+    # Registro in diretta (SSE, ASGI)
+    path('admin/attendances/live/<int:course_day_id>/', CourseDayLiveView.as_view(), name='attendance-live'),
+    
     # Endpoint admin (CRUD + bulk + link-user)
     path('', include(router.urls)),
     
-    # Endpoint partecipante (solo lettura)
-    path('participant/attendances/', ParticipantAttendanceListView.as_view(), name='participant-attendances'),
-    path('participant/stats/', ParticipantStatsView.as_view(), name='participant-stats'),
+    # Endpoint partecipante (letture e check-in)
+    path('participant/attendances/', attendance_list_view.as_view(), name='participant-attendances'),
+    path('participant/attendances/changes/', ParticipantAttendanceChangesView.as_view(), name='participant-attendance-changes'),
+    path('participant/attendances/checkin/', ParticipantCheckInView.as_view(), name='participant-checkin'),
+    path('participant/stats/', stats_view.as_view(), name='participant-stats'),
 ]
\ No newline at end of file
@@ -1,22 +1,68 @@
+import asyncio
+
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models import Q, Count
-from .models import Attendance
+from . import archive, audit, changes, checkin, fulltext, live, rollcall, stats
+from .models import (
+    Attendance,
+    ArchivedAttendance,
+    ArchivedCourseDay,
+    AttendanceAuditEntry,
+    AttendanceTombstone,
+)
+from .writes import run_write
 from .serializers import (
+    ArchivedAttendanceSerializer,
+    ArchivedParticipantAttendanceSerializer,
+    AttendanceAuditEntrySerializer,
     AttendanceSerializer,
+    AttendanceTombstoneSerializer,
     ParticipantAttendanceSerializer,
     BulkAttendanceSerializer,
+    CheckInCodeSerializer,
+    CheckInSerializer,
     LinkUserSerializer,
-    AttendanceStatsSerializer
+    RollCallMarksSerializer,
+    RollCallOpenSerializer
 )
 from admins.permissions import IsAdmin, IsParticipant
+from config import metrics
+from config.async_views import AsyncAPIView
+from course_days.calendar import aget_calendar, get_calendar
 from course_days.models import CourseDay
 
 
+class AuditHistoryPagination(CursorPagination):
+    """
+    Storico dal più recente, a cursore sull'indice temporale: le pagine
+    restano stabili mentre arrivano nuove voci.
+    """
+    ordering = ('-changed_at', '-id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    
+    def get_paginated_response(self, data):
+        return Response({
+            "success": True,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "data": data
+        })
+
+
 class AdminAttendanceViewSet(viewsets.ModelViewSet):
     """
     ViewSet per la gestione delle presenze (solo admin).
@@ -29,29 +75,94 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
     - DELETE /api/admin/attendances/{id}/         → Elimina presenza
     - POST   /api/admin/attendances/bulk/         → Crea presenze multiple
     - POST   /api/admin/attendances/link-user/    → Collega utente a presenze
+    - GET    /api/admin/attendances/{id}/history/ → Storico della presenza
+    - GET    /api/admin/attendances/history/      → Storico di un partecipante
+    - GET    /api/admin/attendances/changes/      → Sync delta (?since=<token>)
+    - GET    /api/admin/attendances/search/?q=    → Ricerca full-text su note e nomi
+    - GET    /api/admin/attendances/live/{course_day_id}/ → Eventi SSE (CourseDayLiveView)
+    - POST   /api/admin/attendances/checkin-code/ → Codice di check-in di una giornata
+    - /api/admin/attendances/rollcall/...         → Sessioni di appello (RollCallViewSet)
+    
+    Le letture includono l'archivio (archive.py) solo quando serve:
+    ?month= di un mese archiviato, ?archived=1 per la lista completa,
+    dettaglio e by-course-day di righe/giornate archiviate. A differenza
+    della lista del partecipante (sempre tutto lo storico, poche righe),
+    la lista senza ?month= resta sul periodo corrente: è paginata sulla
+    tabella delle presenze, l'archivio di tutti i partecipanti no.
+    
+    La lista accetta ?course_day=, ?user=, ?status=, ?participant_identifier=,
+    ?search= (inizio di identificativo, email, nome o cognome) e ?ordering=
+    su campi indicizzati (course_day__date, id, change_seq), vedi
+    config/filters.py.
+    
+    Lista, dettaglio e by-course-day accettano ?fields=a,b e ?omit=c:
+    oltre alla risposta si restringe la query (colonne e join), vedi
+    SparseFieldsMixin.
     """
     queryset = Attendance.objects.select_related('course_day', 'user').all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
+    # Le GET (lista, dettaglio, by-course-day) possono leggere dalla replica
+    read_replica = True
     filterset_fields = ['course_day', 'user', 'status', 'participant_identifier']
-    search_fields = ['participant_identifier', 'user__email', 'user__first_name', 'user__last_name']
-    ordering_fields = ['course_day__date', 'participant_identifier', 'status', 'created_at']
+    # Colonne normalizzate cercate da AttendanceQuerySet.search (per prefisso)
+    search_fields = ['search_identifier', 'user__search_email', 'user__search_first_name',
+                     'user__search_last_name']
+    # Solo campi indicizzati (config/filters.py); id per ordine di creazione
+    ordering_fields = ['course_day__date', 'id', 'change_seq']
+    # Letture che accettano ?fields= / ?omit=
+    sparse_actions = ['list', 'retrieve', 'by_course_day', 'changes', 'fulltext_search']
+    sparse_fields = None
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.sparse_actions:
+            self.sparse_fields = AttendanceSerializer.requested_fields(request.query_params)
+    
+    def get_queryset(self):
+        return AttendanceSerializer.sparse_queryset(super().get_queryset(), self.sparse_fields)
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs.setdefault('fields', self.sparse_fields)
+        return super().get_serializer(*args, **kwargs)
     
     def list(self, request, *args, **kwargs):
         """Lista presenze con filtri e response formattata"""
         queryset = self.filter_queryset(self.get_queryset())
+        archived = None
         
         # Filtro aggiuntivo per mese (es: ?month=2025-01)
         month = request.query_params.get('month')
         if month:
             try:
                 year, m = month.split('-')
-                queryset = queryset.filter(
+                month_filter = Q(
                     course_day__date__year=int(year),
                     course_day__date__month=int(m)
                 )
+                queryset = queryset.filter(month_filter)
+                # Mese archiviato: le righe sono solo nell'archivio
+                if archive.is_archived_month(archive.parse_month(month), archive.boundary()):
+                    queryset = None
+                    archived = self.filter_queryset(self.archived_queryset()).filter(month_filter)
             except ValueError:
                 pass
+        elif request.query_params.get('archived') == '1':
+            archived = self.filter_queryset(self.archived_queryset())
+        
+        if archived is not None:
+            rows = ArchivedAttendanceSerializer(archived, many=True, fields=self.sparse_fields).data
+            count = len(rows)
+            if queryset is not None:
+                hot = self.get_serializer(queryset, many=True).data
+                rows = [*rows, *hot]
+                count += len(hot)
+            return Response({
+                "success": True,
+                "count": count,
+                "data": rows
+            })
         
         # Paginazione
         page = self.paginate_queryset(queryset)
@@ -67,14 +178,24 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
         })
     
     def retrieve(self, request, *args, **kwargs):
-        """Dettaglio presenza"""
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
+        """Dettaglio presenza (anche archiviata)"""
+        try:
+            instance = self.get_object()
+        except Http404:
+            instance = get_object_or_404(self.archived_queryset(), pk=kwargs['pk'])
+            serializer = ArchivedAttendanceSerializer(instance, fields=self.sparse_fields)
+        else:
+            serializer = self.get_serializer(instance)
         return Response({
             "success": True,
             "data": serializer.data
         })
     
+    def archived_queryset(self):
+        return ArchivedAttendanceSerializer.sparse_queryset(
+            ArchivedAttendance.objects.select_related('course_day', 'user'), self.sparse_fields
+        )
+    
     def create(self, request, *args, **kwargs):
         """Crea nuova presenza"""
         serializer = self.get_serializer(data=request.data)
@@ -108,6 +229,30 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
             "message": "Presenza eliminata con successo."
         }, status=status.HTTP_200_OK)
     
+    # Le scritture passano dalla coda (se attiva, vedi writes.py) e
+    # registrano lo storico nella stessa transazione (audit.py)
+    def perform_create(self, serializer):
+        run_write(self._save, serializer, self.request.user)
+    
+    def perform_update(self, serializer):
+        run_write(self._save, serializer, self.request.user)
+    
+    def perform_destroy(self, instance):
+        run_write(self._delete, instance, self.request.user)
+    
+    @staticmethod
+    def _save(serializer, actor):
+        before = audit.snapshot(serializer.instance) if serializer.instance else None
+        attendance = serializer.save()
+        audit.record([audit.for_save(attendance, before, actor, 'api')])
+        return attendance
+    
+    @staticmethod
+    def _delete(instance, actor):
+        entry = audit.for_delete(instance, actor, 'api')
+        instance.delete()
+        audit.record([entry])
+    
     @action(detail=False, methods=['post'])
     def bulk(self, request):
         """
@@ -131,24 +276,19 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
         course_day_id = serializer.validated_data['course_day_id']
         attendances_data = serializer.validated_data['attendances']
         
-        created = []
-        updated = []
-        
-        for item in attendances_data:
-            attendance, was_created = Attendance.objects.update_or_create(
-                course_day_id=course_day_id,
-                participant_identifier=item['participant_identifier'],
-                defaults={
-                    'status': item['status'],
-                    'notes': item.get('notes', '')
-                }
-            )
-            if was_created:
-                created.append(attendance)
-            else:
-                updated.append(attendance)
+        created, updated = run_write(
+            self._upsert_attendances, course_day_id, attendances_data, request.user
+        )
         
-        all_attendances = created + updated
+        # Riletti in una query con le relazioni (il serializer legge course_day e user)
+        by_identifier = {
+            attendance.participant_identifier: attendance
+            for attendance in self.get_queryset().filter(
+                course_day_id=course_day_id, participant_identifier__in=created + updated
+            )
+        }
+        all_attendances = [by_identifier[identifier] for identifier in created + updated]
+        metrics.registry.inc('attendance_bulk_rows_total', value=len(all_attendances))
         
         return Response({
             "success": True,
@@ -160,6 +300,55 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
             }
         }, status=status.HTTP_201_CREATED)
     
+    @staticmethod
+    def _upsert_attendances(course_day_id, attendances_data, actor=None):
+        """
+        Crea o aggiorna le presenze di una giornata a insiemi, come
+        l'appello (rollcall.apply_marks): un bulk_create per le nuove e un
+        update per combinazione stato/note, ognuno con una sola
+        riservazione di change_seq, invece di un update_or_create per riga.
+        Restituisce gli identificativi (creati, già esistenti).
+        """
+        # Ultimo valore per identificativo, come con update_or_create in sequenza
+        marks = {
+            item['participant_identifier']: (item['status'], item.get('notes', ''))
+            for item in attendances_data
+        }
+        existing = set(Attendance.objects.filter(
+            course_day_id=course_day_id, participant_identifier__in=list(marks)
+        ).values_list('participant_identifier', flat=True))
+        
+        rollcall.apply_marks(course_day_id, marks, actor, 'bulk')
+        return (
+            [identifier for identifier in marks if identifier not in existing],
+            [identifier for identifier in marks if identifier in existing],
+        )
+    
+    @action(detail=False, methods=['post'], url_path='checkin-code')
+    def checkin_code(self, request):
+        """
+        Codice firmato per il check-in dei partecipanti (da mostrare in aula).
+        
+        POST /api/admin/attendances/checkin-code/
+        
+        Request body:
+        {
+            "course_day_id": 1
+        }
+        """
+        serializer = CheckInCodeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        course_day_id = serializer.validated_data['course_day_id']
+        return Response({
+            "success": True,
+            "data": {
+                "course_day_id": course_day_id,
+                "code": checkin.make_code(course_day_id),
+                "expires_in": settings.CHECKIN_CODE_TTL
+            }
+        })
+    
     @action(detail=False, methods=['post'], url_path='link-user')
     def link_user(self, request):
         """
@@ -179,10 +368,8 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
         user_id = serializer.validated_data['user_id']
         identifier = serializer.validated_data['participant_identifier']
         
-        # Aggiorna tutte le presenze con quell'identifier
-        updated_count = Attendance.objects.filter(
-            participant_identifier=identifier
-        ).update(user_id=user_id)
+        # Aggiorna tutte le presenze con quell'identifier (archivio compreso)
+        updated_count = run_write(self._link_user, identifier, user_id, request.user)
         
         if updated_count == 0:
             return Response({
@@ -200,6 +387,123 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
             }
         })
     
+    @staticmethod
+    def _link_user(identifier, user_id, actor=None):
+        attendances = Attendance.objects.filter(participant_identifier=identifier)
+        # Solo le righe che cambiano davvero utente entrano nello storico
+        relinked = list(
+            attendances.exclude(user_id=user_id).order_by()
+            .values_list('pk', 'course_day_id', 'status', 'user_id')
+        )
+        updated_count = attendances.update(user_id=user_id)
+        audit.record(
+            audit.entry(
+                audit.Action.LINK, pk, course_day_id, identifier, actor, 'link-user',
+                old_status=status, new_status=status,
+                old_user_id=old_user_id, new_user_id=user_id
+            )
+            for pk, course_day_id, status, old_user_id in relinked
+        )
+        return updated_count + archive.link_user(identifier, user_id)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Presenze create/modificate/eliminate dopo il token (vedi changes.py).
+        
+        GET /api/admin/attendances/changes/?since=<token>&limit=500
+        """
+        return changes_response(
+            request, self.get_queryset(), AttendanceTombstone.objects.all(),
+            lambda rows: self.get_serializer(rows, many=True).data
+        )
+    
+    @action(detail=False, methods=['get'], url_path='search')
+    def fulltext_search(self, request):
+        """
+        Ricerca full-text su note e nomi, per rilevanza (vedi fulltext.py).
+        
+        GET /api/admin/attendances/search/?q=certificato&limit=50&offset=0
+        
+        Ogni risultato ha ``snippet``: estratto delle note con i termini
+        trovati tra [ ], null se la corrispondenza è solo nei nomi.
+        """
+        try:
+            query, limit, offset = fulltext.parse_params(request.query_params)
+        except ValueError as error:
+            return Response({
+                "success": False,
+                "error": str(error)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_queryset()
+        hits = fulltext.search(query, limit + 1, offset, queryset.db)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+        # Nell'ordine di rilevanza
+        rows = queryset.order_by().in_bulk([pk for pk, _ in hits])
+        hits = [(rows[pk], snippet) for pk, snippet in hits if pk in rows]
+        serializer = self.get_serializer([row for row, _ in hits], many=True)
+        data = [
+            {**item, "snippet": snippet}
+            for item, (_, snippet) in zip(serializer.data, hits)
+        ]
+        
+        url = request.build_absolute_uri()
+        return Response({
+            "success": True,
+            "next": replace_query_param(url, 'offset', offset + limit) if has_more else None,
+            "previous": (replace_query_param(url, 'offset', max(offset - limit, 0))
+                         if offset else None),
+            "data": data
+        })
+    
+    @action(detail=True, methods=['get'], pagination_class=AuditHistoryPagination)
+    def history(self, request, pk=None):
+        """
+        Storico delle modifiche di una presenza (anche eliminata).
+        
+        GET /api/admin/attendances/{id}/history/?limit=100
+        """
+        return self._history(AttendanceAuditEntry.objects.filter(attendance_id=pk))
+    
+    @action(detail=False, methods=['get'], url_path='history',
+            pagination_class=AuditHistoryPagination)
+    def participant_history(self, request):
+        """
+        Storico delle modifiche alle presenze di un partecipante.
+        
+        GET /api/admin/attendances/history/?participant=mario@test.com
+        Filtri opzionali: ?since=2025-01-01T00:00:00Z, ?until=...
+        """
+        identifier = request.query_params.get('participant')
+        if not identifier:
+            return Response({
+                "success": False,
+                "error": "Parametro 'participant' obbligatorio."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return self._history(
+            AttendanceAuditEntry.objects.filter(participant_identifier=identifier)
+        )
+    
+    def _history(self, entries):
+        # Le voci ancora nel buffer del processo devono essere visibili
+        audit.flush()
+        for param, lookup in (('since', 'changed_at__gte'), ('until', 'changed_at__lt')):
+            value = self.request.query_params.get(param)
+            if value:
+                moment = parse_datetime(value)
+                if moment is None:
+                    return Response({
+                        "success": False,
+                        "error": f"Parametro '{param}' non valido (ISO 8601)."
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                entries = entries.filter(**{lookup: moment})
+        # Lo storico è sempre sul primario: la replica può essere indietro
+        page = self.paginate_queryset(entries.using(DEFAULT_DB_ALIAS))
+        serializer = AttendanceAuditEntrySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
     @action(detail=False, methods=['get'], url_path='by-course-day/(?P<course_day_id>[^/.]+)')
     def by_course_day(self, request, course_day_id=None):
         """
@@ -208,24 +512,137 @@ class AdminAttendanceViewSet(viewsets.ModelViewSet):
         GET /api/admin/attendances/by-course-day/{course_day_id}/
         """
         attendances = self.get_queryset().filter(course_day_id=course_day_id)
-        serializer = self.get_serializer(attendances, many=True)
-        
-        # Statistiche giornata
-        stats = {
-            'total': attendances.count(),
-            'present': attendances.filter(status=Attendance.Status.PRESENT).count(),
-            'absent': attendances.filter(status=Attendance.Status.ABSENT).count(),
-            'excused': attendances.filter(status=Attendance.Status.EXCUSED).count(),
-        }
+        serializer_class = self.get_serializer_class()
+        
+        # Giornata archiviata: le presenze sono nell'archivio
+        if (not CourseDay.objects.filter(pk=course_day_id).exists()
+                and ArchivedCourseDay.objects.filter(pk=course_day_id).exists()):
+            attendances = self.archived_queryset().filter(course_day_id=course_day_id)
+            serializer_class = ArchivedAttendanceSerializer
+        serializer = serializer_class(attendances, many=True, fields=self.sparse_fields)
+        
+        # Statistiche giornata (una sola query)
+        day_stats = attendances.aggregate(total=Count('id'), **stats.status_counts())
         
         return Response({
             "success": True,
             "course_day_id": course_day_id,
-            "stats": stats,
+            "stats": day_stats,
             "data": serializer.data
         })
 
 
+class RollCallViewSet(viewsets.ViewSet):
+    """
+    Sessioni di appello con segni bufferizzati (solo admin), vedi rollcall.py.
+    
+    Endpoints:
+    - POST /api/admin/attendances/rollcall/             → Apre una sessione
+    - GET  /api/admin/attendances/rollcall/{id}/        → Registro con i segni in attesa
+    - POST /api/admin/attendances/rollcall/{id}/marks/  → Registra segni
+    - POST /api/admin/attendances/rollcall/{id}/close/  → Scrive i segni e chiude
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    lookup_value_regex = '[0-9a-f]{32}'
+    
+    @staticmethod
+    def session_data(session):
+        return {
+            "session_id": session['id'],
+            "course_day_id": session['course_day_id'],
+            "pending_count": len(session['marks']),
+            "created_count": session['created_count'],
+            "updated_count": session['updated_count'],
+        }
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, rollcall.SessionNotFound):
+            return Response({"success": False, "error": str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        if isinstance(exc, rollcall.SessionBusy):
+            return Response({"success": False, "error": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+    
+    def create(self, request):
+        """
+        Apre una sessione di appello.
+        
+        POST /api/admin/attendances/rollcall/
+        
+        Request body:
+        {
+            "course_day_id": 1
+        }
+        """
+        serializer = RollCallOpenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        session = rollcall.open_session(serializer.validated_data['course_day_id'], request.user)
+        return Response({
+            "success": True,
+            "data": self.session_data(session)
+        }, status=status.HTTP_201_CREATED)
+    
+    def retrieve(self, request, pk=None):
+        """Presenze della giornata con i segni in attesa già applicati"""
+        session = rollcall.get_session(pk)
+        course_day_id = session['course_day_id']
+        course_day = get_object_or_404(CourseDay, pk=course_day_id)
+        attendances = Attendance.objects.select_related('user').filter(course_day_id=course_day_id)
+        for attendance in attendances:
+            attendance.course_day = course_day
+        rows, day_stats = rollcall.overlay(attendances, course_day, session['marks'])
+        
+        return Response({
+            "success": True,
+            "session": self.session_data(session),
+            "course_day_id": course_day_id,
+            "stats": day_stats,
+            "pending": list(session['marks']),
+            "data": AttendanceSerializer(rows, many=True).data
+        })
+    
+    @action(detail=True, methods=['post'])
+    def marks(self, request, pk=None):
+        """
+        Registra segni nella sessione; vengono scritti a lotti.
+        
+        POST /api/admin/attendances/rollcall/{id}/marks/
+        
+        Request body:
+        {
+            "marks": [
+                {"participant_identifier": "mario@test.com", "status": "PRESENT"},
+                {"participant_identifier": "lucia@test.com", "status": "EXCUSED", "notes": "Ritardo"}
+            ]
+        }
+        """
+        serializer = RollCallMarksSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        session = rollcall.add_marks(pk, serializer.validated_data['marks'], request.user)
+        return Response({
+            "success": True,
+            "data": self.session_data(session)
+        })
+    
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        """
+        Scrive i segni in attesa e chiude la sessione.
+        
+        POST /api/admin/attendances/rollcall/{id}/close/
+        """
+        session = rollcall.close_session(pk, request.user)
+        return Response({
+            "success": True,
+            "message": (
+                f"Appello salvato: create {session['created_count']} nuove presenze, "
+                f"aggiornate {session['updated_count']} esistenti."
+            ),
+            "data": self.session_data(session)
+        })
+
+
 class ParticipantAttendanceListView(APIView):
     """
     Lista delle presenze del partecipante loggato.
@@ -233,43 +650,179 @@ class ParticipantAttendanceListView(APIView):
     GET /api/participant/attendances/
     
     Il partecipante può vedere SOLO le proprie presenze.
-    Non può modificare nulla.
+    Non può modificare nulla. Accetta ?fields= e ?omit= (SparseFieldsMixin).
     """
     permission_classes = [IsAuthenticated, IsParticipant]
+    read_replica = True
     
     def get(self, request):
         """Lista presenze del partecipante"""
-        # Cerca presenze tramite user ID o participant_identifier (email)
-        attendances = Attendance.objects.filter(
-            Q(user=request.user) | Q(participant_identifier=request.user.email)
-        ).select_related('course_day').order_by('course_day__date')
+        fields = ParticipantAttendanceSerializer.requested_fields(request.query_params)
+        attendances, archived = participant_attendance_querysets(
+            request.user, request.query_params, archive.boundary(), fields
+        )
         
-        # Filtro opzionale per mese
-        month = request.query_params.get('month')
-        if month:
-            try:
-                year, m = month.split('-')
-                attendances = attendances.filter(
-                    course_day__date__year=int(year),
-                    course_day__date__month=int(m)
-                )
-            except ValueError:
-                pass
+        data = []
+        count = 0
+        if archived is not None:
+            data = ArchivedParticipantAttendanceSerializer(archived, many=True, fields=fields).data
+            count = len(data)
+        if attendances is not None:
+            data = [*data, *ParticipantAttendanceSerializer(attendances, many=True, fields=fields).data]
+            count += attendances.count()
         
-        # Filtro opzionale per stato
-        status_filter = request.query_params.get('status')
-        if status_filter:
-            attendances = attendances.filter(status=status_filter)
+        return Response({
+            "success": True,
+            "count": count,
+            "data": data
+        })
+
+
+class ParticipantAttendanceChangesView(APIView):
+    """
+    Sync delta delle presenze del partecipante loggato.
+    
+    GET /api/participant/attendances/changes/?since=<token>&limit=500
+    
+    Stesso formato di /api/admin/attendances/changes/; accetta ?fields=
+    e ?omit= come la lista.
+    """
+    permission_classes = [IsAuthenticated, IsParticipant]
+    read_replica = True
+    
+    def get(self, request):
+        fields = ParticipantAttendanceSerializer.requested_fields(request.query_params)
+        rows = ParticipantAttendanceSerializer.sparse_queryset(
+            Attendance.objects.filter(stats.participant_filter(request.user)).select_related('course_day'),
+            fields
+        )
+        return changes_response(
+            request, rows, changes.participant_tombstones(request.user),
+            lambda page: ParticipantAttendanceSerializer(page, many=True, fields=fields).data
+        )
+
+
+class ParticipantCheckInView(APIView):
+    """
+    Check-in del partecipante loggato con il codice mostrato in aula.
+    
+    POST /api/participant/attendances/checkin/
+    
+    Request body:
+    {
+        "code": "..."
+    }
+    
+    Il codice si valida senza query; la presenza viene scritta in un lotto
+    con gli altri check-in dello stesso momento (vedi checkin.py). Una
+    seconda scansione non cambia nulla.
+    """
+    permission_classes = [IsAuthenticated, IsParticipant]
+    
+    def post(self, request):
+        serializer = CheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        serializer = ParticipantAttendanceSerializer(attendances, many=True)
+        try:
+            course_day_id = checkin.parse_code(serializer.validated_data['code'])
+            checkin.batcher.submit(course_day_id, request.user)
+        except checkin.InvalidCode as error:
+            return Response({
+                "success": False,
+                "error": str(error)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             "success": True,
-            "count": attendances.count(),
-            "data": serializer.data
+            "message": "Presenza registrata.",
+            "data": {
+                "course_day_id": course_day_id,
+                "status": Attendance.Status.PRESENT
+            }
         })
 
 
+def changes_response(request, rows, tombstones, serialize):
+    """Risposta del sync delta (admin e partecipante)"""
+    try:
+        since, limit = changes.parse_params(request.query_params)
+    except ValueError as error:
+        return Response({
+            "success": False,
+            "error": str(error)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        changed, deleted, next_token, has_more = changes.changes_since(rows, tombstones, since, limit)
+    except changes.TokenExpired as error:
+        return Response({
+            "success": False,
+            "error": str(error)
+        }, status=status.HTTP_410_GONE)
+    return Response({
+        "success": True,
+        "next": next_token,
+        "has_more": has_more,
+        "data": {
+            "changes": serialize(changed),
+            "deleted": AttendanceTombstoneSerializer(deleted, many=True).data
+        }
+    })
+
+
+def participant_attendance_querysets(user, params, cutoff, fields=None):
+    """
+    Querysets (presenze, presenze archiviate) per la lista del
+    partecipante; None dove l'intervallo richiesto non serve.
+    
+    Filtri opzionali: ?month=2025-01, ?status=PRESENT. Senza mese la
+    lista comprende tutto lo storico, quindi anche l'archivio.
+    ``fields``: campi richiesti, per caricare solo le colonne necessarie.
+    """
+    # Cerca presenze tramite user ID o participant_identifier (email)
+    attendances = Attendance.objects.filter(
+        stats.participant_filter(user)
+    ).select_related('course_day').order_by('course_day__date')
+    archived = None
+    if cutoff is not None:
+        archived = ArchivedAttendance.objects.filter(
+            stats.participant_filter(user)
+        ).select_related('course_day').order_by('course_day__date')
+    
+    # Filtro opzionale per mese
+    month = params.get('month')
+    if month:
+        try:
+            year, m = month.split('-')
+            month_filter = Q(
+                course_day__date__year=int(year),
+                course_day__date__month=int(m)
+            )
+        except ValueError:
+            pass
+        else:
+            if archive.is_archived_month(archive.parse_month(month), cutoff):
+                attendances = None
+                archived = archived.filter(month_filter)
+            else:
+                attendances = attendances.filter(month_filter)
+                archived = None
+    
+    # Filtro opzionale per stato
+    status_filter = params.get('status')
+    if status_filter:
+        if attendances is not None:
+            attendances = attendances.filter(status=status_filter)
+        if archived is not None:
+            archived = archived.filter(status=status_filter)
+    
+    if attendances is not None:
+        attendances = ParticipantAttendanceSerializer.sparse_queryset(attendances, fields)
+    if archived is not None:
+        archived = ArchivedParticipantAttendanceSerializer.sparse_queryset(archived, fields)
+    return attendances, archived
+
+
 class ParticipantStatsView(APIView):
     """
     Statistiche delle presenze del partecipante.
@@ -278,80 +831,156 @@ class ParticipantStatsView(APIView):
     
     La percentuale è calcolata SOLO sulle giornate passate.
     I giustificati (EXCUSED) contano come presenza.
+    Le giornate festive non contano.
     """
     permission_classes = [IsAuthenticated, IsParticipant]
+    read_replica = True
     
     def get(self, request):
         """Calcola statistiche presenze"""
         today = timezone.now().date()
         
-        # Giornate di corso passate (escluse future)
-        past_course_days = CourseDay.objects.filter(date__lte=today)
-        total_past_days = past_course_days.count()
-        
-        # Giornate future
-        future_course_days = CourseDay.objects.filter(date__gt=today)
-        total_future_days = future_course_days.count()
+        # Giornate di lezione passate/future e per mese: dal calendario in memoria
+        course_calendar = get_calendar()
         
         # Presenze dell'utente (solo giorni passati)
-        user_attendances = Attendance.objects.filter(
-            Q(user=request.user) | Q(participant_identifier=request.user.email),
-            course_day__date__lte=today
-        )
+        user_attendances = stats.participant_attendances(request.user, today)
         
-        # Conteggi per stato
-        present_count = user_attendances.filter(status=Attendance.Status.PRESENT).count()
-        absent_count = user_attendances.filter(status=Attendance.Status.ABSENT).count()
-        excused_count = user_attendances.filter(status=Attendance.Status.EXCUSED).count()
-        
-        # Calcolo percentuale
-        # PRESENT + EXCUSED contano come presenza
-        if total_past_days > 0:
-            attendance_percentage = round(
-                ((present_count + excused_count) / total_past_days) * 100,
-                2
-            )
-        else:
-            attendance_percentage = 0.0
-        
-        # Breakdown mensile (opzionale)
-        monthly_breakdown = []
-        months = user_attendances.dates('course_day__date', 'month')
-        for month in months:
-            month_attendances = user_attendances.filter(
-                course_day__date__year=month.year,
-                course_day__date__month=month.month
+        # Conteggi per stato e breakdown mensile: query fisse, niente ciclo per mese
+        return Response({
+            "success": True,
+            "data": stats.build_stats(
+                course_calendar.count_until(today),
+                course_calendar.count_after(today),
+                user_attendances.aggregate(**stats.status_counts()),
+                stats.monthly_status_counts(user_attendances),
+                course_calendar.days_per_month(today),
+                # Mesi archiviati: dai riepiloghi congelati (vuoti senza archivio)
+                stats.archived_monthly_status_counts(request.user),
+                list(stats.archived_days_per_month())
             )
-            month_days = past_course_days.filter(
-                date__year=month.year,
-                date__month=month.month
-            ).count()
-            
-            month_present = month_attendances.filter(status=Attendance.Status.PRESENT).count()
-            month_excused = month_attendances.filter(status=Attendance.Status.EXCUSED).count()
-            
-            month_percentage = round(
-                ((month_present + month_excused) / month_days) * 100, 2
-            ) if month_days > 0 else 0.0
-            
-            monthly_breakdown.append({
-                'month': month.strftime('%Y-%m'),
-                'total_days': month_days,
-                'present': month_present,
-                'absent': month_attendances.filter(status=Attendance.Status.ABSENT).count(),
-                'excused': month_excused,
-                'percentage': month_percentage
-            })
+        })
+
+
+async def _alist(queryset):
+    """Valuta un queryset con l'ORM asincrono"""
+    return [row async for row in queryset]
+
+
+class AsyncParticipantAttendanceListView(AsyncAPIView):
+    """
+    Variante asincrona di ParticipantAttendanceListView (ASGI).
+    
+    GET /api/participant/attendances/
+    
+    Stessa risposta della vista sincrona: il conteggio è ricavato
+    dalle righe già lette invece che con una seconda query.
+    """
+    permission_classes = [IsAuthenticated, IsParticipant]
+    read_replica = True
+    
+    async def get(self, request):
+        """Lista presenze del partecipante"""
+        fields = ParticipantAttendanceSerializer.requested_fields(request.GET)
+        attendances, archived = participant_attendance_querysets(
+            request.user, request.GET, await archive.aboundary(), fields
+        )
         
-        return Response({
+        data = []
+        if archived is not None:
+            data = ArchivedParticipantAttendanceSerializer(
+                await _alist(archived), many=True, fields=fields
+            ).data
+        if attendances is not None:
+            data = [*data, *ParticipantAttendanceSerializer(
+                await _alist(attendances), many=True, fields=fields
+            ).data]
+        
+        return self.render({
             "success": True,
-            "data": {
-                "total_course_days_past": total_past_days,
-                "total_course_days_future": total_future_days,
-                "present": present_count,
-                "absent": absent_count,
-                "excused": excused_count,
-                "attendance_percentage": attendance_percentage,
-                "monthly_breakdown": monthly_breakdown
-            }
+            "count": len(data),
+            "data": data
+        })
+
+
+class AsyncParticipantStatsView(AsyncAPIView):
+    """
+    Variante asincrona di ParticipantStatsView (ASGI).
+    
+    GET /api/participant/stats/
+    
+    Stesse query della vista sincrona, una dopo l'altra: l'ORM asincrono
+    le esegue comunque in sequenza sul thread condiviso di sync_to_async,
+    quindi lanciarle insieme non le renderebbe concorrenti. Il vantaggio
+    è non occupare un thread del server durante l'attesa; il breakdown
+    mensile usa un GROUP BY (vedi stats.py).
+    """
+    permission_classes = [IsAuthenticated, IsParticipant]
+    read_replica = True
+    
+    async def get(self, request):
+        """Calcola statistiche presenze"""
+        today = timezone.now().date()
+        
+        user_attendances = stats.participant_attendances(request.user, today)
+        
+        course_calendar = await aget_calendar()
+        
+        return self.render({
+            "success": True,
+            "data": stats.build_stats(
+                course_calendar.count_until(today),
+                course_calendar.count_after(today),
+                await user_attendances.aaggregate(**stats.status_counts()),
+                await _alist(stats.monthly_status_counts(user_attendances)),
+                course_calendar.days_per_month(today),
+                # Mesi archiviati: dai riepiloghi congelati (vuoti senza archivio)
+                await _alist(stats.archived_monthly_status_counts(request.user)),
+                await _alist(stats.archived_days_per_month())
+            )
         })
+
+
+class CourseDayLiveView(AsyncAPIView):
+    """
+    Registro di una giornata in diretta (Server-Sent Events, ASGI).
+    
+    GET /api/admin/attendances/live/{course_day_id}/
+    
+    Primo evento ``snapshot`` (presenze e statistiche della giornata), poi
+    un evento ``changes`` per ogni gruppo di scritture, con le righe
+    cambiate, le eliminazioni e le statistiche aggiornate. Con
+    Last-Event-ID (riconnessione) il primo evento contiene solo le
+    modifiche perse. Il token JWT va nell'header Authorization.
+    
+    Gli osservatori della stessa giornata condividono una lettura per
+    aggiornamento, vedi live.py.
+    """
+    permission_classes = [IsAdmin]
+    
+    async def get(self, request, course_day_id):
+        if not await CourseDay.objects.filter(pk=course_day_id).aexists():
+            return self.render({
+                "success": False,
+                "error": "Giornata di corso non trovata."
+            }, status=404)
+        
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        since = int(last_event_id) if last_event_id.isdigit() else None
+        response = StreamingHttpResponse(
+            self.stream(course_day_id, since), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Niente buffering nei proxy (nginx)
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @staticmethod
+    async def stream(course_day_id, since):
+        async with live.hub.subscribe(course_day_id, since) as queue:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+
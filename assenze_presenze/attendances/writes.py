@@ -0,0 +1,143 @@
+"""
+Coda di scrittura per le presenze (opzionale, ATTENDANCE_WRITE_QUEUE).
+
+Con SQLite un solo writer alla volta può tenere il lock: bulk, azioni
+admin e link-user concorrenti finiscono in "database is locked". Con la
+coda attiva tutte le scritture passano da un unico thread che:
+
+- raggruppa le operazioni in attesa in una sola transazione (un commit
+  per lotto invece che per riga)
+- isola ogni operazione in un savepoint, così l'errore di una non
+  annulla le altre del lotto
+- ritenta l'intero lotto con back-off esponenziale se il DB è occupato
+- risolve il Future di ogni operazione solo dopo il commit
+
+Senza coda ``run_write`` esegue l'operazione direttamente.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_busy_error(exc):
+    """True per gli errori di lock di SQLite"""
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class _Operation:
+    __slots__ = ('func', 'args', 'kwargs', 'future')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteCoordinator:
+    """Esegue le scritture su un unico thread, a lotti"""
+
+    def __init__(self, max_batch=50, max_wait=0.005, retries=6, backoff=0.01):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Accoda un'operazione e restituisce il suo Future"""
+        self._ensure_started()
+        operation = _Operation(func, args, kwargs)
+        self._queue.put(operation)
+        return operation.future
+
+    def run(self, func, *args, **kwargs):
+        """Accoda un'operazione e attende il risultato (o l'eccezione)"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name='attendance-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            close_old_connections()
+            self._execute(batch)
+
+    def _execute(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                results = self._commit(batch)
+                break
+            except Exception as exc:
+                if not is_busy_error(exc) or attempt == self.retries:
+                    logger.exception('Lotto di %d scritture fallito', len(batch))
+                    for operation in batch:
+                        operation.future.set_exception(exc)
+                    return
+                delay = self.backoff * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+        for operation, result, error in results:
+            if error is not None:
+                operation.future.set_exception(error)
+            else:
+                operation.future.set_result(result)
+
+    def _commit(self, batch):
+        results = []
+        with transaction.atomic():
+            for operation in batch:
+                try:
+                    with transaction.atomic():
+                        result = operation.func(*operation.args, **operation.kwargs)
+                except Exception as exc:
+                    # Il lock riguarda tutto il lotto: va ritentato per intero
+                    if is_busy_error(exc):
+                        raise
+                    results.append((operation, None, exc))
+                else:
+                    results.append((operation, result, None))
+        return results
+
+
+coordinator = WriteCoordinator(
+    max_batch=getattr(settings, 'ATTENDANCE_WRITE_QUEUE_BATCH', 50)
+)
+
+
+def run_write(func, *args, **kwargs):
+    """Esegue una scrittura tramite la coda se attiva, altrimenti subito"""
+    if settings.ATTENDANCE_WRITE_QUEUE:
+        return coordinator.run(func, *args, **kwargs)
+    return func(*args, **kwargs)
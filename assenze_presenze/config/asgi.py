@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Sotto ASGI le letture dei partecipanti usano le viste asincrone
+os.environ.setdefault('ASYNC_PARTICIPANT_VIEWS', '1')
 
 application = get_asgi_application()
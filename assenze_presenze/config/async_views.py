@@ -0,0 +1,111 @@
+"""
+Base per le viste asincrone servite dall'applicazione ASGI.
+
+DRF non supporta viste ``async``: questa classe replica il minimo
+indispensabile (autenticazione JWT, permessi, envelope JSON) sopra una
+``View`` asincrona di Django, così che le letture dei partecipanti non
+occupino un thread per tutta la durata della richiesta.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication con lookup dell'utente eseguito fuori dall'event loop"""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
+
+
+class AsyncAPIView(View):
+    """
+    Vista asincrona con la stessa interfaccia esterna di un APIView.
+
+    - Autenticazione: JWT (stessi header ed errori di DRF)
+    - Permessi: ``permission_classes`` come in DRF
+    - Risposta: renderizzata con il renderer JSON di DEFAULT_RENDERER_CLASSES
+      (config/renderers.py), byte per byte uguale
+
+    I metodi non implementati in modo asincrono (es. PATCH/PUT) vengono
+    delegati a ``sync_view``, se impostata.
+    """
+    permission_classes = []
+    sync_view = None
+
+    authenticator = AsyncJWTAuthentication()
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Come APIView: autenticazione via token, niente CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = None
+        if method in self.http_method_names and method != 'options':
+            handler = getattr(self, method, None)
+
+        if handler is None:
+            if self.sync_view is not None:
+                view = self.sync_view.as_view()
+                return await sync_to_async(view)(request, *args, **kwargs)
+            return self.render(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status=405
+            )
+
+        try:
+            await self.initial(request)
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+    async def initial(self, request):
+        """Autentica la richiesta e verifica i permessi"""
+        result = await self.authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                raise exceptions.PermissionDenied(
+                    detail=getattr(permission, 'message', None)
+                )
+
+    def handle_exception(self, request, exc):
+        """Stesso formato di errore dell'exception handler di DRF"""
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+
+        response = self.render(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authenticator.authenticate_header(request)
+        return response
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status,
+            content_type='application/json'
+        )
@@ -0,0 +1,49 @@
+"""
+Router per replica in sola lettura.
+
+Le scritture vanno sempre su ``default``. Le letture vanno sulla replica
+solo quando ReplicaRoutingMiddleware lo ha deciso per la richiesta
+corrente (vista marcata con ``read_replica = True``, metodo sicuro, utente
+non "pinnato" al primario dopo una sua scrittura recente).
+"""
+
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_ALIAS = 'replica'
+
+# Alias per le letture della richiesta corrente (None = default)
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def get_read_alias():
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    """Imposta l'alias per le letture del contesto corrente"""
+    _read_alias.set(alias)
+
+
+class PrimaryReplicaRouter:
+    """Letture sulla replica quando richiesto, scritture sempre sul primario"""
+
+    def db_for_read(self, model, **hints):
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario e replica contengono gli stessi dati
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Lo schema della replica arriva dalla replicazione (o da sync_replica)
+        return db != REPLICA_ALIAS
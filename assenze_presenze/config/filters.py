@@ -0,0 +1,113 @@
+"""
+Filtri, ricerca e ordinamento delle liste dell'API (DEFAULT_FILTER_BACKENDS).
+
+I viewset dichiarano cosa accettano:
+
+- ``filterset_fields``: ``?campo=valore`` per uguaglianza (campi del
+  modello o ForeignKey per id); valori non validi → 400
+- ``search_fields``: ``?search=`` per prefisso. Se il queryset ha un
+  metodo ``search`` (AttendanceQuerySet, CustomUserQuerySet) la ricerca
+  passa da lì, sulle colonne normalizzate e indicizzate di
+  config/search.py; altrimenti vale SearchFilter di DRF
+- ``ordering_fields``: ``?ordering=`` solo sui campi serviti da un indice
+  (primo campo dell'indice, anche attraverso una ForeignKey); gli altri
+  vengono ignorati come i campi sconosciuti. Si aggiunge la chiave
+  primaria per un ordine stabile tra le pagine
+"""
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import models
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend, OrderingFilter, SearchFilter
+
+
+def leading_index_fields(model):
+    """Nomi dei campi con cui inizia almeno un indice del modello"""
+    opts = model._meta
+    names = {
+        field.name for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    }
+    names.update(fields[0] for fields in opts.unique_together if fields)
+    names.update(index.fields[0].lstrip('-') for index in opts.indexes if index.fields)
+    names.update(
+        constraint.fields[0] for constraint in opts.constraints
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields
+    )
+    return names
+
+
+def is_indexed(model, path):
+    """
+    ``path`` (es. 'course_day__date') ordinabile da un indice: ogni
+    passaggio è una ForeignKey indicizzata e l'ultimo campo apre un indice
+    del proprio modello.
+    """
+    *relations, name = path.split('__')
+    for relation in relations:
+        try:
+            field = model._meta.get_field(relation)
+        except FieldDoesNotExist:
+            return False
+        if not (field.many_to_one or field.one_to_one) or not field.concrete:
+            return False
+        if relation not in leading_index_fields(model):
+            return False
+        model = field.related_model
+    if name == 'pk':
+        return True
+    return name in leading_index_fields(model)
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """``?campo=valore`` per i ``filterset_fields`` della view"""
+
+    def filter_queryset(self, request, queryset, view):
+        lookups, errors = {}, {}
+        for name in getattr(view, 'filterset_fields', None) or ():
+            value = request.query_params.get(name)
+            if value in (None, ''):
+                continue
+            field = queryset.model._meta.get_field(name)
+            target = field.target_field if field.is_relation else field
+            if isinstance(target, models.BooleanField):
+                # 'true'/'false' come nel JSON, oltre a '1'/'0'
+                value = value.capitalize()
+            try:
+                lookups[field.attname] = target.to_python(value)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        if errors:
+            raise serializers.ValidationError(errors)
+        return queryset.filter(**lookups)
+
+
+class PrefixSearchFilter(SearchFilter):
+    """``?search=`` con la ricerca per prefisso del queryset, se ne ha una"""
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.get_search_fields(view, request):
+            return queryset
+        if not hasattr(queryset, 'search'):
+            return super().filter_queryset(request, queryset, view)
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return queryset.search(query)
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """``?ordering=`` ristretto ai campi indicizzati, chiave primaria in coda"""
+
+    def get_valid_fields(self, queryset, view, context=None):
+        return [
+            (field, label)
+            for field, label in super().get_valid_fields(queryset, view, context)
+            if is_indexed(queryset.model, field)
+        ]
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        ordering = super().remove_invalid_fields(queryset, fields, view, request)
+        if ordering and not {'pk', 'id'} & {term.lstrip('-') for term in ordering}:
+            ordering.append('pk')
+        return ordering
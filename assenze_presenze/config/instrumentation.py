@@ -0,0 +1,88 @@
+"""
+Raccolta di query e tempi SQL per richiesta, senza connection.queries.
+
+Un execute wrapper installato su ogni connessione somma numero di query,
+tempo SQL e "impronta" delle query nel collector della richiesta corrente,
+tenuto in una ContextVar: funziona con DEBUG = False e segue la richiesta
+anche nei thread di sync_to_async (viste asincrone).
+"""
+
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+_collector = ContextVar('query_collector', default=None)
+
+# IN (%s, %s, ...) → IN (...): stessa impronta a prescindere dal numero di valori
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryCollector:
+    """Statistiche SQL di una richiesta"""
+    __slots__ = ('count', 'duration', 'fingerprints')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def repeated(self, threshold):
+        """Impronte eseguite almeno ``threshold`` volte (probabile N+1)"""
+        return [
+            (sql, count) for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.count += 1
+        collector.duration += time.perf_counter() - start
+        collector.fingerprints[fingerprint(sql)] += 1
+
+
+def install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_all():
+    """Installa il wrapper sulle connessioni del thread corrente"""
+    for connection in connections.all():
+        install(connection)
+
+
+def start():
+    """Attiva un nuovo collector per il contesto corrente"""
+    collector = QueryCollector()
+    return collector, _collector.set(collector)
+
+
+def stop(token):
+    _collector.reset(token)
+
+
+def current():
+    return _collector.get()
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_on_connection_created)
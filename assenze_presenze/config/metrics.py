@@ -0,0 +1,254 @@
+"""
+Registro di metriche in-process esposto in formato Prometheus su /metrics.
+
+Ogni processo accumula contatori e istogrammi in memoria. Con più worker
+(METRICS_DIR impostata) ogni processo salva periodicamente il proprio
+stato in un file della directory condivisa e /metrics somma i file di
+tutti i worker, come il "multiprocess mode" di prometheus_client.
+
+Metriche raccolte:
+- http_request_duration_seconds / http_request_queries per vista
+  (MetricsMiddleware, attorno alle viste DRF di tutte le app)
+- cache_lookups_total e cache_hit_ratio per cache
+- attendance_bulk_rows_total (righe scritte da bulk; rate() = righe/s)
+- login_password_hash_seconds (TimedPBKDF2PasswordHasher)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from . import instrumentation
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+HASH_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+# nome → (tipo, descrizione, bucket)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Durata delle richieste per vista', DURATION_BUCKETS),
+    'http_request_queries': (
+        'histogram', 'Query SQL per richiesta per vista', QUERY_BUCKETS),
+    'cache_lookups_total': (
+        'counter', 'Letture dalle cache applicative (result=hit|miss)', None),
+    'attendance_bulk_rows_total': (
+        'counter', 'Presenze scritte dall\'endpoint bulk', None),
+    'login_password_hash_seconds': (
+        'histogram', 'Tempo di verifica/hash della password', HASH_BUCKETS),
+}
+
+
+class Registry:
+    """Contatori e istogrammi del processo corrente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._file = None
+        self._last_flush = 0.0
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._counters[(name, labels)] += value
+        self.maybe_flush()
+
+    def observe(self, name, value, labels=()):
+        buckets = METRICS[name][2]
+        with self._lock:
+            state = self._histograms.get((name, labels))
+            if state is None:
+                # conteggi per bucket, somma, totale
+                state = self._histograms[(name, labels)] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value]
+                             for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), [list(state[0]), state[1], state[2]]]
+                               for (name, labels), state in self._histograms.items()],
+            }
+
+    def maybe_flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        if self._file is None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._file = directory / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        temporary = self._file.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, self._file)
+
+
+registry = Registry()
+
+
+def record_cache(cache_name, hit):
+    registry.inc('cache_lookups_total', (('cache', cache_name), ('result', 'hit' if hit else 'miss')))
+
+
+def collect():
+    """Stato di tutti i processi (o solo del corrente senza METRICS_DIR)"""
+    if settings.METRICS_DIR is None:
+        snapshots = [registry.snapshot()]
+    else:
+        registry.maybe_flush(force=True)
+        snapshots = [
+            json.loads(path.read_text()) for path in settings.METRICS_DIR.glob('*.json')
+        ]
+
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, (buckets, total, count) in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            state = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            state[0] = [a + b for a, b in zip(state[0], buckets)]
+            state[1] += total
+            state[2] += count
+    return counters, histograms
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return '{' + escaped + '}'
+
+
+def render():
+    """Testo in formato di esposizione Prometheus"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value:g}')
+            continue
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+
+    # Rapporto hit/lookup per cache, calcolato dai contatori
+    lookups = defaultdict(lambda: [0.0, 0.0])
+    for (metric, labels), value in counters.items():
+        if metric == 'cache_lookups_total':
+            label_map = dict(labels)
+            lookups[label_map['cache']][label_map['result'] == 'hit'] += value
+    lines.append('# HELP cache_hit_ratio Frazione di letture servite dalla cache')
+    lines.append('# TYPE cache_hit_ratio gauge')
+    for cache_name, (misses, hits) in sorted(lookups.items()):
+        lines.append(f'cache_hit_ratio{_labels([("cache", cache_name)])} {hits / (hits + misses):g}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics
+
+    Con METRICS_TOKEN impostato serve "Authorization: Bearer <token>"
+    (lo scraper di Prometheus); in ogni caso è aperto agli utenti staff
+    con sessione attiva. Senza token né sessione staff: 403.
+    """
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        allowed = True
+    else:
+        user = getattr(request, 'user', None)
+        allowed = user is not None and user.is_active and user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """
+    Durata e numero di query per vista (nome della URL).
+    Va dopo QueryTimingMiddleware, di cui legge il collector delle query.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration):
+        match = getattr(request, 'resolver_match', None)
+        labels = (('view', match.view_name if match else 'unresolved'), ('method', request.method))
+        registry.observe('http_request_duration_seconds', duration,
+                         labels + (('status', str(response.status_code)),))
+        collector = instrumentation.current()
+        if collector is not None:
+            registry.observe('http_request_queries', collector.count, labels)
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 con misura del tempo di hash (stesso algoritmo: gli hash
+    esistenti restano validi).
+    """
+
+    def encode(self, password, salt, iterations=None):
+        start = time.perf_counter()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            registry.observe('login_password_hash_seconds', time.perf_counter() - start)
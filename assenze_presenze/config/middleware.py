@@ -0,0 +1,191 @@
+"""
+Middleware di progetto.
+"""
+
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import instrumentation
+from .db_router import REPLICA_ALIAS, replica_enabled, set_read_alias
+
+
+performance_logger = logging.getLogger('config.performance')
+
+
+def _token_user_id(request):
+    """ID utente dal token JWT, senza query al database (None se assente/non valido)"""
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = authenticator.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return authenticator.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Decide per ogni richiesta se le letture possono andare sulla replica.
+
+    - Solo metodi sicuri (GET/HEAD/OPTIONS) su viste con ``read_replica = True``
+    - Dopo una scrittura riuscita l'utente resta sul primario per
+      REPLICA_PIN_SECONDS, così rilegge subito ciò che ha scritto
+
+    Dove vive il "pin":
+    - client con token JWT (Bearer): nella cache condivisa, chiave per id
+      utente con scadenza REPLICA_PIN_SECONDS; non serve che il client
+      conservi i cookie. Con più processi la cache deve essere condivisa
+      (controllo course_days.E001)
+    - client di sessione o anonimi: in un cookie firmato (id utente, vuoto
+      se anonimo) con la stessa scadenza
+    """
+    PIN_COOKIE = 'replica_pin'
+    PIN_SALT = 'config.middleware.ReplicaRoutingMiddleware'
+    PIN_CACHE_KEY = 'replica-pin:{}'
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        set_read_alias(None)
+        if not replica_enabled() or request.method not in SAFE_METHODS:
+            return None
+
+        view_class = getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'read_replica', False):
+            return None
+
+        if self.is_pinned(request):
+            return None
+
+        set_read_alias(REPLICA_ALIAS)
+        return None
+
+    def process_response(self, request, response):
+        set_read_alias(None)
+        if (
+            replica_enabled()
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            user_id = _token_user_id(request)
+            if user_id is not None:
+                cache.set(self.PIN_CACHE_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS)
+            else:
+                response.set_signed_cookie(
+                    self.PIN_COOKIE, self.cookie_value(request), salt=self.PIN_SALT,
+                    max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+                )
+        return response
+
+    def is_pinned(self, request):
+        """Pin in cache per l'utente del token, altrimenti cookie valido e non scaduto"""
+        user_id = _token_user_id(request)
+        if user_id is not None:
+            return cache.get(self.PIN_CACHE_KEY.format(user_id), False)
+        if self.PIN_COOKIE not in request.COOKIES:
+            return False
+        pinned = request.get_signed_cookie(
+            self.PIN_COOKIE, default=None, salt=self.PIN_SALT,
+            max_age=settings.REPLICA_PIN_SECONDS
+        )
+        return pinned == self.cookie_value(request)
+
+    @staticmethod
+    def cookie_value(request):
+        """Id dell'utente di sessione, stringa vuota se anonimo"""
+        user = getattr(request, 'user', None)
+        return str(user.pk) if user is not None and user.is_authenticated else ''
+
+
+class QueryTimingMiddleware:
+    """
+    Misura ogni richiesta: numero di query, tempo SQL, tempo della vista
+    e tempo di serializzazione (render della risposta DRF in JSON).
+
+    - Espone i valori nell'header ``Server-Timing``
+    - Li scrive come JSON sul logger ``config.performance`` (INFO)
+    - Se le query superano QUERY_TIMING_WARN_COUNT, o una stessa query è
+      ripetuta QUERY_TIMING_WARN_REPEATED volte (N+1), logga un WARNING
+      con le impronte ripetute
+
+    Non usa connection.queries: funziona anche con DEBUG = False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        instrumentation.install_all()
+        collector, token = instrumentation.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self.finish(request, response, collector, start)
+
+    async def __acall__(self, request):
+        collector, token = instrumentation.start()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self.finish(request, response, collector, start)
+
+    def process_template_response(self, request, response):
+        # Le Response DRF vengono renderizzate dopo questo punto
+        request._view_finished_at = time.perf_counter()
+        return response
+
+    def finish(self, request, response, collector, start):
+        end = time.perf_counter()
+        view_end = getattr(request, '_view_finished_at', end)
+        timings = {
+            'sql': collector.duration * 1000,
+            'view': (view_end - start) * 1000,
+            'serialize': (end - view_end) * 1000,
+            'total': (end - start) * 1000,
+        }
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={timings["sql"]:.2f};desc="{collector.count} query"',
+            f'view;dur={timings["view"]:.2f}',
+            f'serialize;dur={timings["serialize"]:.2f}',
+            f'total;dur={timings["total"]:.2f}',
+        ])
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': collector.count,
+            **{f'{name}_ms': round(value, 2) for name, value in timings.items()},
+        }
+        repeated = collector.repeated(settings.QUERY_TIMING_WARN_REPEATED)
+        if repeated or collector.count >= settings.QUERY_TIMING_WARN_COUNT:
+            record['repeated_queries'] = [
+                {'sql': sql[:500], 'count': count} for sql, count in repeated
+            ]
+            performance_logger.warning(json.dumps(record))
+        elif performance_logger.isEnabledFor(logging.INFO):
+            performance_logger.info(json.dumps(record))
+        return response
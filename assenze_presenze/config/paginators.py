@@ -0,0 +1,58 @@
+"""
+Paginator per le changelist dell'admin su tabelle grandi.
+
+La changelist esegue un COUNT(*) a ogni pagina (e un secondo sull'intera
+tabella se ``show_full_result_count``). Su milioni di righe è la query
+più lenta della pagina. EstimatedCountPaginator:
+
+- senza filtri usa la stima delle statistiche del DB (reltuples su
+  PostgreSQL, sqlite_stat1 su SQLite dopo ANALYZE), se supera
+  ADMIN_EXACT_COUNT_LIMIT
+- altrimenti conta al più ADMIN_EXACT_COUNT_LIMIT + 1 righe
+  (COUNT su una sottoquery con LIMIT): oltre il limite il totale si
+  ferma a ADMIN_EXACT_COUNT_LIMIT + 1, e le righe successive si
+  raggiungono restringendo i filtri
+
+Da usare con ``show_full_result_count = False``.
+"""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_rows(model, using):
+    """Righe stimate dalle statistiche del DB; None se non disponibili"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL: -1 se la tabella non è mai stata analizzata
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator con conteggio stimato o limitato (vedi sopra)"""
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit + 1].count()
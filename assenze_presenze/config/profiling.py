@@ -0,0 +1,234 @@
+"""
+Profilazione on-demand delle viste API.
+
+Una richiesta viene profilata (cProfile + tracemalloc, render DRF incluso)
+se porta un header ``X-Profile`` firmato (ottenuto da un admin con
+POST /api/admin/profiles/token/) oppure se la sua vista è campionata in
+PROFILING_SAMPLE_RATES. Le catture finiscono in PROFILING_DIR, che tiene
+solo le ultime PROFILING_MAX_CAPTURES.
+
+Sotto ASGI cProfile vede solo il thread in cui è attivato: un profiler
+segue l'event loop (middleware e viste asincrone), un secondo parte in
+``process_view`` nel thread di sync_to_async che esegue le viste sincrone
+e il render DRF; le due catture sono unite in un solo profilo. Le query
+delle viste asincrone girano comunque in thread di sync_to_async e
+compaiono come attesa, e tracemalloc conta anche le allocazioni di altre
+richieste in corso.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'config.profiling'
+CAPTURE_ID = re.compile(r'^[\w.-]+$')
+
+# tracemalloc è globale al processo: una cattura alla volta
+_capture_lock = threading.Lock()
+
+
+def make_token(user):
+    """Token firmato da mettere nell'header X-Profile"""
+    return signing.dumps({'user_id': user.pk}, salt=TOKEN_SALT)
+
+
+def _valid_token(value):
+    try:
+        signing.loads(value, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def list_captures():
+    """Metadati delle catture, dalla più recente"""
+    directory = settings.PROFILING_DIR
+    if not directory.exists():
+        return []
+    captures = [json.loads(path.read_text()) for path in directory.glob('*.json')]
+    return sorted(captures, key=lambda capture: capture['created_at'], reverse=True)
+
+
+def capture_path(capture_id, kind):
+    """Percorso di un file di cattura (``prof`` o ``txt``), None se non valido"""
+    if not CAPTURE_ID.match(capture_id) or kind not in ('prof', 'txt'):
+        return None
+    path = settings.PROFILING_DIR / f'{capture_id}.{kind}'
+    return path if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """
+    Avvolge la richiesta (vista e render) con cProfile e tracemalloc
+    quando richiesto dall'header firmato o dal campionamento.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        trigger = self.trigger(request)
+        if trigger is None or not _capture_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, trigger)
+        finally:
+            _capture_lock.release()
+
+    async def __acall__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None or not _capture_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            return await self.aprofile(request, trigger)
+        finally:
+            _capture_lock.release()
+
+    def trigger(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token and _valid_token(token):
+            return 'header'
+
+        if settings.PROFILING_SAMPLE_RATES:
+            try:
+                view_name = resolve(request.path_info).view_name
+            except Resolver404:
+                return None
+            rate = settings.PROFILING_SAMPLE_RATES.get(view_name, 0)
+            if rate and random.random() < rate:
+                return 'sample'
+        return None
+
+    def profile(self, request, trigger):
+        profiler, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            snapshot, meta = self.stop(profiler, start)
+        self.save(pstats.Stats(profiler), snapshot, self.describe(request, response, trigger, meta))
+        return response
+
+    async def aprofile(self, request, trigger):
+        # process_view avvia qui il profiler del thread della vista sincrona
+        request._view_profiler = None
+        profiler, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            view_profiler = request._view_profiler
+            if view_profiler is not None:
+                # Stesso thread (thread_sensitive) di process_view e della vista
+                await sync_to_async(view_profiler.disable)()
+            snapshot, meta = self.stop(profiler, start)
+        stats = pstats.Stats(profiler)
+        if view_profiler is not None:
+            stats.add(view_profiler)
+        # Scrittura dei file fuori dall'event loop
+        await sync_to_async(self.save)(
+            stats, snapshot, self.describe(request, response, trigger, meta)
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Sotto ASGI gira (adattato con sync_to_async) nel thread che poi esegue
+        la vista sincrona e il render: il profiler del thread parte qui.
+        """
+        if (
+            getattr(request, '_view_profiler', False) is None
+            and not iscoroutinefunction(view_func)
+        ):
+            request._view_profiler = cProfile.Profile()
+            request._view_profiler.enable()
+        return None
+
+    @staticmethod
+    def start():
+        profiler = cProfile.Profile()
+        tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+        start = time.perf_counter()
+        profiler.enable()
+        return profiler, start
+
+    @staticmethod
+    def stop(profiler, start):
+        profiler.disable()
+        duration = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return snapshot, {
+            'duration_ms': round(duration * 1000, 2),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def describe(request, response, trigger, meta):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'view': match.view_name if match else 'unresolved',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'trigger': trigger,
+            **meta,
+        }
+
+    def save(self, stats, snapshot, meta):
+        directory = settings.PROFILING_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        created_at = timezone.now()
+        capture_id = '{}-{}-{}'.format(
+            created_at.strftime('%Y%m%d-%H%M%S'),
+            re.sub(r'[^\w.-]', '_', meta['view']),
+            uuid.uuid4().hex[:8],
+        )
+
+        stats.dump_stats(directory / f'{capture_id}.prof')
+
+        report = io.StringIO()
+        report.write(f"{meta['method']} {meta['path']} → {meta['status']} "
+                     f"in {meta['duration_ms']} ms, picco {meta['peak_kib']} KiB\n\n")
+        report.write('== cProfile (top 40, tempo cumulativo) ==\n')
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(40)
+        report.write('\n== tracemalloc (top 30 allocazioni per riga) ==\n')
+        for stat in snapshot.statistics('lineno')[:30]:
+            report.write(f'{stat}\n')
+        (directory / f'{capture_id}.txt').write_text(report.getvalue())
+
+        (directory / f'{capture_id}.json').write_text(json.dumps({
+            'id': capture_id,
+            'created_at': created_at.isoformat(),
+            **meta,
+        }))
+        self.rotate(directory)
+
+    def rotate(self, directory):
+        captures = sorted(directory.glob('*.json'))
+        for meta_path in captures[:-settings.PROFILING_MAX_CAPTURES]:
+            for suffix in ('.json', '.prof', '.txt'):
+                meta_path.with_suffix(suffix).unlink(missing_ok=True)
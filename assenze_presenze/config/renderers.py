@@ -0,0 +1,66 @@
+"""
+Renderer JSON veloce per le risposte API.
+
+Le liste e le matrici grandi passano buona parte del tempo nel json della
+stdlib. FastJSONRenderer usa orjson (se installato) e produce gli stessi
+byte di rest_framework.renderers.JSONRenderer:
+
+- separatori compatti, UTF-8 senza escape (COMPACT_JSON, UNICODE_JSON)
+- datetime/date/time/UUID gestiti da orjson con il formato dell'encoder
+  di DRF (UTC come 'Z'); Decimal e gli altri tipi passano da
+  ``JSONEncoder.default`` di DRF
+- \\u2028 e \\u2029 sempre con escape
+
+Torna al renderer della stdlib per tutto ciò che orjson scriverebbe in
+modo diverso o rifiuta: indentazione (?indent, API navigabile), opzioni
+JSON non di default, chiavi non stringa, interi oltre 64 bit, float in
+notazione esponenziale ('1e16' contro '1e+16'). Differenza nota: NaN e
+infiniti diventano null invece di un errore.
+
+Si sceglie in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+(variabile API_JSON_RENDERER).
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    orjson = None
+
+
+# Float in notazione esponenziale nell'output di orjson: cifra seguita da
+# 'e'. Con le cifre ridotte a '0' basta una ricerca di sottostringa, molto
+# più veloce di una regex su qualche MB; i falsi positivi dentro le
+# stringhe costano solo il fallback.
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+
+
+def has_exponent(ret):
+    return b'0e' in ret.translate(DIGITS_TO_ZERO)
+
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer con orjson e fallback sulla stdlib"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            # La stdlib serializza o solleva l'errore originale
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if has_exponent(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
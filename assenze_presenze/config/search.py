@@ -0,0 +1,42 @@
+"""
+Ricerca per prefisso indicizzata.
+
+``icontains`` su email, nomi e identificativi non usa indici (LIKE '%x%'
+o UPPER() sulla colonna): su tabelle grandi è una scansione completa per
+ogni ricerca. Le colonne cercate hanno quindi una copia normalizzata
+(``search_*``: minuscolo, senza accenti, spazi ai bordi rimossi) con un
+indice normale, e la ricerca per prefisso diventa un intervallo
+
+    search_email >= 'mar' AND search_email < 'mar' || U+10FFFF
+
+che usa l'indice B-tree su SQLite e PostgreSQL senza collation o
+opclass particolari.
+
+Le copie sono aggiornate dai modelli (save, bulk_create, update), vedi
+users.models e attendances.models.
+"""
+
+import unicodedata
+
+from django.db.models import Q
+
+
+# Oltre ogni carattere valido: chiude l'intervallo del prefisso
+PREFIX_END = '\U0010ffff'
+
+
+def normalize(value, max_length=None):
+    """Chiave di ricerca: 'Niccolò Rossi ' → 'niccolo rossi'"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return value.casefold().strip()[:max_length]
+
+
+def terms(query):
+    """Termini normalizzati di una ricerca (separati da spazi)"""
+    return [term for term in (normalize(part) for part in (query or '').split()) if term]
+
+
+def prefix_q(field, term):
+    """Q per la colonna normalizzata ``field`` che inizia con ``term`` (già normalizzato)"""
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + PREFIX_END})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -56,6 +57,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Renderer JSON (config/renderers.py): orjson se installato, stessi
+    # byte del JSONRenderer di DRF; API_JSON_RENDERER per cambiarlo
+    'DEFAULT_RENDERER_CLASSES': (
+        os.environ.get('API_JSON_RENDERER', 'config.renderers.FastJSONRenderer'),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # Filtri delle liste (config/filters.py): ?campo= sui filterset_fields,
+    # ?search= per prefisso sugli indici, ?ordering= solo su campi indicizzati
+    'DEFAULT_FILTER_BACKENDS': (
+        'config.filters.FieldFilterBackend',
+        'config.filters.PrefixSearchFilter',
+        'config.filters.IndexedOrderingFilter',
+    ),
 }
 
 
@@ -70,15 +84,68 @@ SIMPLE_JWT = {
 
 
 MIDDLEWARE = [
+    'config.middleware.QueryTimingMiddleware',
+    'config.metrics.MetricsMiddleware',
+    'config.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# QueryTimingMiddleware: soglie oltre cui una richiesta viene segnalata
+# (numero totale di query, stessa query ripetuta → probabile N+1)
+QUERY_TIMING_WARN_COUNT = int(os.environ.get('QUERY_TIMING_WARN_COUNT', '30'))
+QUERY_TIMING_WARN_REPEATED = int(os.environ.get('QUERY_TIMING_WARN_REPEATED', '5'))
+
+# Profilazione on-demand (config/profiling.py).
+# PROFILING_SAMPLE_RATES: "nome-vista=frazione,..." es. "participant-stats=0.01"
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_MAX_CAPTURES = int(os.environ.get('PROFILING_MAX_CAPTURES', '50'))
+PROFILING_TOKEN_MAX_AGE = int(os.environ.get('PROFILING_TOKEN_MAX_AGE', '600'))
+PROFILING_TRACEMALLOC_FRAMES = int(os.environ.get('PROFILING_TRACEMALLOC_FRAMES', '10'))
+PROFILING_SAMPLE_RATES = {
+    name: float(rate)
+    for name, _, rate in (
+        item.partition('=')
+        for item in os.environ.get('PROFILING_SAMPLE_RATES', '').split(',')
+        if item
+    )
+}
+
+# Metriche Prometheus su /metrics (config/metrics.py).
+# Con più worker METRICS_DIR deve essere una directory condivisa,
+# da svuotare all'avvio del deploy.
+METRICS_DIR = Path(os.environ['METRICS_DIR']) if os.environ.get('METRICS_DIR') else None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+# Token per lo scraper di Prometheus; senza, /metrics è solo per lo staff
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Metriche per richiesta (INFO) e segnalazioni N+1 (WARNING)
+        'config.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Test runner: come DiscoverRunner, senza il log per richiesta in console
+TEST_RUNNER = 'config.testing.TestRunner'
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -98,16 +165,174 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Viste asincrone per le letture dei partecipanti.
+# Attivate di default da config/asgi.py, disattivate sotto WSGI.
+ASYNC_PARTICIPANT_VIEWS = os.environ.get('ASYNC_PARTICIPANT_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
+#
+# Profilo scelto con DB_PROFILE:
+# - sqlite (default): SQLite in WAL, i lettori non vengono bloccati
+#   dalle scritture di bulk; PRAGMA applicati a ogni connessione
+# - sqlite-basic: SQLite con journaling di default (confronto benchmark)
+# - postgresql: connessioni persistenti con health check, oppure
+#   pool psycopg con DB_POOL=1
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'assenze_presenze'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DB_POOL', '0') == '1':
+        # Il pool richiede CONN_MAX_AGE = 0 (default)
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    if DB_PROFILE == 'sqlite':
+        DATABASES['default']['OPTIONS'] = {
+            # Attesa massima (secondi) sul lock prima di "database is locked"
+            'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5')),
+            # Prende il lock di scrittura all'inizio della transazione:
+            # evita i deadlock lettura→scrittura tra transazioni concorrenti
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=' + os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'PRAGMA mmap_size=' + os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+                # Valore negativo = KiB (64 MiB)
+                'PRAGMA cache_size=' + os.environ.get('SQLITE_CACHE_SIZE', '-64000'),
+                'PRAGMA temp_store=MEMORY',
+            ]),
+        }
+
+# Replica in sola lettura per le letture dei report (config/db_router.py).
+# In locale la replica è un secondo file SQLite aggiornato con
+# "manage.py sync_replica"; in produzione l'host di una replica PostgreSQL.
+if DB_PROFILE == 'postgresql' and os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_PROFILE != 'postgresql' and os.environ.get('REPLICA_SQLITE_PATH'):
+    replica_options = dict(DATABASES['default'].get('OPTIONS', {}))
+    replica_options['init_command'] = ';'.join(
+        filter(None, [replica_options.get('init_command'), 'PRAGMA query_only=ON'])
+    )
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['REPLICA_SQLITE_PATH'],
+        'OPTIONS': replica_options,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+
+# Secondi per cui un utente legge dal primario dopo una sua scrittura
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# Coda di scrittura per le presenze (attendances/writes.py): serializza
+# le scritture su un unico thread, a lotti, con retry se il DB è occupato.
+# Utile con SQLite e più admin che registrano insieme.
+ATTENDANCE_WRITE_QUEUE = os.environ.get('ATTENDANCE_WRITE_QUEUE', '0') == '1'
+ATTENDANCE_WRITE_QUEUE_BATCH = int(os.environ.get('ATTENDANCE_WRITE_QUEUE_BATCH', '50'))
+
+# Eliminazione a lotti di giornate e utenti (attendances/deletion.py):
+# righe per transazione e soglia oltre la quale l'API lavora in background
+BULK_DELETE_BATCH = int(os.environ.get('BULK_DELETE_BATCH', '5000'))
+BULK_DELETE_SYNC_LIMIT = int(os.environ.get('BULK_DELETE_SYNC_LIMIT', '50000'))
+
+# Cache di Django (default: in memoria del processo). Calendario
+# (course_days/calendar.py) e sessioni di appello (attendances/rollcall.py)
+# ci tengono stato condiviso tra le richieste: con più processi web
+# (WEB_CONCURRENCY > 1, come per gunicorn) serve un backend condiviso, es.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e
+# CACHE_LOCATION=redis://127.0.0.1:6379/1 (controllo course_days.E001)
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Secondi massimi di validità del calendario in memoria
+# (course_days/calendar.py), anche senza scritture
+COURSE_DAY_CALENDAR_MAX_AGE = int(os.environ.get('COURSE_DAY_CALENDAR_MAX_AGE', '300'))
+
+# Storico delle presenze (attendances/audit.py): 'commit' scrive le voci
+# con un INSERT al commit di ogni transazione, 'background' le accumula e
+# le scrive da un thread ogni AUDIT_FLUSH_INTERVAL secondi (o a
+# AUDIT_BUFFER_SIZE voci)
+AUDIT_FLUSH_MODE = os.environ.get('AUDIT_FLUSH_MODE', 'commit')
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1.0'))
+AUDIT_BUFFER_SIZE = int(os.environ.get('AUDIT_BUFFER_SIZE', '500'))
+
+# Roll-call in diretta (attendances/live.py): broker tra processi
+# (LocalBroker = solo processo corrente), intervallo minimo tra due
+# aggiornamenti della stessa giornata e keep-alive SSE, in secondi
+LIVE_BROKER = os.environ.get('LIVE_BROKER', 'attendances.live.LocalBroker')
+LIVE_MIN_INTERVAL = float(os.environ.get('LIVE_MIN_INTERVAL', '0.25'))
+LIVE_KEEPALIVE = float(os.environ.get('LIVE_KEEPALIVE', '15'))
+
+# Sessioni di appello (attendances/rollcall.py): scadenza per inattività,
+# segni in attesa che fanno scattare la scrittura del lotto e loro età
+# massima in secondi
+ROLLCALL_SESSION_TTL = int(os.environ.get('ROLLCALL_SESSION_TTL', '3600'))
+ROLLCALL_FLUSH_SIZE = int(os.environ.get('ROLLCALL_FLUSH_SIZE', '25'))
+ROLLCALL_FLUSH_INTERVAL = float(os.environ.get('ROLLCALL_FLUSH_INTERVAL', '5'))
+
+# Check-in dei partecipanti (attendances/checkin.py): validità del codice
+# in secondi, finestra di raccolta del lotto e sua dimensione massima
+CHECKIN_CODE_TTL = int(os.environ.get('CHECKIN_CODE_TTL', '300'))
+CHECKIN_BATCH_WINDOW = float(os.environ.get('CHECKIN_BATCH_WINDOW', '0.05'))
+CHECKIN_BATCH_SIZE = int(os.environ.get('CHECKIN_BATCH_SIZE', '200'))
+
+# Changelist dell'admin (config/paginators.py): oltre queste righe il
+# conteggio è stimato (senza filtri) o limitato
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
+# Mese di inizio dell'anno accademico (archivio, attendances/archive.py)
+ACADEMIC_YEAR_START_MONTH = int(os.environ.get('ACADEMIC_YEAR_START_MONTH', '9'))
+
+# Giorni di conservazione delle tombstone del sync delta (attendances/changes.py,
+# comando prune_tombstones): i client fermi da più tempo ripartono da zero
+ATTENDANCE_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('ATTENDANCE_TOMBSTONE_RETENTION_DAYS', '90'))
+
+
+# Hasher di default con misura del tempo di hash (metrica login_password_hash_seconds)
+PASSWORD_HASHERS = [
+    'config.metrics.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
 
 
 # Password validation
@@ -0,0 +1,142 @@
+"""
+Base per i test di "budget" delle query.
+
+Ogni test dichiara il numero massimo di query di un endpoint; il budget
+viene verificato su due dimensioni del dataset (SMALL e LARGE) e il numero
+di query deve essere lo stesso in entrambe: una query che cresce con i
+dati (N+1) fa fallire il test subito, anche se resta sotto il budget.
+
+TestRunner (TEST_RUNNER) tace il logger ``config.performance`` durante i
+test: le richieste dei test non vanno in console come metriche o N+1.
+"""
+
+import logging
+from datetime import date, timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Dataset: ``size`` giornate di corso e ``size`` partecipanti registrati,
+    con una presenza per ogni coppia. ``grow(size)`` lo allarga in modo
+    incrementale; ``self.participant`` ha sempre presenze in tutte le giornate.
+    """
+    SMALL = 2
+    LARGE = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        from users.models import CustomUser
+
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@budget.test',
+            username='budget.admin',
+            password='password123',
+            first_name='Admin',
+            last_name='Budget',
+            role=CustomUser.Role.ADMIN
+        )
+        cls.participant = CustomUser.objects.create_user(
+            email='participant@budget.test',
+            username='budget.participant',
+            password='password123',
+            first_name='Mario',
+            last_name='Rossi'
+        )
+
+    def setUp(self):
+        from course_days import calendar
+
+        # Il calendario in memoria sopravvive al rollback tra i test
+        calendar.invalidate()
+        self.course_days = []
+        self.participants = [self.participant]
+
+    def grow(self, size):
+        """Porta il dataset a ``size`` giornate e ``size`` partecipanti"""
+        from attendances.models import Attendance
+        from course_days.models import CourseDay
+        from users.models import CustomUser
+
+        start = date.today() - timedelta(days=size * 10)
+        while len(self.course_days) < size:
+            n = len(self.course_days)
+            self.course_days.append(CourseDay.objects.create(
+                date=start + timedelta(days=n * 7),
+                description=f'Lezione {n + 1}'
+            ))
+        while len(self.participants) < size:
+            n = len(self.participants)
+            self.participants.append(CustomUser.objects.create_user(
+                email=f'p{n}@budget.test',
+                username=f'budget.p{n}',
+                password='password123',
+                first_name='Partecipante',
+                last_name=str(n)
+            ))
+
+        statuses = list(Attendance.Status.values)
+        for i, course_day in enumerate(self.course_days):
+            for j, user in enumerate(self.participants):
+                Attendance.objects.get_or_create(
+                    course_day=course_day,
+                    participant_identifier=user.email,
+                    defaults={
+                        'user': user,
+                        'status': statuses[(i + j) % len(statuses)],
+                        'notes': 'nota' if (i + j) % 2 else ''
+                    }
+                )
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def assertQueryBudget(self, budget, request, expected_status=200, setup=None,
+                          using=DEFAULT_DB_ALIAS):
+        """
+        Esegue ``request(arg)`` (che restituisce la response) con il
+        dataset a SMALL e poi a LARGE elementi. ``arg`` è il risultato di
+        ``setup(size)`` se indicato (le sue query non contano), altrimenti
+        la dimensione.
+        """
+        counts = []
+        for size in (self.SMALL, self.LARGE):
+            self.grow(size)
+            arg = setup(size) if setup else size
+            with CaptureQueriesContext(connections[using]) as context:
+                response = request(arg)
+            self.assertEqual(
+                response.status_code, expected_status,
+                getattr(response, 'data', response.content)
+            )
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.assertLessEqual(
+                len(context), budget,
+                f'{len(context)} query con {size} elementi (budget {budget}):\n{queries}'
+            )
+            counts.append(len(context))
+        self.assertEqual(
+            counts[0], counts[1],
+            f'Il numero di query cresce con i dati: {counts[0]} → {counts[1]}'
+        )
+        return counts[-1]
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner con il logger delle metriche per richiesta silenziato"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger('config.performance')
+        self._performance_handlers = logger.handlers
+        # assertLogs funziona comunque: sostituisce temporaneamente gli handler
+        logger.handlers = [logging.NullHandler()]
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('config.performance').handlers = self._performance_handlers
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,399 @@
+import json
+import os
+import pstats
+import re
+import runpy
+import tempfile
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from attendances.models import Attendance
+from course_days.models import CourseDay
+from users.models import CustomUser
+from .db_router import REPLICA_ALIAS, PrimaryReplicaRouter, get_read_alias, set_read_alias
+from . import metrics
+from .middleware import QueryTimingMiddleware, ReplicaRoutingMiddleware
+from .profiling import ProfilingMiddleware, list_captures, make_token
+
+
+class DatabaseProfileTest(SimpleTestCase):
+    """DATABASES costruito da settings.py per ogni DB_PROFILE"""
+
+    ENV = ('DB_PROFILE', 'DB_POOL', 'DB_CONN_MAX_AGE', 'SQLITE_PATH',
+           'POSTGRES_REPLICA_HOST', 'REPLICA_SQLITE_PATH')
+
+    def load(self, **env):
+        # settings.py rieseguito con l'ambiente indicato
+        with mock.patch.dict(os.environ, env):
+            for key in self.ENV:
+                if key not in env:
+                    os.environ.pop(key, None)
+            return runpy.run_path(str(Path(__file__).with_name('settings.py')))
+
+    def test_sqlite(self):
+        config = self.load()
+        database = config['DATABASES']['default']
+        self.assertEqual(config['DB_PROFILE'], 'sqlite')
+        self.assertEqual(database['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', database['OPTIONS']['init_command'])
+        self.assertNotIn('replica', config['DATABASES'])
+
+    def test_sqlite_basic(self):
+        database = self.load(DB_PROFILE='sqlite-basic', SQLITE_PATH='/tmp/bench.sqlite3')['DATABASES']['default']
+        self.assertEqual(database['NAME'], '/tmp/bench.sqlite3')
+        self.assertNotIn('OPTIONS', database)
+
+    def test_sqlite_replica(self):
+        replica = self.load(REPLICA_SQLITE_PATH='/tmp/replica.sqlite3')['DATABASES']['replica']
+        self.assertEqual(replica['NAME'], '/tmp/replica.sqlite3')
+        self.assertTrue(replica['OPTIONS']['init_command'].endswith('PRAGMA query_only=ON'))
+        self.assertEqual(replica['TEST'], {'MIRROR': 'default'})
+
+    def test_postgresql_persistent(self):
+        database = self.load(DB_PROFILE='postgresql', DB_CONN_MAX_AGE='30')['DATABASES']['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['CONN_MAX_AGE'], 30)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('OPTIONS', database)
+
+    def test_postgresql_pool(self):
+        databases = self.load(
+            DB_PROFILE='postgresql', DB_POOL='1', POSTGRES_REPLICA_HOST='replica.internal'
+        )['DATABASES']
+        self.assertEqual(databases['default']['OPTIONS']['pool']['max_size'], 10)
+        # Il pool è incompatibile con le connessioni persistenti
+        self.assertNotIn('CONN_MAX_AGE', databases['default'])
+        self.assertEqual(databases['replica']['HOST'], 'replica.internal')
+        self.assertIn('pool', databases['replica']['OPTIONS'])
+
+
+class PrimaryReplicaRouterTest(TestCase):
+    """Letture sull'alias scelto per la richiesta, scritture sul primario"""
+
+    def tearDown(self):
+        set_read_alias(None)
+
+    def test_routing(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(CustomUser))
+
+        set_read_alias(REPLICA_ALIAS)
+        self.assertEqual(router.db_for_read(CustomUser), REPLICA_ALIAS)
+        self.assertEqual(router.db_for_write(CustomUser), 'default')
+        self.assertTrue(router.allow_relation(CustomUser(), CustomUser()))
+        self.assertTrue(router.allow_migrate('default', 'users'))
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'users'))
+
+
+@mock.patch('config.middleware.replica_enabled', return_value=True)
+class ReplicaRoutingMiddlewareTest(TestCase):
+    """Scelta della replica per richiesta e pin al primario (cache per i token, cookie firmato)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='mario.rossi@example.com',
+            username='mario.rossi',
+            password='password123'
+        )
+        cls.other = CustomUser.objects.create_user(
+            email='luigi.verdi@example.com',
+            username='luigi.verdi',
+            password='password123'
+        )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        self.view = mock.Mock(view_class=type('ReplicaView', (), {'read_replica': True}))
+        cache.clear()
+
+    def tearDown(self):
+        set_read_alias(None)
+
+    def request(self, method='get', user=None, cookies=None, token=True):
+        """Richiesta con token JWT, o di sessione (``user``, anche anonimo) se ``token=False``"""
+        if token:
+            request = getattr(self.factory, method)(
+                '/api/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user or self.user)}'
+            )
+        else:
+            request = getattr(self.factory, method)('/api/')
+            request.user = user or AnonymousUser()
+        request.COOKIES.update(cookies or {})
+        return request
+
+    def read_alias(self, request, view=None):
+        self.middleware.process_view(request, view or self.view, (), {})
+        return get_read_alias()
+
+    def write(self, status=200, **kwargs):
+        return self.middleware.process_response(
+            self.request('post', **kwargs), HttpResponse(status=status)
+        )
+
+    def test_safe_reads_only(self, replica_enabled):
+        self.assertEqual(self.read_alias(self.request()), REPLICA_ALIAS)
+        self.assertIsNone(self.read_alias(self.request('post')))
+        # Vista senza read_replica
+        self.assertIsNone(self.read_alias(self.request(), mock.Mock(view_class=object)))
+
+        replica_enabled.return_value = False
+        self.assertIsNone(self.read_alias(self.request()))
+
+    def test_token_pinned_after_write(self, replica_enabled):
+        # Client con solo il token Bearer: il pin è nella cache, niente cookie
+        response = self.write()
+        self.assertNotIn(ReplicaRoutingMiddleware.PIN_COOKIE, response.cookies)
+
+        self.assertIsNone(self.read_alias(self.request()))
+        # Il pin è dell'utente che ha scritto
+        self.assertEqual(self.read_alias(self.request(user=self.other)), REPLICA_ALIAS)
+        # Pin scaduto: replica
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.write()
+        self.assertEqual(self.read_alias(self.request()), REPLICA_ALIAS)
+
+    def test_session_pinned_after_write(self, replica_enabled):
+        response = self.write(user=self.user, token=False)
+        cookie = response.cookies[ReplicaRoutingMiddleware.PIN_COOKIE]
+        self.assertTrue(cookie['httponly'])
+        cookies = {cookie.key: cookie.value}
+
+        self.assertIsNone(self.read_alias(self.request(user=self.user, cookies=cookies, token=False)))
+        # Il pin è dell'utente che ha scritto
+        self.assertEqual(
+            self.read_alias(self.request(user=self.other, cookies=cookies, token=False)), REPLICA_ALIAS
+        )
+        # Cookie alterato o scaduto: replica
+        tampered = {cookie.key: cookie.value.replace(str(self.user.pk), str(self.other.pk), 1)}
+        self.assertEqual(
+            self.read_alias(self.request(user=self.other, cookies=tampered, token=False)), REPLICA_ALIAS
+        )
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.assertEqual(
+                self.read_alias(self.request(user=self.user, cookies=cookies, token=False)), REPLICA_ALIAS
+            )
+
+    def test_anonymous_pinned_after_write(self, replica_enabled):
+        cookie = self.write(token=False).cookies[ReplicaRoutingMiddleware.PIN_COOKIE]
+        cookies = {cookie.key: cookie.value}
+        self.assertIsNone(self.read_alias(self.request(cookies=cookies, token=False)))
+        self.assertEqual(self.read_alias(self.request(token=False)), REPLICA_ALIAS)
+
+    def test_failed_write_not_pinned(self, replica_enabled):
+        self.assertNotIn(ReplicaRoutingMiddleware.PIN_COOKIE, self.write(status=400, token=False).cookies)
+        self.write(status=400)
+        self.middleware.process_response(self.request(), HttpResponse())
+        self.assertEqual(self.read_alias(self.request()), REPLICA_ALIAS)
+
+
+class QueryTimingMiddlewareTest(TestCase):
+    """Header Server-Timing e log delle richieste lente o con query ripetute"""
+
+    SERVER_TIMING = re.compile(
+        r'^sql;dur=[\d.]+;desc="(\d+) query", view;dur=[\d.]+, '
+        r'serialize;dur=[\d.]+, total;dur=[\d.]+$'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='mario.rossi@example.com',
+            username='mario.rossi',
+            password='password123'
+        )
+
+    def query_view(self, repeat):
+        def view(request):
+            for _ in range(repeat):
+                CustomUser.objects.filter(pk=self.user.pk).exists()
+            return HttpResponse()
+        return view
+
+    def test_server_timing(self):
+        response = self.client.get(
+            '/api/me/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+        self.assertEqual(response.status_code, 200)
+        match = self.SERVER_TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(match[1], '1')
+
+    def test_info_record(self):
+        middleware = QueryTimingMiddleware(self.query_view(2))
+        with self.assertLogs('config.performance', 'INFO') as logs:
+            response = middleware(RequestFactory().get('/api/me/'))
+        self.assertEqual(self.SERVER_TIMING.match(response['Server-Timing'])[1], '2')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual((record['method'], record['path'], record['queries']), ('GET', '/api/me/', 2))
+        self.assertNotIn('repeated_queries', record)
+
+    @override_settings(QUERY_TIMING_WARN_REPEATED=3)
+    def test_repeated_queries(self):
+        middleware = QueryTimingMiddleware(self.query_view(3))
+        with self.assertLogs('config.performance', 'WARNING') as logs:
+            middleware(RequestFactory().get('/api/me/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['repeated_queries']), 1)
+        self.assertEqual(record['repeated_queries'][0]['count'], 3)
+        self.assertIn('users_customuser', record['repeated_queries'][0]['sql'])
+
+    @override_settings(QUERY_TIMING_WARN_COUNT=2)
+    def test_query_count(self):
+        middleware = QueryTimingMiddleware(self.query_view(2))
+        with self.assertLogs('config.performance', 'WARNING') as logs:
+            middleware(RequestFactory().get('/api/me/'))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['repeated_queries'], [])
+
+    async def test_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        middleware = QueryTimingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/api/me/'))
+        self.assertEqual(self.SERVER_TIMING.match(response['Server-Timing'])[1], '0')
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Catture su richiesta firmata, in modalità sincrona e sotto ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com',
+            username='admin',
+            password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+        cls.course_day = CourseDay.objects.create(date=date(2025, 1, 13), description='Lezione 1')
+        Attendance.objects.create(
+            course_day=cls.course_day,
+            participant_identifier='mario.rossi@example.com',
+            status=Attendance.Status.PRESENT
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATES={}))
+
+    def request(self, token=True):
+        extra = {'HTTP_X_PROFILE': make_token(self.admin)} if token else {}
+        return RequestFactory().get('/api/me/', **extra)
+
+    def test_sync(self):
+        middleware = ProfilingMiddleware(lambda request: HttpResponse(status=201))
+        self.assertEqual(middleware(self.request(token=False)).status_code, 201)
+        self.assertEqual(list_captures(), [])
+
+        self.assertEqual(middleware(self.request()).status_code, 201)
+        capture, = list_captures()
+        self.assertEqual(
+            (capture['view'], capture['path'], capture['status'], capture['trigger']),
+            ('unresolved', '/api/me/', 201, 'header')
+        )
+        self.assertIn('cProfile', (self.directory / f"{capture['id']}.txt").read_text())
+
+    async def test_async_sync_view(self):
+        # Vista DRF sincrona sotto ASGI: gira in un thread di sync_to_async,
+        # il profilo deve comunque contenere vista, serializer e render
+        client = AsyncClient()
+        path = f'/api/admin/attendances/by-course-day/{self.course_day.pk}/'
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        self.assertEqual((await client.get(path, headers=headers)).status_code, 200)
+        self.assertEqual(list_captures(), [])
+
+        response = await client.get(path, headers={**headers, 'X-Profile': make_token(self.admin)})
+        self.assertEqual(response.status_code, 200)
+        capture, = list_captures()
+        self.assertEqual((capture['view'], capture['trigger']), ('attendance-by-course-day', 'header'))
+        stats = pstats.Stats(str(self.directory / f"{capture['id']}.prof"))
+        functions = {(Path(filename).parts[-2:], name) for filename, _, name in stats.stats}
+        self.assertIn((('attendances', 'views.py'), 'by_course_day'), functions)
+        self.assertIn((('rest_framework', 'serializers.py'), 'to_representation'), functions)
+        self.assertIn((('config', 'renderers.py'), 'render'), functions)
+
+
+class MetricsTest(TestCase):
+    """/metrics: formato di esposizione Prometheus e accesso"""
+
+    SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? [\d.e+-]+$')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(
+            email='staff@example.com',
+            username='staff',
+            password='password123',
+            is_staff=True
+        )
+        cls.user = CustomUser.objects.create_user(
+            email='mario.rossi@example.com',
+            username='mario.rossi',
+            password='password123'
+        )
+
+    def test_format(self):
+        self.client.get('/api/me/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        lines = response.content.decode().splitlines()
+        for name, (kind, description, buckets) in metrics.METRICS.items():
+            self.assertIn(f'# HELP {name} {description}', lines)
+            self.assertIn(f'# TYPE {name} {kind}', lines)
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, self.SAMPLE)
+
+        # Istogramma della vista: bucket cumulativi, +Inf = _count
+        labels = 'view="current-user",method="GET",status="200"'
+
+        def values(prefix):
+            return [float(line.rsplit(' ', 1)[1]) for line in lines if line.startswith(prefix)]
+
+        buckets = values(f'http_request_duration_seconds_bucket{{{labels},')
+        self.assertEqual(len(buckets), len(metrics.DURATION_BUCKETS) + 1)
+        self.assertEqual(buckets, sorted(buckets))
+        count, = values(f'http_request_duration_seconds_count{{{labels}}}')
+        self.assertEqual(buckets[-1], count)
+        self.assertGreaterEqual(count, 1)
+
+    def test_access(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.client.logout()
+
+        with override_settings(METRICS_TOKEN='segreto'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer altro').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segreto').status_code, 200)
+
+    async def test_async_middleware(self):
+        async def view(request):
+            return HttpResponse(status=204)
+
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        labels = (('view', 'unresolved'), ('method', 'GET'), ('status', '204'))
+        before = metrics.collect()[1].get(('http_request_duration_seconds', labels), [0, 0, 0])[2]
+        self.assertEqual((await middleware(RequestFactory().get('/nowhere/'))).status_code, 204)
+        self.assertEqual(metrics.collect()[1][('http_request_duration_seconds', labels)][2], before + 1)
@@ -18,9 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from config.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
+    # Metriche Prometheus
+    path("metrics", metrics_view, name="metrics"),
+
     # AUTH (JWT)
     path("api/auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -29,5 +34,6 @@ urlpatterns = [
     path("api/", include("users.urls")),
     path("api/", include("course_days.urls")),
     path("api/", include("attendances.urls")),
+    path("api/", include("admins.urls")),
 ]
 
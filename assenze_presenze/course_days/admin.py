@@ -9,4 +9,30 @@ class CourseDayAdmin(admin.ModelAdmin):
     list_filter = ['is_holiday', 'date']
     search_fields = ['description']
     ordering = ['date']
-    date_hierarchy = 'date'
\ No newline at end of file
+    date_hierarchy = 'date'
+    
+    # Eliminazione veloce (attendances/deletion.py): la pagina di conferma
+    # riporta il numero di presenze invece di elencarle una per una
+    def get_deleted_objects(self, objs, request):
+        from attendances import deletion
+        from attendances.models import Attendance
+        
+        course_days = list(objs)
+        attendances = deletion.count_course_day_attendances(obj.pk for obj in course_days)
+        to_delete = [str(obj) for obj in course_days]
+        model_count = {CourseDay._meta.verbose_name_plural: len(course_days)}
+        perms_needed = set()
+        if attendances:
+            to_delete.append(f'{attendances} presenze collegate')
+            model_count[Attendance._meta.verbose_name_plural] = attendances
+            if not request.user.has_perm('attendances.delete_attendance'):
+                perms_needed.add(Attendance._meta.verbose_name)
+        return to_delete, model_count, perms_needed, []
+    
+    def delete_model(self, request, obj):
+        from attendances.deletion import delete_course_days
+        delete_course_days([obj.pk])
+    
+    def delete_queryset(self, request, queryset):
+        from attendances.deletion import delete_course_days
+        delete_course_days(list(queryset.values_list('pk', flat=True)))
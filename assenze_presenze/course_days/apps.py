@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CourseDaysConfig(AppConfig):
     name = 'course_days'
+    
+    def ready(self):
+        # Segnali che invalidano il calendario in memoria
+        from . import calendar  # noqa: F401
+        from .checks import check_shared_cache
+        
+        checks.register(check_shared_cache, checks.Tags.caches)
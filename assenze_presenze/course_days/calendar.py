@@ -0,0 +1,169 @@
+"""
+Calendario delle giornate di corso in memoria del processo.
+
+Le statistiche contano di continuo giornate passate, future e per mese,
+ma il calendario cambia solo quando un admin lo modifica. Il processo
+tiene quindi le date ordinate (con i flag festivo) e i conteggi cumulati
+per mese, e risponde con bisect in O(log n) senza query.
+
+Validità: un "version stamp" nella cache di Django viene cambiato a ogni
+scrittura su CourseDay (segnali post_save/post_delete: API, admin,
+archiviazione); se non coincide con quello del calendario in memoria il
+calendario viene ricostruito. Con più processi serve una cache condivisa
+(CACHES, verificata all'avvio da checks.py); in ogni caso il calendario scade dopo
+COURSE_DAY_CALENDAR_MAX_AGE secondi.
+
+Le giornate festive (is_holiday) non contano come giornate di lezione.
+"""
+
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+
+from config import metrics
+from .models import CourseDay
+
+
+VERSION_KEY = 'course-days:calendar-version'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+class Calendar:
+    """Istantanea immutabile del calendario"""
+
+    def __init__(self, rows, version=None):
+        # rows: coppie (data, is_holiday) ordinate per data
+        self.version = version
+        self.built_at = time.monotonic()
+        self.dates = [day for day, _ in rows]
+        self.holidays = [is_holiday for _, is_holiday in rows]
+        # Giornate di lezione (festivi esclusi)
+        self.lessons = [day for day, is_holiday in rows if not is_holiday]
+
+        # Mesi con lezioni e lezioni cumulate fino alla fine di ciascuno
+        self.months = []
+        self.cumulative = []
+        for day in self.lessons:
+            month = month_start(day)
+            if not self.months or self.months[-1] != month:
+                self.months.append(month)
+                self.cumulative.append(0)
+        for i, month in enumerate(self.months):
+            self.cumulative[i] = bisect_left(self.lessons, next_month(month))
+
+    def is_holiday(self, day):
+        i = bisect_left(self.dates, day)
+        return i < len(self.dates) and self.dates[i] == day and self.holidays[i]
+
+    def count_until(self, day):
+        """Giornate di lezione con data <= day"""
+        return bisect_right(self.lessons, day)
+
+    def count_after(self, day):
+        """Giornate di lezione con data > day"""
+        return len(self.lessons) - self.count_until(day)
+
+    def days_in_month(self, month, until=None):
+        """Giornate di lezione del mese (fino a ``until`` incluso, se indicato)"""
+        i = bisect_left(self.months, month)
+        if i == len(self.months) or self.months[i] != month:
+            return 0
+        before = self.cumulative[i - 1] if i else 0
+        end = self.cumulative[i]
+        if until is not None and until < next_month(month):
+            end = self.count_until(until)
+        return max(end - before, 0)
+
+    def days_per_month(self, until):
+        """dict mese → giornate di lezione fino a ``until`` incluso"""
+        last = bisect_right(self.months, until)
+        return {month: self.days_in_month(month, until) for month in self.months[:last]}
+
+
+_lock = threading.Lock()
+_calendar = None
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add: se un altro processo l'ha appena impostata vince la sua
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _is_fresh(calendar, version):
+    return (
+        calendar is not None
+        and calendar.version == version
+        and time.monotonic() - calendar.built_at < settings.COURSE_DAY_CALENDAR_MAX_AGE
+    )
+
+
+def build(version=None):
+    # Sempre dal primario: una replica in ritardo salverebbe un calendario
+    # vecchio sotto la versione nuova
+    rows = list(
+        CourseDay.objects.using(DEFAULT_DB_ALIAS)
+        .order_by('date').values_list('date', 'is_holiday')
+    )
+    return Calendar(rows, version)
+
+
+def get_calendar():
+    """Calendario valido per il processo (ricostruito se cambiato)"""
+    global _calendar
+    version = _current_version()
+    calendar = _calendar
+    hit = _is_fresh(calendar, version)
+    metrics.record_cache('course_day_calendar', hit)
+    if hit:
+        return calendar
+    with _lock:
+        if not _is_fresh(_calendar, version):
+            _calendar = build(version)
+        return _calendar
+
+
+async def aget_calendar():
+    return await sync_to_async(get_calendar)()
+
+
+def invalidate():
+    """Nuova versione: ogni processo ricostruirà il calendario"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def changed():
+    """
+    Da chiamare dopo scritture che non inviano segnali (bulk_create,
+    update, delete SQL). Invalida subito e di nuovo al commit: chi
+    ricostruisce prima del commit vedrebbe ancora i dati vecchi.
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def _on_course_day_change(sender, **kwargs):
+    changed()
+
+
+post_save.connect(_on_course_day_change, sender=CourseDay)
+post_delete.connect(_on_course_day_change, sender=CourseDay)
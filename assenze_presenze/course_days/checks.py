@@ -0,0 +1,35 @@
+"""
+Controlli di sistema (``manage.py check``, eseguiti anche all'avvio).
+
+Il version stamp del calendario (calendar.VERSION_KEY) e le sessioni di
+appello (attendances/rollcall.py) stanno nella cache di Django. Con una
+cache in memoria del processo e più processi web, ogni processo ha il
+proprio stamp e le proprie sessioni: una modifica al calendario non
+invalida gli altri processi e i segni di un appello si perdono se la
+richiesta successiva arriva a un altro processo.
+"""
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """course_days.E001: cache del processo con WEB_CONCURRENCY > 1"""
+    backend = settings.CACHES[DEFAULT_CACHE_ALIAS]['BACKEND']
+    if settings.WEB_CONCURRENCY <= 1 or not issubclass(import_string(backend), PROCESS_LOCAL_CACHES):
+        return []
+    return [checks.Error(
+        f'WEB_CONCURRENCY={settings.WEB_CONCURRENCY} con la cache {backend}, '
+        'privata di ogni processo: calendario e sessioni di appello non '
+        'sarebbero condivisi tra i processi.',
+        hint='Impostare CACHE_BACKEND/CACHE_LOCATION su una cache condivisa '
+             '(Redis, Memcached, database o file), o WEB_CONCURRENCY=1.',
+        id='course_days.E001',
+    )]
@@ -1,3 +1,5 @@
+from datetime import date, timedelta
+
 from rest_framework import serializers
 from .models import CourseDay
 
@@ -20,7 +22,14 @@ class CourseDaySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def validate_date(self, value):
-        """Verifica che la data non sia duplicata"""
+        """Verifica che la data non sia duplicata né in un periodo archiviato"""
+        from attendances.archive import boundary
+        cutoff = boundary()
+        if cutoff is not None and value < cutoff:
+            raise serializers.ValidationError(
+                f"Le date precedenti al {cutoff} sono archiviate."
+            )
+        
         instance = getattr(self, 'instance', None)
         queryset = CourseDay.objects.filter(date=value)
         
@@ -32,4 +41,115 @@ class CourseDaySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Esiste già una giornata di corso per questa data."
             )
-        return value
\ No newline at end of file
+        return value
+
+class CourseDayScheduleSerializer(serializers.Serializer):
+    """
+    Regola di ricorrenza per generare le giornate di un corso.
+    
+    Giorni della settimana come in Python: 0 = lunedì ... 6 = domenica.
+    Il template della descrizione accetta {n} (numero della lezione,
+    festivi esclusi) e {date} (es. "Lezione {n} - {date:%d/%m}").
+    """
+    MAX_DAYS = 730
+    
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        allow_empty=False
+    )
+    exclude_dates = serializers.ListField(
+        child=serializers.DateField(), required=False, default=list,
+        help_text='Date da saltare del tutto'
+    )
+    holidays = serializers.ListField(
+        child=serializers.DateField(), required=False, default=list,
+        help_text='Date create come giorno festivo'
+    )
+    description_template = serializers.CharField(
+        max_length=255, required=False, default='Lezione {n}'
+    )
+    holiday_description = serializers.CharField(
+        max_length=255, required=False, allow_blank=True, default='Festività'
+    )
+    start_number = serializers.IntegerField(min_value=0, required=False, default=1)
+    upsert = serializers.BooleanField(
+        required=False, default=False,
+        help_text='Aggiorna descrizione e festivo delle giornate già esistenti'
+    )
+    preview = serializers.BooleanField(
+        required=False, default=False,
+        help_text='Restituisce le date senza scriverle'
+    )
+    
+    def validate_description_template(self, value):
+        try:
+            value.format(n=1, date=date.today())
+        except (AttributeError, KeyError, IndexError, ValueError) as error:
+            raise serializers.ValidationError(f"Template non valido: {error}")
+        return value
+    
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({
+                "end_date": "La data di fine precede quella di inizio."
+            })
+        if (data['end_date'] - data['start_date']).days > self.MAX_DAYS:
+            raise serializers.ValidationError({
+                "end_date": f"Intervallo massimo: {self.MAX_DAYS} giorni."
+            })
+        return data
+    
+    def generate(self):
+        """Giornate della regola: lista di (data, descrizione, festivo)"""
+        data = self.validated_data
+        weekdays = set(data['weekdays'])
+        excluded = set(data['exclude_dates'])
+        holidays = set(data['holidays'])
+        
+        schedule = []
+        number = data['start_number']
+        day = data['start_date']
+        while day <= data['end_date']:
+            if day.weekday() in weekdays and day not in excluded:
+                if day in holidays:
+                    schedule.append((day, data['holiday_description'], True))
+                else:
+                    description = data['description_template'].format(n=number, date=day)
+                    schedule.append((day, description[:255], False))
+                    number += 1
+            day += timedelta(days=1)
+        return schedule
+
+
+class CourseDayBulkDeleteSerializer(serializers.Serializer):
+    """Giornate da eliminare: per id o per intervallo di date (estremi inclusi)"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        has_range = 'start_date' in data or 'end_date' in data
+        if ('ids' in data) == has_range:
+            raise serializers.ValidationError(
+                "Indicare \"ids\" oppure \"start_date\" e \"end_date\"."
+            )
+        if has_range:
+            if 'start_date' not in data or 'end_date' not in data:
+                raise serializers.ValidationError(
+                    "Servono sia \"start_date\" che \"end_date\"."
+                )
+            if data['end_date'] < data['start_date']:
+                raise serializers.ValidationError({
+                    "end_date": "La data di fine precede quella di inizio."
+                })
+        return data
+    
+    def queryset(self):
+        data = self.validated_data
+        if 'ids' in data:
+            return CourseDay.objects.filter(pk__in=data['ids'])
+        return CourseDay.objects.filter(date__range=(data['start_date'], data['end_date']))
@@ -1,3 +1,302 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from attendances.models import Attendance
+from config.testing import QueryBudgetTestCase
+from users.models import CustomUser
+from . import calendar
+from .checks import check_shared_cache
+from .models import CourseDay
+
+
+class CourseDayQueryBudgetTest(QueryBudgetTestCase):
+    """Budget di query dell'endpoint admin delle giornate"""
+    
+    def setUp(self):
+        super().setUp()
+        self.authenticate(self.admin)
+    
+    def test_list(self):
+        self.assertQueryBudget(3, lambda size: self.client.get(reverse('course-day-list')))
+    
+    def test_retrieve(self):
+        self.assertQueryBudget(
+            2,
+            lambda size: self.client.get(reverse('course-day-detail', args=[self.course_days[-1].pk]))
+        )
+    
+    def test_create(self):
+        def request(size):
+            return self.client.post(reverse('course-day-list'), {
+                'date': date.today() + timedelta(days=100 + size),
+                'description': f'Lezione extra {size}'
+            })
+        self.assertQueryBudget(5, request, expected_status=201)
+    
+    def test_update(self):
+        def request(size):
+            course_day = self.course_days[-1]
+            return self.client.put(reverse('course-day-detail', args=[course_day.pk]), {
+                'date': course_day.date,
+                'description': 'Lezione aggiornata'
+            })
+        self.assertQueryBudget(6, request)
+    
+    def test_destroy(self):
+        # Query costanti qualunque sia il numero di presenze della giornata
+        self.assertQueryBudget(
+            14,
+            lambda course_day: self.client.delete(reverse('course-day-detail', args=[course_day.pk])),
+            setup=lambda size: self.course_days.pop()
+        )
+
+
+class CourseDayListTest(APITestCase):
+    """Filtri, ricerca e ordinamento della lista giornate"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+        start = date.today() - timedelta(days=60)
+        cls.course_days = [
+            CourseDay.objects.create(date=start + timedelta(days=n * 7), description=f'Lezione {n + 1}')
+            for n in range(6)
+        ]
+    
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+    
+    def test_list_filters(self):
+        holiday = self.course_days[2]
+        holiday.is_holiday = True
+        holiday.save()
+        url = reverse('course-day-list')
+        
+        response = self.client.get(url, {'is_holiday': 'true'})
+        self.assertEqual([row['id'] for row in response.data['data']], [holiday.pk])
+        response = self.client.get(url, {'date': self.course_days[1].date.isoformat()})
+        self.assertEqual([row['id'] for row in response.data['data']], [self.course_days[1].pk])
+        CourseDay.objects.filter(pk=self.course_days[3].pk).update(description='Ripasso finale')
+        response = self.client.get(url, {'search': 'ripa'})
+        self.assertEqual([row['id'] for row in response.data['data']], [self.course_days[3].pk])
+        response = self.client.get(url, {'search': 'finale'})
+        self.assertEqual(response.data['data'], [])
+        response = self.client.get(url, {'ordering': '-date'})
+        self.assertEqual(
+            [row['id'] for row in response.data['data']],
+            [course_day.pk for course_day in reversed(self.course_days)]
+        )
+        response = self.client.get(url, {'date': 'ieri'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CalendarTest(APITestCase):
+    """Calendario in memoria: stessi conteggi del DB, senza query"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+        start = date(2025, 1, 27)
+        for n in range(40):
+            CourseDay.objects.create(date=start + timedelta(days=n * 3), is_holiday=n % 7 == 0)
+    
+    def setUp(self):
+        # Il calendario in memoria sopravvive al rollback tra i test
+        calendar.invalidate()
+        self.lessons = CourseDay.objects.filter(is_holiday=False)
+    
+    def test_counts_match_database(self):
+        course_calendar = calendar.get_calendar()
+        for day in [date(2025, 1, 1), date(2025, 1, 27), date(2025, 3, 2), date(2025, 6, 1)]:
+            self.assertEqual(course_calendar.count_until(day), self.lessons.filter(date__lte=day).count())
+            self.assertEqual(course_calendar.count_after(day), self.lessons.filter(date__gt=day).count())
+            for month, days in course_calendar.days_per_month(day).items():
+                self.assertEqual(days, self.lessons.filter(
+                    date__year=month.year, date__month=month.month, date__lte=day
+                ).count())
+        self.assertTrue(course_calendar.is_holiday(date(2025, 1, 27)))
+        self.assertFalse(course_calendar.is_holiday(date(2025, 1, 30)))
+        self.assertEqual(course_calendar.days_in_month(date(2024, 12, 1)), 0)
+    
+    def test_cached_until_write(self):
+        first = calendar.get_calendar()
+        with self.assertNumQueries(0):
+            self.assertIs(calendar.get_calendar(), first)
+        
+        self.client.force_authenticate(self.admin)
+        course_day = CourseDay.objects.first()
+        self.client.patch(reverse('course-day-detail', args=[course_day.pk]), {'is_holiday': False})
+        second = calendar.get_calendar()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.count_until(date(2026, 1, 1)), self.lessons.count())
+        
+        self.client.delete(reverse('course-day-detail', args=[course_day.pk]))
+        self.assertEqual(calendar.get_calendar().count_until(date(2026, 1, 1)), self.lessons.count())
+
+
+class ScheduleTest(APITestCase):
+    """Generazione delle giornate da una regola di ricorrenza"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+    
+    def setUp(self):
+        calendar.invalidate()
+        self.client.force_authenticate(self.admin)
+        self.rule = {
+            'start_date': '2025-09-01',
+            'end_date': '2025-09-30',
+            'weekdays': [0, 2],
+            'exclude_dates': ['2025-09-03'],
+            'holidays': ['2025-09-08'],
+            'description_template': 'Lezione {n} - {date:%d/%m}'
+        }
+    
+    def schedule(self, **extra):
+        return self.client.post(reverse('course-day-schedule'), {**self.rule, **extra}, format='json')
+    
+    def test_preview_does_not_write(self):
+        response = self.schedule(preview=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        # Lunedì e mercoledì di settembre 2025, meno il 3 escluso
+        self.assertEqual(data['created_count'], 8)
+        self.assertEqual(data['course_days'][0]['description'], 'Lezione 1 - 01/09')
+        self.assertTrue(data['course_days'][1]['is_holiday'])
+        self.assertEqual(data['course_days'][2]['description'], 'Lezione 2 - 10/09')
+        self.assertFalse(CourseDay.objects.exists())
+    
+    def test_create_then_upsert(self):
+        CourseDay.objects.create(date=date(2025, 9, 1), description='Esistente')
+        calendar.get_calendar()
+        
+        with self.assertNumQueries(5):
+            response = self.schedule()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['created_count'], 7)
+        self.assertEqual(response.data['data']['skipped_count'], 1)
+        self.assertEqual(CourseDay.objects.count(), 8)
+        self.assertEqual(calendar.get_calendar().count_until(date(2025, 12, 31)), 7)
+        
+        response = self.schedule(upsert=True)
+        self.assertEqual(response.data['data']['updated_count'], 1)
+        self.assertEqual(CourseDay.objects.get(date=date(2025, 9, 1)).description, 'Lezione 1 - 01/09')
+    
+    def test_invalid_rule(self):
+        self.assertEqual(self.schedule(end_date='2025-08-01').status_code, 400)
+        self.assertEqual(self.schedule(weekdays=[7]).status_code, 400)
+        self.assertEqual(self.schedule(description_template='{x}').status_code, 400)
+
+
+class BulkDeleteTest(APITestCase):
+    """Eliminazione a lotti di giornate e presenze"""
+    
+    DAYS = 6
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password='password123',
+            role=CustomUser.Role.ADMIN
+        )
+        start = date.today() - timedelta(days=cls.DAYS * 10)
+        cls.course_days = [
+            CourseDay.objects.create(date=start + timedelta(days=n * 7), description=f'Lezione {n + 1}')
+            for n in range(cls.DAYS)
+        ]
+        for course_day in cls.course_days:
+            for n in range(2):
+                Attendance.objects.create(
+                    course_day=course_day, participant_identifier=f'partecipante{n}@example.com'
+                )
+    
+    def setUp(self):
+        calendar.invalidate()
+        self.client.force_authenticate(self.admin)
+    
+    @override_settings(BULK_DELETE_BATCH=3)
+    def test_range_delete(self):
+        first, last = self.course_days[1].date, self.course_days[3].date
+        expected = Attendance.objects.filter(course_day__date__range=(first, last)).count()
+        calendar.get_calendar()
+        
+        response = self.client.post(reverse('course-day-bulk-delete'), {
+            'start_date': first, 'end_date': last
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data'], {
+            'course_days': 3, 'attendances': expected, 'background': False
+        })
+        self.assertEqual(CourseDay.objects.count(), self.DAYS - 3)
+        self.assertFalse(Attendance.objects.filter(course_day__date__range=(first, last)).exists())
+        self.assertEqual(calendar.get_calendar().count_until(date.today()), self.DAYS - 3)
+    
+    @override_settings(BULK_DELETE_SYNC_LIMIT=0)
+    def test_background_delete(self):
+        ids = [course_day.pk for course_day in self.course_days]
+        with patch('attendances.deletion.run_in_background', lambda func, *args: func(*args)):
+            response = self.client.post(reverse('course-day-bulk-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data['data']['background'])
+        self.assertFalse(CourseDay.objects.exists())
+    
+    def test_invalid_request(self):
+        url = reverse('course-day-bulk-delete')
+        self.assertEqual(self.client.post(url, {}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'start_date': '2025-01-01'}).status_code, 400)
+    
+    def test_admin_confirmation_counts(self):
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        course_day = self.course_days[0]
+        url = reverse('admin:course_days_courseday_delete', args=[course_day.pk])
+        
+        response = self.client.get(url)
+        self.assertContains(response, '2 presenze collegate')
+        self.client.post(url, {'post': 'yes'})
+        self.assertFalse(Attendance.objects.filter(course_day_id=course_day.pk).exists())
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Controllo di avvio: più processi web richiedono una cache condivisa"""
+    
+    def errors(self):
+        return [message.id for message in check_shared_cache(None)]
+    
+    def test_single_process(self):
+        with override_settings(WEB_CONCURRENCY=1):
+            self.assertEqual(self.errors(), [])
+    
+    def test_process_local_cache(self):
+        for backend in ['locmem.LocMemCache', 'dummy.DummyCache']:
+            caches = {'default': {'BACKEND': f'django.core.cache.backends.{backend}'}}
+            with override_settings(WEB_CONCURRENCY=4, CACHES=caches):
+                self.assertEqual(self.errors(), ['course_days.E001'])
+    
+    def test_shared_cache(self):
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/assenze-presenze-cache',
+        }}
+        with override_settings(WEB_CONCURRENCY=4, CACHES=caches):
+            self.assertEqual(self.errors(), [])
+    
+    def test_registered(self):
+        from django.core import checks
+        
+        self.assertIn(check_shared_cache, checks.registry.registry.get_checks())
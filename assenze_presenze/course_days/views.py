@@ -1,11 +1,20 @@
 from django.shortcuts import render
 
 # Create your views here.
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from . import calendar
 from .models import CourseDay
-from .serializers import CourseDaySerializer
+from .serializers import (
+    CourseDaySerializer,
+    CourseDayScheduleSerializer,
+    CourseDayBulkDeleteSerializer
+)
 from admins.permissions import IsAdmin
 
 
@@ -19,12 +28,22 @@ class CourseDayViewSet(viewsets.ModelViewSet):
     - GET    /api/admin/course-days/{id}/     → Dettaglio giornata
     - PUT    /api/admin/course-days/{id}/     → Modifica giornata
     - DELETE /api/admin/course-days/{id}/     → Elimina giornata
+    - POST   /api/admin/course-days/schedule/ → Genera le giornate da una regola
+    - POST   /api/admin/course-days/bulk-delete/ → Elimina giornate (id o intervallo)
+    
+    La lista accetta ?date=, ?is_holiday=, ?search= e ?ordering=date
+    (config/filters.py).
+    
+    Le eliminazioni passano da attendances/deletion.py: presenze eliminate
+    a lotti con statement SQL, in background oltre BULK_DELETE_SYNC_LIMIT.
     """
     queryset = CourseDay.objects.all()
     serializer_class = CourseDaySerializer
     permission_classes = [IsAuthenticated, IsAdmin]
     filterset_fields = ['date', 'is_holiday']
-    search_fields = ['description']
+    # Per prefisso: una riga per giornata, tabella piccola
+    search_fields = ['^description']
+    ordering_fields = ['date']
     
     def list(self, request, *args, **kwargs):
         """Lista giornate con response formattata"""
@@ -72,8 +91,165 @@ class CourseDayViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         """Elimina giornata con response formattata"""
         instance = self.get_object()
-        self.perform_destroy(instance)
+        result = self.delete_course_days([instance.pk])
+        if result['background']:
+            return Response({
+                "success": True,
+                "message": "Eliminazione della giornata avviata in background",
+                "data": result
+            }, status=status.HTTP_202_ACCEPTED)
         return Response({
             "success": True,
             "message": "Giornata eliminata con successo"
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """
+        Elimina più giornate e le loro presenze.
+        
+        POST /api/admin/course-days/bulk-delete/
+        
+        Request body (uno dei due):
+        {"ids": [1, 2, 3]}
+        {"start_date": "2025-12-01", "end_date": "2025-12-31"}
+        
+        Oltre BULK_DELETE_SYNC_LIMIT presenze risponde 202 e completa
+        l'eliminazione in background.
+        """
+        serializer = CourseDayBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(serializer.queryset().values_list('pk', flat=True))
+        result = self.delete_course_days(ids)
+        
+        if result['background']:
+            message = (
+                f"Eliminazione di {result['course_days']} giornate e "
+                f"{result['attendances']} presenze avviata in background."
+            )
+        else:
+            message = (
+                f"Eliminate {result['course_days']} giornate e "
+                f"{result['attendances']} presenze."
+            )
+        return Response({
+            "success": True,
+            "message": message,
+            "data": result
+        }, status=status.HTTP_202_ACCEPTED if result['background'] else status.HTTP_200_OK)
+    
+    @staticmethod
+    def delete_course_days(ids):
+        """Elimina subito o, se le presenze sono troppe, in background"""
+        from attendances import deletion
+        
+        attendances = deletion.count_course_day_attendances(ids)
+        if attendances > settings.BULK_DELETE_SYNC_LIMIT:
+            deletion.run_in_background(deletion.delete_course_days, ids)
+            return {"course_days": len(ids), "attendances": attendances, "background": True}
+        course_days, attendances = deletion.delete_course_days(ids)
+        return {"course_days": course_days, "attendances": attendances, "background": False}
+    
+    @action(detail=False, methods=['post'])
+    def schedule(self, request):
+        """
+        Genera le giornate di un corso da una regola di ricorrenza.
+        
+        POST /api/admin/course-days/schedule/
+        
+        Request body:
+        {
+            "start_date": "2025-09-15",
+            "end_date": "2026-06-10",
+            "weekdays": [0, 2],
+            "exclude_dates": ["2025-12-24"],
+            "holidays": ["2025-12-08"],
+            "description_template": "Lezione {n} - {date:%d/%m}",
+            "upsert": false,
+            "preview": true
+        }
+        
+        Le date già esistenti vengono saltate (o aggiornate con "upsert").
+        Una query per i duplicati e un inserimento a lotti; con "preview"
+        restituisce le date senza scrivere nulla.
+        """
+        from attendances.archive import boundary
+        
+        serializer = CourseDayScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.generate()
+        options = serializer.validated_data
+        
+        cutoff = boundary()
+        if cutoff is not None and schedule and schedule[0][0] < cutoff:
+            return Response({
+                "success": False,
+                "error": f"Le date precedenti al {cutoff} sono archiviate."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Unica query per i duplicati: le giornate esistenti nell'intervallo
+        existing = {
+            course_day.date: course_day
+            for course_day in CourseDay.objects.filter(
+                date__range=(options['start_date'], options['end_date'])
+            )
+        }
+        
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        items = []
+        for day, description, is_holiday in schedule:
+            course_day = existing.get(day)
+            if course_day is None:
+                action_name = 'create'
+                to_create.append(CourseDay(date=day, description=description, is_holiday=is_holiday))
+            elif options['upsert'] and (
+                course_day.description != description or course_day.is_holiday != is_holiday
+            ):
+                action_name = 'update'
+                course_day.description = description
+                course_day.is_holiday = is_holiday
+                course_day.updated_at = now
+                to_update.append(course_day)
+            else:
+                action_name = 'skip'
+            items.append({
+                'date': day,
+                'description': description,
+                'is_holiday': is_holiday,
+                'action': action_name
+            })
+        
+        if not options['preview'] and (to_create or to_update):
+            with transaction.atomic():
+                CourseDay.objects.bulk_create(to_create, batch_size=500)
+                if to_update:
+                    CourseDay.objects.bulk_update(
+                        to_update, ['description', 'is_holiday', 'updated_at'], batch_size=500
+                    )
+                # bulk_create/bulk_update non inviano segnali
+                calendar.changed()
+        
+        counts = {
+            name: sum(1 for item in items if item['action'] == name)
+            for name in ('create', 'update', 'skip')
+        }
+        if options['preview']:
+            message = f"Anteprima: {len(items)} giornate generate."
+        else:
+            message = (
+                f"Create {counts['create']} giornate, aggiornate {counts['update']}, "
+                f"saltate {counts['skip']} già esistenti."
+            )
+        return Response({
+            "success": True,
+            "message": message,
+            "data": {
+                "preview": options['preview'],
+                "created_count": counts['create'],
+                "updated_count": counts['update'],
+                "skipped_count": counts['skip'],
+                "course_days": items
+            }
+        }, status=status.HTTP_200_OK if options['preview'] else status.HTTP_201_CREATED)
@@ -47,3 +47,24 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('email', 'first_name', 'last_name', 'role', 'phone', 'birth_date')
         }),
     )
+
+    # Eliminazione veloce (attendances/deletion.py): presenze scollegate
+    # a lotti con UPDATE, senza caricarle nella pagina di conferma
+    def get_deleted_objects(self, objs, request):
+        from attendances.deletion import count_user_attendances
+
+        users = list(objs)
+        attendances = count_user_attendances(obj.pk for obj in users)
+        to_delete = [str(obj) for obj in users]
+        if attendances:
+            to_delete.append(f"{attendances} presenze verranno scollegate (restano registrate)")
+        model_count = {CustomUser._meta.verbose_name_plural: len(users)}
+        return to_delete, model_count, set(), []
+
+    def delete_model(self, request, obj):
+        from attendances.deletion import remove_users
+        remove_users([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        from attendances.deletion import remove_users
+        remove_users(list(queryset.values_list("pk", flat=True)))
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:23
+
+import users.models
+from django.db import migrations, models
+
+from config.search import normalize
+
+
+def fill_search_fields(apps, schema_editor):
+    """Copie normalizzate per gli utenti esistenti, a lotti"""
+    CustomUser = apps.get_model('users', 'CustomUser')
+    db = schema_editor.connection.alias
+    batch = []
+    for user in CustomUser.objects.using(db).only('email', 'first_name', 'last_name').iterator(chunk_size=2000):
+        user.search_email = normalize(user.email, 255)
+        user.search_first_name = normalize(user.first_name, 255)
+        user.search_last_name = normalize(user.last_name, 255)
+        batch.append(user)
+        if len(batch) == 2000:
+            CustomUser.objects.using(db).bulk_update(
+                batch, ['search_email', 'search_first_name', 'search_last_name']
+            )
+            batch = []
+    CustomUser.objects.using(db).bulk_update(batch, ['search_email', 'search_first_name', 'search_last_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='search_email',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='search_first_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='search_last_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,52 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+from config.search import normalize, prefix_q, terms
+
+
+# Colonne con copia normalizzata per la ricerca (config/search.py)
+SEARCH_FIELDS = {
+    'email': 'search_email',
+    'first_name': 'search_first_name',
+    'last_name': 'search_last_name',
+}
+
+
+class CustomUserQuerySet(models.QuerySet):
+    """
+    Mantiene le colonne ``search_*`` anche nelle scritture su insiemi
+    (bulk_create, update) e offre la ricerca per prefisso indicizzata.
+    """
+    
+    def search(self, query):
+        """Utenti con email, nome o cognome che iniziano con ogni termine"""
+        for term in terms(query):
+            self = self.filter(
+                prefix_q('search_email', term)
+                | prefix_q('search_first_name', term)
+                | prefix_q('search_last_name', term)
+            )
+        return self
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_search_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def update(self, **kwargs):
+        for field, search_field in SEARCH_FIELDS.items():
+            if isinstance(kwargs.get(field), str):
+                kwargs[search_field] = normalize(kwargs[field], 255)
+        return super().update(**kwargs)
+    
+    update.alters_data = True
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
 
 class CustomUser(AbstractUser):
     """
@@ -49,6 +94,13 @@ class CustomUser(AbstractUser):
         verbose_name='Ultimo aggiornamento'
     )
     
+    # Copie normalizzate per la ricerca per prefisso (config/search.py)
+    search_email = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    search_first_name = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    search_last_name = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    
+    objects = CustomUserManager()
+    
     # Usa email come username per il login
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -61,6 +113,20 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f"{self.email} ({self.get_role_display()})"
     
+    def save(self, *args, **kwargs):
+        self.set_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields,
+                *(SEARCH_FIELDS[field] for field in update_fields if field in SEARCH_FIELDS)
+            }
+        super().save(*args, **kwargs)
+    
+    def set_search_fields(self):
+        for field, search_field in SEARCH_FIELDS.items():
+            setattr(self, search_field, normalize(getattr(self, field), 255))
+    
     def get_full_name(self):
         """Restituisce nome completo"""
         return f"{self.first_name} {self.last_name}".strip()
@@ -1,3 +1,145 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from attendances.deletion import remove_users
+from attendances.models import Attendance
+from config.testing import QueryBudgetTestCase
+from course_days.models import CourseDay
+from .models import CustomUser
+from .views import AsyncCurrentUserView, AsyncParticipantProfileView
+
+
+class UserQueryBudgetTest(QueryBudgetTestCase):
+    """Budget di query delle viste utente"""
+
+    def test_current_user(self):
+        self.authenticate(self.participant)
+        self.assertQueryBudget(1, lambda size: self.client.get(reverse("current-user")))
+
+    def test_profile(self):
+        self.authenticate(self.participant)
+        self.assertQueryBudget(1, lambda size: self.client.get(reverse("participant-profile")))
+
+    def test_profile_update(self):
+        self.authenticate(self.participant)
+        self.assertQueryBudget(
+            2,
+            lambda size: self.client.patch(reverse("participant-profile"), {"phone": f"+39 333 00{size}"})
+        )
+
+    def test_register(self):
+        def request(size):
+            return self.client.post(reverse("register"), {
+                "email": f"nuovo{size}@budget.test",
+                "username": f"nuovo{size}",
+                "first_name": "Nuovo",
+                "last_name": "Utente",
+                "password": "password123",
+                "password_confirm": "password123",
+            })
+        self.assertQueryBudget(3, request, expected_status=201)
+
+
+class RemoveUsersTest(TestCase):
+    """Eliminazione utenti: presenze scollegate a lotti, non eliminate"""
+
+    DAYS = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="password123",
+            role=CustomUser.Role.ADMIN,
+            is_staff=True,
+            is_superuser=True
+        )
+        cls.participants = [
+            CustomUser.objects.create_user(
+                email=f"partecipante{n}@example.com",
+                username=f"partecipante{n}",
+                password="password123"
+            )
+            for n in range(3)
+        ]
+        start = date.today() - timedelta(days=cls.DAYS * 7)
+        for n in range(cls.DAYS):
+            course_day = CourseDay.objects.create(date=start + timedelta(days=n * 7))
+            for user in cls.participants:
+                Attendance.objects.create(
+                    course_day=course_day, participant_identifier=user.email, user=user
+                )
+
+    @override_settings(BULK_DELETE_BATCH=2)
+    def test_remove_users(self):
+        removed = self.participants[1:3]
+        identifiers = [user.email for user in removed]
+        linked = Attendance.objects.filter(user__in=removed).count()
+
+        users, detached = remove_users([user.pk for user in removed])
+        self.assertEqual((users, detached), (2, linked))
+        self.assertFalse(CustomUser.objects.filter(pk__in=[user.pk for user in removed]).exists())
+        self.assertEqual(
+            Attendance.objects.filter(participant_identifier__in=identifiers, user__isnull=True).count(),
+            linked
+        )
+
+    def test_admin_delete(self):
+        self.client.force_login(self.admin)
+        user = self.participants[1]
+        url = reverse("admin:users_customuser_delete", args=[user.pk])
+
+        self.assertContains(self.client.get(url), f"{self.DAYS} presenze verranno scollegate")
+        self.client.post(url, {"post": "yes"})
+        self.assertFalse(CustomUser.objects.filter(pk=user.pk).exists())
+        self.assertEqual(Attendance.objects.filter(participant_identifier=user.email).count(), self.DAYS)
+
+
+# Viste asincrone accanto a quelle sincrone (ASYNC_PARTICIPANT_VIEWS è letto all'import degli URL)
+urlpatterns = [
+    path("async/participant/profile/", AsyncParticipantProfileView.as_view(), name="async-participant-profile"),
+    path("async/me/", AsyncCurrentUserView.as_view(), name="async-current-user"),
+    path("", include("config.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserViewsTest(APITestCase):
+    """Viste asincrone attraverso lo stack ASGI: stesse risposte di quelle sincrone"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.participant = CustomUser.objects.create_user(
+            email="mario.rossi@example.com",
+            username="mario.rossi",
+            password="password123",
+            first_name="Mario",
+            last_name="Rossi"
+        )
+
+    def setUp(self):
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.participant)}"}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers["Authorization"])
+
+    async def test_get(self):
+        for name in ("participant-profile", "current-user"):
+            expected = await sync_to_async(self.client.get)(reverse(name))
+            response = await self.async_client.get(reverse(f"async-{name}"), headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+        self.assertEqual((await self.async_client.get(reverse("async-current-user"))).status_code, 401)
+
+    async def test_update_delegated(self):
+        response = await self.async_client.patch(
+            reverse("async-participant-profile"), {"phone": "+39 333 0000000"},
+            content_type="application/json", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        await self.participant.arefresh_from_db()
+        self.assertEqual(self.participant.phone, "+39 333 0000000")
@@ -1,12 +1,23 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ParticipantProfileView,
     CurrentUserView,
     RegisterView,
+    AsyncParticipantProfileView,
+    AsyncCurrentUserView,
 )
 
+# Sotto ASGI le viste in lettura girano in modalità asincrona
+if settings.ASYNC_PARTICIPANT_VIEWS:
+    profile_view = AsyncParticipantProfileView
+    current_user_view = AsyncCurrentUserView
+else:
+    profile_view = ParticipantProfileView
+    current_user_view = CurrentUserView
+
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
-    path("participant/profile/", ParticipantProfileView.as_view(), name="participant-profile"),
-    path("me/", CurrentUserView.as_view(), name="current-user"),
+    path("participant/profile/", profile_view.as_view(), name="participant-profile"),
+    path("me/", current_user_view.as_view(), name="current-user"),
 ]
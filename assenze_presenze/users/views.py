@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from config.async_views import AsyncAPIView
 from .permissions import IsParticipant
 from .serializers import (
     ParticipantProfileSerializer,
@@ -56,3 +57,27 @@ class CurrentUserView(APIView):
     def get(self, request):
         serializer = UserSerializer(request.user)
         return Response({"success": True, "data": serializer.data})
+
+
+
+class AsyncParticipantProfileView(AsyncAPIView):
+    """
+    Variante asincrona del profilo partecipante (ASGI).
+    GET  → letto senza occupare un thread
+    PUT/PATCH → delegati a ParticipantProfileView
+    """
+    permission_classes = [IsAuthenticated, IsParticipant]
+    sync_view = ParticipantProfileView
+
+    async def get(self, request):
+        serializer = ParticipantProfileSerializer(request.user)
+        return self.render({"success": True, "data": serializer.data})
+
+
+class AsyncCurrentUserView(AsyncAPIView):
+    """Utente corrente (variante asincrona)"""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        serializer = UserSerializer(request.user)
+        return self.render({"success": True, "data": serializer.data})